@@ -0,0 +1,49 @@
+"""chat keyset pagination indexes
+
+Revision ID: 3f6b2a9d7c41
+Revises: 8c1d1e5ea03f
+Create Date: 2026-10-19 14:03:27.118452
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f6b2a9d7c41'
+down_revision: Union[str, None] = '8c1d1e5ea03f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (new index, replaced index, table, columns of the new index)
+INDEXES = [
+    (
+        "ix_chat_messages_location_id_created_at_id",
+        "ix_chat_messages_location_id_created_at",
+        "chat_messages",
+        ["location_id", "created_at", "id"],
+    ),
+    (
+        "ix_chat_room_messages_room_id_created_at_id",
+        "ix_chat_room_messages_room_id_created_at",
+        "chat_room_messages",
+        ["room_id", "created_at", "id"],
+    ),
+]
+
+
+def upgrade() -> None:
+    # Build the (created_at, id) keyset indexes before dropping the old ones
+    with op.get_context().autocommit_block():
+        for name, old, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+            op.drop_index(old, table_name=table, postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, old, table, columns in reversed(INDEXES):
+            op.create_index(old, table, columns[:2], postgresql_concurrently=True, if_not_exists=True)
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,154 @@
+"""partition chat messages by month
+
+Revision ID: 7b2e4c9d1a58
+Revises: 3f6b2a9d7c41
+Create Date: 2026-10-19 16:42:10.513907
+
+Turns chat_messages and chat_room_messages into tables range-partitioned
+by month on created_at, without copying existing rows:
+
+  1. concurrently build a unique (id, created_at) index and a validated
+     CHECK (created_at < boundary) on the current table
+  2. in one short transaction, rename it to <table>_legacy, create the
+     partitioned parent with the same columns, constraints and index
+     names, and attach the old table as the partition for everything
+     before the boundary (the CHECK lets ATTACH skip the scan, and the
+     existing indexes are reused)
+  3. create monthly partitions from the boundary onwards
+
+The boundary is the start of the month after next, so writes keep going
+to the legacy partition until then. app.utils.chat_partitions creates
+later months and archives old ones. The primary key becomes
+(id, created_at), as PostgreSQL requires; ids still come from the same
+sequence.
+
+Downgrade copies every row back into a plain table.
+"""
+from datetime import datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7b2e4c9d1a58'
+down_revision: Union[str, None] = '3f6b2a9d7c41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+MONTHS_AHEAD = 3
+
+# table -> (foreign keys as (column, target, on delete), secondary indexes as (name, columns))
+TABLES = {
+    "chat_messages": (
+        [
+            ("location_id", "locations(id)", "CASCADE"),
+            ("user_id", "users(id)", "SET NULL"),
+        ],
+        [
+            ("ix_chat_messages_location_id", "location_id"),
+            ("ix_chat_messages_user_id", "user_id"),
+            ("ix_chat_messages_created_at", "created_at"),
+            ("ix_chat_messages_location_id_created_at_id", "location_id, created_at, id"),
+        ],
+    ),
+    "chat_room_messages": (
+        [
+            ("room_id", "chat_rooms(id)", "CASCADE"),
+            ("user_id", "users(id)", "SET NULL"),
+        ],
+        [
+            ("ix_chat_room_messages_room_id", "room_id"),
+            ("ix_chat_room_messages_user_id", "user_id"),
+            ("ix_chat_room_messages_created_at", "created_at"),
+            ("ix_chat_room_messages_room_id_created_at_id", "room_id, created_at, id"),
+        ],
+    ),
+}
+
+
+def add_months(month: datetime, n: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + n
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def bound(value: datetime) -> str:
+    return value.strftime("'%Y-%m-%d %H:%M:%S+00'")
+
+
+def create_constraints(table: str, primary_key: str) -> None:
+    foreign_keys, indexes = TABLES[table]
+    op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY ({primary_key})")
+    for column, target, on_delete in foreign_keys:
+        op.execute(
+            f"ALTER TABLE {table} ADD CONSTRAINT {table}_{column}_fkey "
+            f"FOREIGN KEY ({column}) REFERENCES {target} ON DELETE {on_delete}"
+        )
+    for name, columns in indexes:
+        op.execute(f"CREATE INDEX {name} ON {table} ({columns})")
+    op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id")
+
+
+def upgrade() -> None:
+    if op.get_context().dialect.name != "postgresql":
+        return
+
+    now = datetime.now(timezone.utc)
+    boundary = add_months(now.replace(day=1, hour=0, minute=0, second=0, microsecond=0), 2)
+
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            op.execute(
+                f"CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {table}_id_created_at_key "
+                f"ON {table} (id, created_at)"
+            )
+            op.execute(
+                f"ALTER TABLE {table} ADD CONSTRAINT {table}_before_partitions "
+                f"CHECK (created_at < {bound(boundary)}) NOT VALID"
+            )
+            # Scans without blocking writes
+            op.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {table}_before_partitions")
+
+    for table, (_, indexes) in TABLES.items():
+        legacy = f"{table}_legacy"
+        op.execute(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE")
+        op.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+        op.execute(f"ALTER TABLE {legacy} DROP CONSTRAINT {table}_pkey")
+        op.execute(
+            f"ALTER TABLE {legacy} ADD CONSTRAINT {legacy}_pkey "
+            f"PRIMARY KEY USING INDEX {table}_id_created_at_key"
+        )
+        for name, _ in indexes:
+            op.execute(f"ALTER INDEX IF EXISTS {name} RENAME TO {name}_legacy")
+
+        op.execute(f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)")
+        create_constraints(table, "id, created_at")
+        op.execute(
+            f"ALTER TABLE {table} ATTACH PARTITION {legacy} "
+            f"FOR VALUES FROM (MINVALUE) TO ({bound(boundary)})"
+        )
+        op.execute(f"ALTER TABLE {legacy} DROP CONSTRAINT {table}_before_partitions")
+
+        for n in range(MONTHS_AHEAD):
+            start = add_months(boundary, n)
+            op.execute(
+                f"CREATE TABLE {table}_p{start:%Y%m} PARTITION OF {table} "
+                f"FOR VALUES FROM ({bound(start)}) TO ({bound(add_months(start, 1))})"
+            )
+
+
+def downgrade() -> None:
+    if op.get_context().dialect.name != "postgresql":
+        return
+
+    for table in TABLES:
+        flat = f"{table}_flat"
+        op.execute(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE")
+        op.execute(f"CREATE TABLE {flat} (LIKE {table} INCLUDING DEFAULTS)")
+        op.execute(f"INSERT INTO {flat} SELECT * FROM {table}")
+        # Keep the sequence when the partitioned table goes
+        op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {flat}.id")
+        op.execute(f"DROP TABLE {table} CASCADE")
+        op.execute(f"ALTER TABLE {flat} RENAME TO {table}")
+        create_constraints(table, "id")
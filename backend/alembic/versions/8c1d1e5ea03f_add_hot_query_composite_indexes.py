@@ -0,0 +1,52 @@
+"""add hot query composite indexes
+
+Revision ID: 8c1d1e5ea03f
+Revises: e59f0eae439b
+Create Date: 2026-10-19 10:12:41.519203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c1d1e5ea03f'
+down_revision: Union[str, None] = 'e59f0eae439b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (index name, table, columns)
+INDEXES = [
+    ("ix_chat_room_messages_room_id_created_at", "chat_room_messages", ["room_id", "created_at"]),
+    ("ix_chat_messages_location_id_created_at", "chat_messages", ["location_id", "created_at"]),
+    ("ix_user_visits_user_id_created_at", "user_visits", ["user_id", "created_at"]),
+    ("ix_reviews_location_id_created_at", "reviews", ["location_id", "created_at"]),
+    ("ix_reviews_user_id_created_at", "reviews", ["user_id", "created_at"]),
+    ("ix_location_tags_tag_id_location_id", "location_tags", ["tag_id", "location_id"]),
+]
+
+
+def upgrade() -> None:
+    # CONCURRENTLY cannot run inside a transaction; build without locking writes
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(
+                name,
+                table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
@@ -0,0 +1,64 @@
+"""review feed keyset indexes
+
+Revision ID: a4d9c3e17f20
+Revises: 7b2e4c9d1a58
+Create Date: 2026-10-19 19:12:44.208316
+
+Adds reviews.photo_count (backfilled from review_photos) for the "most
+photos" sort, and a (sort column, created_at, id) index per review feed
+and sort, replacing the (location_id, created_at) and (user_id,
+created_at) indexes.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4d9c3e17f20'
+down_revision: Union[str, None] = '7b2e4c9d1a58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = [
+    ("ix_reviews_created_at_id", ["created_at", "id"]),
+    ("ix_reviews_location_id_created_at_id", ["location_id", "created_at", "id"]),
+    ("ix_reviews_location_id_rating_created_at_id", ["location_id", "rating", "created_at", "id"]),
+    ("ix_reviews_location_id_photo_count_created_at_id", ["location_id", "photo_count", "created_at", "id"]),
+    ("ix_reviews_user_id_created_at_id", ["user_id", "created_at", "id"]),
+    ("ix_reviews_user_id_rating_created_at_id", ["user_id", "rating", "created_at", "id"]),
+    ("ix_reviews_user_id_photo_count_created_at_id", ["user_id", "photo_count", "created_at", "id"]),
+]
+
+REPLACED = [
+    ("ix_reviews_location_id_created_at", ["location_id", "created_at"]),
+    ("ix_reviews_user_id_created_at", ["user_id", "created_at"]),
+]
+
+
+def upgrade() -> None:
+    # A constant default: no table rewrite on PostgreSQL 11+
+    op.add_column("reviews", sa.Column("photo_count", sa.Integer(), server_default="0", nullable=False))
+    op.execute(
+        "UPDATE reviews SET photo_count = counts.n "
+        "FROM (SELECT review_id, count(*) AS n FROM review_photos GROUP BY review_id) AS counts "
+        "WHERE reviews.id = counts.review_id"
+    )
+
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES:
+            op.create_index(name, "reviews", columns, postgresql_concurrently=True, if_not_exists=True)
+        for name, _ in REPLACED:
+            op.drop_index(name, table_name="reviews", postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, columns in REPLACED:
+            op.create_index(name, "reviews", columns, postgresql_concurrently=True, if_not_exists=True)
+        for name, _ in reversed(INDEXES):
+            op.drop_index(name, table_name="reviews", postgresql_concurrently=True, if_exists=True)
+
+    op.drop_column("reviews", "photo_count")
@@ -4,8 +4,10 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 from dotenv import load_dotenv
 
-# Load env vars from .env
-load_dotenv()
+# Load env vars from .env (skipped when the environment already provides
+# the settings, e.g. in containers, to keep cold starts cheap)
+if not os.getenv("DATABASE_URL"):
+    load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
@@ -20,8 +22,10 @@ class Base(DeclarativeBase):
 
 # ---------- Engine & Session Factory ----------
 
-# echo=True -> logs SQL to console (good for debug, turn off in prod)
-engine = create_engine(DATABASE_URL, echo=True)
+# SQL_ECHO=true -> logs SQL to console (good for debug, keep off in prod)
+SQL_ECHO = os.getenv("SQL_ECHO", "false").lower() == "true"
+
+engine = create_engine(DATABASE_URL, echo=SQL_ECHO)
 
 SessionLocal = sessionmaker(
     bind=engine,
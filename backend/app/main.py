@@ -1,17 +1,78 @@
 # app/main.py
+import os
+
 from fastapi import FastAPI
 
 from app.database import engine, Base
 from app import models  # ensures all models are imported & registered
 from app.routers import auth, chat, locations, interactions, reviews, tags, users, chatbot
+from app.utils.migrations import verify_migration_head
+from app.utils.rate_limit import RateLimitMiddleware
+from app.utils.chat_retention import chat_retention
+from app.utils.chat_writer import chat_writer
+from app.utils.pubsub import pubsub
+from app.utils.chat_cache import location_tails, room_tails
+from app.utils.user_cache import user_directory
+from app.utils.ws_connections import connection_registry
+from app.utils.room_registry import room_registry
+from app.utils.llm_limiter import llm_limiter
+from app.utils.answer_cache import answer_cache
+from app.utils.location_changes import location_changes
+from app.utils.prompt_builder import location_contexts
+
+# "development": create missing tables on boot
+# "production": schema is owned by Alembic; only check the DB is at head
+BOOT_MODE = os.getenv("BOOT_MODE", "development")
 
 app = FastAPI()
+app.add_middleware(RateLimitMiddleware)
 
 
 @app.on_event("startup")
 def on_startup():
-    # For development only; later switch to Alembic migrations
-    Base.metadata.create_all(bind=engine)
+    if BOOT_MODE == "production":
+        verify_migration_head(engine)
+    else:
+        Base.metadata.create_all(bind=engine)
+    room_registry.seed(chat.DEFAULT_ROOMS)
+
+
+@app.on_event("startup")
+async def start_background_tasks():
+    # Imported here rather than with the app, which keeps them out of
+    # the import time that scripts/bench_startup.py tracks
+    from app.utils.chat_partitions import chat_partitions
+    from app.utils.llm import llm_backend
+    from app.utils.retrieval import retrieval_index
+
+    chat_writer.start()
+    chat_retention.start()
+    await room_registry.start()
+    chat_partitions.start()
+    chat.room_presence.start()
+    chat.location_presence.start()
+    llm_backend.start()
+    await location_changes.start()
+    retrieval_index.start()
+
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    from app.utils.chat_partitions import chat_partitions
+    from app.utils.llm import llm_backend
+    from app.utils.retrieval import retrieval_index
+
+    # Flush queued chat messages before the final retention sweep
+    await chat_writer.stop()
+    await chat_retention.stop()
+    await chat_partitions.stop()
+    await chat.room_presence.stop()
+    await chat.location_presence.stop()
+    await room_registry.stop()
+    await location_changes.stop()
+    await retrieval_index.stop()
+    await llm_backend.stop()
+    await pubsub.close()
 
 app.include_router(users.router, prefix="/users")
 app.include_router(auth.router, prefix="/auth")
@@ -26,3 +87,25 @@ app.include_router(chatbot.router, prefix="/chatbot")
 def root():
     return {"message": "Backend is running"}
 
+
+@app.get("/metrics")
+def metrics():
+    """Per-worker cache, websocket and upstream statistics."""
+    from app.utils.llm import llm_backend
+    from app.utils.retrieval import retrieval_index
+
+    return {
+        "user_cache": user_directory.stats(),
+        "chat_tail_cache": {
+            "room": {"hits": room_tails.hits, "misses": room_tails.misses},
+            "location": {"hits": location_tails.hits, "misses": location_tails.misses},
+        },
+        "chat_writer": {"written": chat_writer.written, "dropped": chat_writer.dropped},
+        "websockets": connection_registry.stats(),
+        "chatbot_upstream": llm_backend.stats(),
+        "chatbot_limiter": llm_limiter.stats(),
+        "chatbot_answers": answer_cache.stats(),
+        "chatbot_contexts": location_contexts.stats(),
+        "chatbot_retrieval": retrieval_index.stats(),
+    }
+
@@ -3,7 +3,7 @@ from datetime import datetime
 from typing import TYPE_CHECKING
 import uuid
 
-from sqlalchemy import Text, DateTime, ForeignKey, String
+from sqlalchemy import Text, DateTime, ForeignKey, String, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -16,6 +16,9 @@ if TYPE_CHECKING:
 
 
 class ChatMessage(Base):
+    # On PostgreSQL this and chat_room_messages are partitioned by month on
+    # created_at (see app.utils.chat_partitions); the table's primary key
+    # there is (id, created_at), ids stay unique through the sequence.
     __tablename__ = "chat_messages"
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
@@ -47,6 +50,11 @@ class ChatMessage(Base):
     location: Mapped["Location"] = relationship("Location", back_populates="chat_messages")
     user: Mapped["User"] = relationship("User", back_populates="chat_messages")
 
+    __table_args__ = (
+        # History pages and retention: WHERE location_id = ? ORDER BY created_at, id
+        Index("ix_chat_messages_location_id_created_at_id", "location_id", "created_at", "id"),
+    )
+
 
 # ================================
 # NEW: SOCIAL HUB CHAT ROOM MODELS
@@ -110,4 +118,9 @@ class ChatRoomMessage(Base):
 
     # Relationships
     room: Mapped["ChatRoom"] = relationship("ChatRoom", back_populates="messages")
-    user: Mapped["User"] = relationship("User")  # no back_populates needed for now
\ No newline at end of file
+    user: Mapped["User"] = relationship("User")  # no back_populates needed for now
+
+    __table_args__ = (
+        # History pages: WHERE room_id = ? ORDER BY created_at DESC, id DESC
+        Index("ix_chat_room_messages_room_id_created_at_id", "room_id", "created_at", "id"),
+    )
@@ -2,7 +2,7 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import String, Integer, Text, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy import String, Integer, Text, DateTime, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -133,4 +133,6 @@ class LocationTag(Base):
 
     __table_args__ = (
         UniqueConstraint("location_id", "tag_id", name="uq_location_tag_pair"),
+        # by-tags lookups: WHERE tag_id IN (...) -> location_id (index-only)
+        Index("ix_location_tags_tag_id_location_id", "tag_id", "location_id"),
     )
@@ -2,7 +2,7 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import String, Integer, Text, DateTime, ForeignKey
+from sqlalchemy import String, Integer, Text, DateTime, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -34,6 +34,8 @@ class Review(Base):
 
     rating: Mapped[int] = mapped_column(Integer, nullable=False)  # 1–5
     comment: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # Kept by the photo upload endpoint, for the "most photos" sort
+    photo_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
 
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
@@ -50,6 +52,18 @@ class Review(Base):
         cascade="all, delete-orphan",
     )
 
+    __table_args__ = (
+        # Keyset-paginated feeds: one index per sort, (created_at, id) breaks ties.
+        # The rating indexes serve both highest and lowest first.
+        Index("ix_reviews_created_at_id", "created_at", "id"),
+        Index("ix_reviews_location_id_created_at_id", "location_id", "created_at", "id"),
+        Index("ix_reviews_location_id_rating_created_at_id", "location_id", "rating", "created_at", "id"),
+        Index("ix_reviews_location_id_photo_count_created_at_id", "location_id", "photo_count", "created_at", "id"),
+        Index("ix_reviews_user_id_created_at_id", "user_id", "created_at", "id"),
+        Index("ix_reviews_user_id_rating_created_at_id", "user_id", "rating", "created_at", "id"),
+        Index("ix_reviews_user_id_photo_count_created_at_id", "user_id", "photo_count", "created_at", "id"),
+    )
+
 
 class ReviewPhoto(Base):
     __tablename__ = "review_photos"
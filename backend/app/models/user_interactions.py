@@ -1,7 +1,7 @@
 # app/models/user_interactions.py
 from datetime import datetime
 
-from sqlalchemy import DateTime, ForeignKey, UniqueConstraint, Integer
+from sqlalchemy import DateTime, ForeignKey, UniqueConstraint, Integer, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -61,6 +61,11 @@ class UserVisit(Base):
     user: Mapped["User"] = relationship("User", back_populates="visits")
     location: Mapped["Location"] = relationship("Location", back_populates="visits")
 
+    __table_args__ = (
+        # Visit history, newest first
+        Index("ix_user_visits_user_id_created_at", "user_id", "created_at"),
+    )
+
 
 class UserSaved(Base):
     __tablename__ = "user_saved"
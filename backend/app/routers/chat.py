@@ -1,19 +1,26 @@
 # app/routers/chat.py
-from datetime import datetime
-from typing import List, Dict, Optional
+from datetime import datetime, timezone
+from functools import partial
+from typing import List, Optional
 import uuid
 
+from anyio import from_thread
 from fastapi import (
     APIRouter,
     Depends,
     HTTPException,
+    Query,
+    Request,
+    Response,
     WebSocket,
     WebSocketDisconnect,
 )
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import tuple_
 from sqlalchemy.orm import Session
 
 from app.database import get_db, SessionLocal
-from app.models import ChatMessage, Location, ChatRoom, ChatRoomMessage, User
+from app.models import ChatMessage, Location, ChatRoom, ChatRoomMessage
 from app.schemas.chat import (
     ChatMessageCreate,
     ChatMessageResponse,
@@ -23,12 +30,19 @@ from app.schemas.chat import (
     ChatRoomMessageResponse,
 )
 from app.utils.security import get_current_user
+from app.utils.rate_limit import allow_ws_message
+from app.utils.chat_retention import MAX_MESSAGES, chat_retention
+from app.utils.chat_writer import chat_writer
+from app.utils.chat_cache import location_tails, room_tails
+from app.utils.user_cache import user_directory
+from app.utils.pagination import decode_cursor, encode_cursor
+from app.utils.ws_connections import ConnectionManager, dumps
+from app.utils.presence import PresenceTracker
+from app.utils.room_registry import room_registry
 
 
 router = APIRouter()
 
-MAX_MESSAGES = 200   # Limit per location
-
 
 def serialize_chat_message(message: ChatMessage, username: str | None = None) -> ChatMessageResponse:
     return ChatMessageResponse(
@@ -52,12 +66,150 @@ def serialize_room_message(message: ChatRoomMessage, username: str | None = None
     )
 
 
+def serialize_with_usernames(rows: list, serialize, db: Session) -> list:
+    """Serializes messages with usernames from the user cache (no join)."""
+    names = user_directory.get_many((msg.user_id for msg in rows), db)
+    return [serialize(msg, names.get(msg.user_id)) for msg in rows]
+
+
+MAX_PAGE_SIZE = 200
+RESUME_MAX_MESSAGES = MAX_PAGE_SIZE
+
+
+def parse_chat_cursor(cursor: str | None, name: str) -> tuple | None:
+    """
+    Decodes a (created_at, id) cursor from X-Before-Cursor/X-After-Cursor.
+    A bare ISO timestamp is still accepted for `before`.
+    """
+    if cursor is None:
+        return None
+    try:
+        return decode_cursor(cursor, datetime, int)
+    except ValueError:
+        pass
+    if name == "before":
+        try:
+            # (created_at, id) < (ts, 0) is created_at < ts
+            return datetime.fromisoformat(cursor), 0
+        except ValueError:
+            pass
+    raise HTTPException(status_code=400, detail=f"Invalid {name} cursor")
+
+
+def page_messages(query, model, limit: int, before: tuple | None = None, after: tuple | None = None) -> list:
+    """
+    One keyset page on (created_at, id), ordered oldest → newest.
+    No cursor: the newest page. `before`: the page just older than it.
+    `after`: the oldest messages newer than it (catching up).
+    """
+    key = tuple_(model.created_at, model.id)
+    # The plain created_at bounds let PostgreSQL prune monthly partitions;
+    # it cannot prune on the row comparison alone
+    if before is not None:
+        query = query.filter(model.created_at <= before[0], key < before)
+    if after is not None:
+        return (
+            query.filter(model.created_at >= after[0], key > after)
+            .order_by(model.created_at.asc(), model.id.asc())
+            .limit(limit)
+            .all()
+        )
+
+    msgs = query.order_by(model.created_at.desc(), model.id.desc()).limit(limit).all()
+    msgs.reverse()
+    return msgs
+
+
+def set_page_cursors(response: Response, page: list, after: tuple | None = None) -> None:
+    """X-Before-Cursor pages back to older messages, X-After-Cursor forward to newer ones."""
+    if page:
+        first, last = page[0], page[-1]
+        if isinstance(first, dict):
+            response.headers["X-Before-Cursor"] = encode_cursor(first["created_at"], first["id"])
+            response.headers["X-After-Cursor"] = encode_cursor(last["created_at"], last["id"])
+        else:
+            response.headers["X-Before-Cursor"] = encode_cursor(first.created_at, first.id)
+            response.headers["X-After-Cursor"] = encode_cursor(last.created_at, last.id)
+    elif after is not None:
+        response.headers["X-After-Cursor"] = encode_cursor(*after)
+
+
+async def resolve_ws_user(user_id_str: str | None) -> tuple[uuid.UUID | None, str | None]:
+    """
+    Parses the user id sent with a websocket frame and finds its username
+    in the user cache. Unknown users post anonymously.
+    """
+    if not user_id_str:
+        return None, None
+    try:
+        user_uuid = uuid.UUID(str(user_id_str))
+    except ValueError:
+        return None, None
+
+    found, username = user_directory.cached(user_uuid)
+    if not found:
+        username = await run_in_threadpool(user_directory.get, user_uuid)
+    if username is None:
+        return None, None
+    return user_uuid, username
+
+
+def ws_user_key(websocket: WebSocket) -> str | None:
+    """The user a socket claims at connect time, for the per-user connection cap."""
+    return websocket.headers.get("x-user-id") or websocket.query_params.get("user_id")
+
+
+def ws_last_seen_id(websocket: WebSocket) -> int | None:
+    """?last_seen_id= of a reconnecting client, if valid."""
+    try:
+        return int(websocket.query_params["last_seen_id"])
+    except (KeyError, ValueError):
+        return None
+
+
+def fetch_missed(model, column, serialize, room_id: uuid.UUID, last_seen_id: int, limit: int) -> list[dict] | None:
+    """
+    DB side of a resume: up to `limit` messages after `last_seen_id`,
+    oldest first, or None if that message is not in the room.
+    """
+    db = SessionLocal()
+    try:
+        seen = db.query(model.created_at).filter(model.id == last_seen_id, column == room_id).first()
+        if seen is None:
+            return None
+        query = db.query(model).filter(column == room_id)
+        msgs = page_messages(query, model, limit, after=(seen.created_at, last_seen_id))
+        return [m.model_dump(mode="json") for m in serialize_with_usernames(msgs, serialize, db)]
+    finally:
+        db.close()
+
+
+async def resume_ws(manager: ConnectionManager, client, tails, room_id: uuid.UUID, last_seen_id: int, fetch) -> None:
+    """
+    Replays what a reconnecting client missed, then switches it to live
+    delivery (see ConnectionManager.connect(hold=True)). The tail cache
+    answers in O(missed); otherwise one keyset query does. If more than
+    RESUME_MAX_MESSAGES were missed, or the id is unknown, nothing is
+    replayed and "gap" tells the client to reload history over HTTP.
+    """
+    missed = tails.since(room_id, last_seen_id)
+    if missed is None:
+        missed = await run_in_threadpool(fetch, room_id, last_seen_id, RESUME_MAX_MESSAGES + 1)
+    gap = missed is None or len(missed) > RESUME_MAX_MESSAGES
+    if gap:
+        missed = []
+    replay = [dumps(m) for m in missed]
+    replay.append(dumps({"type": "resumed", "replayed": len(missed), "gap": gap}))
+    manager.resume(client, replay, {m["id"] for m in missed})
+
+
 # ============================================================
 # EXISTING: LOCATION-SPECIFIC CHAT
 # ============================================================
 
 
-@router.post("/{location_id}", response_model=ChatMessageResponse)
+# :uuid so that /rooms is not captured as a location id
+@router.post("/{location_id:uuid}", response_model=ChatMessageResponse)
 def send_message(
     location_id: uuid.UUID,
     payload: ChatMessageCreate,
@@ -77,70 +229,62 @@ def send_message(
         location_id=location_id,
         user_id=user.id,  # can be None later for anonymous
         message=payload.message,
+        # Aware, like rows read back from the timestamptz column and the
+        # websocket path (app.utils.chat_writer), so every path serializes alike
+        created_at=datetime.now(timezone.utc),
     )
 
+    # flush() fills id via RETURNING, so no refresh round trip after commit
     db.add(new_msg)
+    db.flush()
+    response = serialize_chat_message(new_msg, user.username)
     db.commit()
-    db.refresh(new_msg)
+    user_directory.put(user.id, user.username)
+
+    # Message limit is enforced in batches by the retention sweeper
+    chat_retention.record(location_id)
 
-    # Enforce message limit (keep only last MAX_MESSAGES)
-    prune_old_messages(location_id, db)
+    # Reaches websocket clients and the history caches on every worker
+    from_thread.run(location_manager.broadcast, location_id, response.model_dump(mode="json"))
 
-    return serialize_chat_message(new_msg, user.username)
+    return response
 
 
-@router.get("/{location_id}", response_model=List[ChatMessageResponse])
+@router.get("/{location_id:uuid}", response_model=List[ChatMessageResponse])
 def get_messages(
     location_id: uuid.UUID,
+    response: Response,
+    limit: int = Query(MAX_MESSAGES, ge=1, le=MAX_PAGE_SIZE),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
     db: Session = Depends(get_db),
     user=Depends(get_current_user)
 ):
     """
     Returns the last X messages (default MAX_MESSAGES)
     Ordered from oldest → newest
+    - before / after: cursors from the X-Before-Cursor / X-After-Cursor
+      headers of a previous page, to scroll back or catch up
     """
-    msgs = (
-        db.query(ChatMessage, User.username)
-        .join(User, ChatMessage.user_id == User.id, isouter=True)
-        .filter(ChatMessage.location_id == location_id)
-        .order_by(ChatMessage.created_at.asc())
-        .limit(MAX_MESSAGES)
-        .all()
-    )
-
-    return [serialize_chat_message(msg, username) for msg, username in msgs]
-
-
-def prune_old_messages(location_id: uuid.UUID, db: Session):
-    """
-    Keeps only the last MAX_MESSAGES messages.
-    Deletes older ones.
-    """
-    total = (
-        db.query(ChatMessage)
-        .filter(ChatMessage.location_id == location_id)
-        .count()
-    )
+    before_key = parse_chat_cursor(before, "before")
+    after_key = parse_chat_cursor(after, "after")
+    query = db.query(ChatMessage).filter(ChatMessage.location_id == location_id)
 
-    if total <= MAX_MESSAGES:
-        return
-
-    # Find cutoff
-    cutoff_msg = (
-        db.query(ChatMessage)
-        .filter(ChatMessage.location_id == location_id)
-        .order_by(ChatMessage.created_at.desc())
-        .offset(MAX_MESSAGES)
-        .first()
-    )
+    if before_key is None and after_key is None and limit <= location_tails.tail_size:
+        page = location_tails.latest(location_id, limit)
+        if page is None:
+            def fetch() -> list[dict]:
+                msgs = page_messages(query, ChatMessage, location_tails.tail_size)
+                return [m.model_dump(mode="json") for m in serialize_with_usernames(msgs, serialize_chat_message, db)]
 
-    # Delete older messages
-    db.query(ChatMessage).filter(
-        ChatMessage.location_id == location_id,
-        ChatMessage.created_at < cutoff_msg.created_at
-    ).delete()
+            page = location_tails.load(location_id, fetch)[-limit:]
+        set_page_cursors(response, page)
+        return page
 
-    db.commit()
+    msgs = page_messages(query, ChatMessage, limit, before_key, after_key)
+    page = serialize_with_usernames(msgs, serialize_chat_message, db)
+    set_page_cursors(response, page, after_key)
+    return page
 
 
 @router.websocket("/{location_id}/ws")
@@ -150,6 +294,14 @@ async def location_websocket_endpoint(websocket: WebSocket, location_id: str):
 
     Expects JSON payloads:
       {"text": "hello", "user_id": "<uuid>"}
+      {"type": "ping" | "pong" | "typing", "user_id": "<uuid>"}   (presence only)
+
+    The server sends {"type": "ping"} after WS_HEARTBEAT_INTERVAL seconds of
+    silence; any frame back keeps the socket open.
+
+    Reconnect with ?last_seen_id=<id of the last message received> to get
+    the messages missed in between, then {"type": "resumed", ...}, before
+    live messages.
     """
     try:
         loc_uuid = uuid.UUID(location_id)
@@ -166,45 +318,69 @@ async def location_websocket_endpoint(websocket: WebSocket, location_id: str):
     finally:
         db.close()
 
-    await location_manager.connect(loc_uuid, websocket)
+    last_seen_id = ws_last_seen_id(websocket)
+    client = await location_manager.connect(
+        loc_uuid, websocket, ws_user_key(websocket), hold=last_seen_id is not None
+    )
+    if client is None:
+        return
 
     try:
+        await location_presence.watch(loc_uuid, client)
+        if last_seen_id is not None:
+            await resume_ws(
+                location_manager, client, location_tails, loc_uuid, last_seen_id,
+                partial(fetch_missed, ChatMessage, ChatMessage.location_id, serialize_chat_message),
+            )
         while True:
-            data = await websocket.receive_json()
+            data = await location_manager.receive(client)
             text = data.get("text")
             user_id_str = data.get("user_id") or websocket.headers.get("x-user-id")
 
+            if data.get("type") in ("ping", "pong", "typing"):
+                # Presence only: not rate limited, nothing is broadcast here
+                user_uuid, username = await resolve_ws_user(user_id_str)
+                if user_uuid is not None:
+                    location_presence.touch(
+                        loc_uuid, websocket, user_uuid, username,
+                        typing=True if data["type"] == "typing" else None,
+                    )
+                continue
+
             if not text:
                 continue
 
-            db = SessionLocal()
+            remaining = await allow_ws_message(websocket.scope, ws_user_key(websocket))
+            if remaining < 0:
+                client.offer_json({"error": "rate_limited", "retry_after": -remaining})
+                continue
+
+            user_uuid, username = await resolve_ws_user(user_id_str)
+
+            # Id and timestamp are assigned up front; the INSERT is batched
+            row = await chat_writer.prepare(
+                ChatMessage,
+                location_id=loc_uuid,
+                user_id=user_uuid,
+                message=text,
+            )
             try:
-                user_uuid = None
-                user_obj: User | None = None
-                if user_id_str:
-                    try:
-                        user_uuid = uuid.UUID(str(user_id_str))
-                        user_obj = db.query(User).filter(User.id == user_uuid).first()
-                    except ValueError:
-                        user_uuid = None
-
-                msg = ChatMessage(
-                    location_id=loc_uuid,
-                    user_id=user_uuid,
-                    message=text,
-                )
-                db.add(msg)
-                db.commit()
-                db.refresh(msg)
-
-                payload = serialize_chat_message(msg, user_obj.username if user_obj else None).model_dump()
-                prune_old_messages(loc_uuid, db)
-            finally:
-                db.close()
+                await chat_writer.submit(ChatMessage, row)
+            except Exception:
+                client.offer_json({"error": "not_saved"})
+                continue
+
+            chat_retention.record(loc_uuid)
+            if user_uuid is not None:
+                location_presence.touch(loc_uuid, websocket, user_uuid, username, typing=False)
 
+            payload = ChatMessageResponse(**row, username=username).model_dump(mode="json")
             await location_manager.broadcast(loc_uuid, payload)
     except WebSocketDisconnect:
+        pass
+    finally:
         location_manager.disconnect(loc_uuid, websocket)
+        location_presence.leave(loc_uuid, websocket)
 
 
 # ============================================================
@@ -212,7 +388,7 @@ async def location_websocket_endpoint(websocket: WebSocket, location_id: str):
 # Endpoints: /chat/rooms, /chat/rooms/{id}/messages, /ws
 # ============================================================
 
-# Default rooms to seed (once)
+# Default rooms, seeded once at startup (see room_registry.seed)
 DEFAULT_ROOMS = [
     {"name": "General Chat", "category": "all"},
     {"name": "Foodies", "category": "food"},
@@ -221,35 +397,20 @@ DEFAULT_ROOMS = [
 ]
 
 
-def ensure_default_rooms(db: Session) -> None:
-    """
-    Make sure our default chat rooms exist.
-    Called lazily from list_chat_rooms().
-    """
-    existing = db.query(ChatRoom).all()
-    existing_names = {r.name for r in existing}
-
-    created = False
-    for room in DEFAULT_ROOMS:
-        if room["name"] not in existing_names:
-            db.add(ChatRoom(name=room["name"], category=room["category"]))
-            created = True
-
-    if created:
-        db.commit()
-
-
 @router.get("/rooms", response_model=List[ChatRoomResponse])
 def list_chat_rooms(
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
     user=Depends(get_current_user),
 ):
     """
-    List all chat rooms.
-    Also ensures default rooms exist on first call.
+    List all chat rooms, from the in-memory room registry.
+    Send the ETag back as If-None-Match to get 304 when nothing changed.
     """
-    ensure_default_rooms(db)
-    rooms = db.query(ChatRoom).order_by(ChatRoom.created_at.asc()).all()
+    rooms, etag = room_registry.listing()
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
     return rooms
 
 
@@ -273,46 +434,60 @@ def create_chat_room(
     db.commit()
     db.refresh(new_room)
 
-    return new_room
+    room = ChatRoomResponse.model_validate(new_room).model_dump(mode="json")
+    room_registry.add(room)
+    from_thread.run(room_registry.announce, room)
+
+    return room
 
 
 @router.get("/rooms/{room_id}/messages", response_model=List[ChatRoomMessageResponse])
 def get_room_messages(
     room_id: uuid.UUID,
-    limit: int = 50,
-    before: Optional[datetime] = None,
+    response: Response,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
     db: Session = Depends(get_db),
     user=Depends(get_current_user),
 ):
     """
     Get messages for a room.
     - limit: max messages to return (default 50)
-    - before: if provided, return messages strictly before this timestamp
+    - before: cursor (X-Before-Cursor of a previous page, or a timestamp);
+      return the messages just older than it
+    - after: cursor (X-After-Cursor); return the messages just newer than it
     Ordered oldest → newest.
+    The latest page is served from the in-memory tail when cached.
     """
-    room = db.query(ChatRoom).filter(ChatRoom.id == room_id).first()
-    if not room:
+    before_key = parse_chat_cursor(before, "before")
+    after_key = parse_chat_cursor(after, "after")
+
+    use_tail = before_key is None and after_key is None and limit <= room_tails.tail_size
+    if use_tail:
+        page = room_tails.latest(room_id, limit)
+        if page is not None:
+            set_page_cursors(response, page)
+            return page
+
+    if room_registry.find(room_id) is None:
         raise HTTPException(status_code=404, detail="Room not found")
 
-    query = (
-        db.query(ChatRoomMessage, User.username)
-        .join(User, ChatRoomMessage.user_id == User.id, isouter=True)
-        .filter(ChatRoomMessage.room_id == room_id)
-    )
+    query = db.query(ChatRoomMessage).filter(ChatRoomMessage.room_id == room_id)
 
-    if before is not None:
-        query = query.filter(ChatRoomMessage.created_at < before)
-
-    # newest first, then reversed in memory to oldest → newest
-    msgs = (
-        query
-        .order_by(ChatRoomMessage.created_at.desc())
-        .limit(limit)
-        .all()
-    )
+    if use_tail:
+        def fetch() -> list[dict]:
+            msgs = page_messages(query, ChatRoomMessage, room_tails.tail_size)
+            return [m.model_dump(mode="json") for m in serialize_with_usernames(msgs, serialize_room_message, db)]
 
-    msgs.reverse()
-    return [serialize_room_message(msg, username) for msg, username in msgs]
+        page = room_tails.load(room_id, fetch)[-limit:]
+        set_page_cursors(response, page)
+        return page
+
+    msgs = page_messages(query, ChatRoomMessage, limit, before_key, after_key)
+    page = serialize_with_usernames(msgs, serialize_room_message, db)
+    set_page_cursors(response, page, after_key)
+    return page
 
 
 @router.post("/rooms/{room_id}/messages", response_model=ChatRoomMessageResponse)
@@ -327,21 +502,25 @@ def send_room_message(
     For real-time, the frontend will use WebSocket, but this
     endpoint gives a simple fallback / initial implementation.
     """
-    room = db.query(ChatRoom).filter(ChatRoom.id == room_id).first()
-    if not room:
+    if room_registry.find(room_id) is None:
         raise HTTPException(status_code=404, detail="Room not found")
 
     msg = ChatRoomMessage(
         room_id=room_id,
         user_id=user.id,
         text=payload.text,
+        created_at=datetime.now(timezone.utc),  # Aware, as in send_message
     )
 
     db.add(msg)
+    db.flush()
+    response = serialize_room_message(msg, user.username)
     db.commit()
-    db.refresh(msg)
+    user_directory.put(user.id, user.username)
+
+    from_thread.run(room_manager.broadcast, room_id, response.model_dump(mode="json"))
 
-    return serialize_room_message(msg, user.username)
+    return response
 
 
 # ------------------------------------------------------------
@@ -349,31 +528,10 @@ def send_room_message(
 # ------------------------------------------------------------
 
 
-class ConnectionManager:
-    def __init__(self):
-        # room_id -> list of WebSocket connections
-        self.active_connections: Dict[uuid.UUID, List[WebSocket]] = {}
-
-    async def connect(self, room_id: uuid.UUID, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.setdefault(room_id, []).append(websocket)
-
-    def disconnect(self, room_id: uuid.UUID, websocket: WebSocket):
-        connections = self.active_connections.get(room_id)
-        if not connections:
-            return
-        if websocket in connections:
-            connections.remove(websocket)
-        if not connections:
-            self.active_connections.pop(room_id, None)
-
-    async def broadcast(self, room_id: uuid.UUID, message: dict):
-        for connection in self.active_connections.get(room_id, []):
-            await connection.send_json(message)
-
-
-room_manager = ConnectionManager()
-location_manager = ConnectionManager()
+room_manager = ConnectionManager("room")
+location_manager = ConnectionManager("location")
+room_presence = PresenceTracker(room_manager)
+location_presence = PresenceTracker(location_manager)
 
 
 @router.websocket("/rooms/{room_id}/ws")
@@ -386,6 +544,11 @@ async def room_websocket_endpoint(
 
     Frontend can send messages:
       { "text": "hello world", "user_id": "<uuid-string>" }
+    and presence frames, which are not stored or broadcast:
+      { "type": "ping" | "pong" | "typing", "user_id": "<uuid-string>" }
+    Connect with ?user_id=<uuid> to count towards that user's connection cap,
+    and with ?last_seen_id=<id> when reconnecting to replay missed messages
+    (as for location chat).
 
     We store them in DB and broadcast the serialized message
     to all connected clients in this room.
@@ -396,42 +559,71 @@ async def room_websocket_endpoint(
         await websocket.close(code=1008)
         return
 
-    await room_manager.connect(room_uuid, websocket)
+    room = room_registry.get(room_uuid)
+    if room is None:
+        room = await run_in_threadpool(room_registry.find, room_uuid)
+    if room is None:
+        await websocket.close(code=1008)
+        return
+
+    last_seen_id = ws_last_seen_id(websocket)
+    client = await room_manager.connect(
+        room_uuid, websocket, ws_user_key(websocket), hold=last_seen_id is not None
+    )
+    if client is None:
+        return
 
     try:
+        await room_presence.watch(room_uuid, client)
+        if last_seen_id is not None:
+            await resume_ws(
+                room_manager, client, room_tails, room_uuid, last_seen_id,
+                partial(fetch_missed, ChatRoomMessage, ChatRoomMessage.room_id, serialize_room_message),
+            )
         while True:
-            data = await websocket.receive_json()
+            data = await room_manager.receive(client)
             text = data.get("text")
             user_id_str = data.get("user_id")
 
+            if data.get("type") in ("ping", "pong", "typing"):
+                user_uuid, username = await resolve_ws_user(user_id_str)
+                if user_uuid is not None:
+                    room_presence.touch(
+                        room_uuid, websocket, user_uuid, username,
+                        typing=True if data["type"] == "typing" else None,
+                    )
+                continue
+
             if not text:
                 continue
 
-            db = SessionLocal()
+            remaining = await allow_ws_message(websocket.scope, ws_user_key(websocket))
+            if remaining < 0:
+                client.offer_json({"error": "rate_limited", "retry_after": -remaining})
+                continue
+
+            user_uuid, username = await resolve_ws_user(user_id_str)
+
+            row = await chat_writer.prepare(
+                ChatRoomMessage,
+                room_id=room_uuid,
+                user_id=user_uuid,
+                text=text,
+            )
             try:
-                user_uuid = None
-                user_obj: User | None = None
-                if user_id_str:
-                    try:
-                        user_uuid = uuid.UUID(user_id_str)
-                        user_obj = db.query(User).filter(User.id == user_uuid).first()
-                    except ValueError:
-                        user_uuid = None
-
-                msg = ChatRoomMessage(
-                    room_id=room_uuid,
-                    user_id=user_uuid,
-                    text=text,
-                )
-                db.add(msg)
-                db.commit()
-                db.refresh(msg)
-
-                payload = serialize_room_message(msg, user_obj.username if user_obj else None).model_dump()
-            finally:
-                db.close()
+                await chat_writer.submit(ChatRoomMessage, row)
+            except Exception:
+                client.offer_json({"error": "not_saved"})
+                continue
+
+            if user_uuid is not None:
+                room_presence.touch(room_uuid, websocket, user_uuid, username, typing=False)
 
+            payload = ChatRoomMessageResponse(**row, username=username).model_dump(mode="json")
             await room_manager.broadcast(room_uuid, payload)
 
     except WebSocketDisconnect:
+        pass
+    finally:
         room_manager.disconnect(room_uuid, websocket)
+        room_presence.leave(room_uuid, websocket)
@@ -1,30 +1,44 @@
 # app/routers/chatbot.py
 from __future__ import annotations
 
+import asyncio
+from contextlib import aclosing
+import json
 import os
-from typing import List, Literal
+from typing import AsyncIterator, List, Literal
 import uuid
 
-import httpx
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app.database import SessionLocal
 from app.models import Location
-from app.utils.security import get_current_user
+from app.utils.security import get_current_user_id
+from app.utils.answer_cache import answer_cache
+from app.utils.llm_limiter import llm_limiter
+from app.utils.prompt_builder import build_prompt, location_contexts
 
 router = APIRouter()
 
 
+MAX_MESSAGE_CHARS = int(os.getenv("CHATBOT_MAX_MESSAGE_CHARS", "2000"))
+MAX_TURN_CHARS = int(os.getenv("CHATBOT_MAX_TURN_CHARS", "4000"))
+MAX_HISTORY_TURNS = int(os.getenv("CHATBOT_MAX_HISTORY_TURNS", "100"))
+
+
 class ChatTurn(BaseModel):
     role: Literal["user", "assistant"]
-    content: str
+    content: str = Field(max_length=MAX_TURN_CHARS)
 
 
 class ChatBotRequest(BaseModel):
-    message: str
-    history: List[ChatTurn] = Field(default_factory=list)
+    message: str = Field(min_length=1, max_length=MAX_MESSAGE_CHARS)
+    # Only the most recent turns that fit the token budget reach the model
+    history: List[ChatTurn] = Field(default_factory=list, max_length=MAX_HISTORY_TURNS)
 
 
 class ChatBotResponse(BaseModel):
@@ -32,68 +46,201 @@ class ChatBotResponse(BaseModel):
     location_id: uuid.UUID
 
 
-async def _generate_reply(prompt: list[dict[str, str]]) -> str:
-    api_key = os.getenv("DEEPSEEK_API_KEY")
-    if not api_key:
-        return "I'm here to help, but the AI guide isn't configured yet."
+NOT_CONFIGURED_REPLY = "I'm here to help, but the AI guide isn't configured yet."
+UNAVAILABLE_REPLY = "I'm having trouble reaching the AI guide right now. Please try again later."
+# Not answers; never cached
+FALLBACK_REPLIES = frozenset({NOT_CONFIGURED_REPLY, UNAVAILABLE_REPLY})
+
+
+def _prompt_context(location_id: uuid.UUID, db: Session) -> tuple[list[dict[str, str]], int]:
+    context = location_contexts.get(location_id)
+    if context is None:
+        location = db.query(Location).filter(Location.id == location_id).first()
+        if not location:
+            raise HTTPException(status_code=404, detail="Location not found")
+        context = location_contexts.put(location)
+    return context
+
 
-    headers = {"Authorization": f"Bearer {api_key}"}
-    payload = {"model": "deepseek-chat", "messages": prompt, "stream": False}
+def _build_messages(location_id: uuid.UUID, payload: ChatBotRequest) -> list[dict[str, str]]:
+    """
+    Blocking (location query, index search, token counting): call via
+    run_in_threadpool. Uses its own session, returned to the pool before
+    the model is asked, not held for the whole reply.
+    """
+    # The index and the model client load at startup (app.main), not on import
+    from app.utils.retrieval import retrieval_index
 
+    history = [turn.model_dump() for turn in payload.history]
+    db = SessionLocal()
     try:
-        async with httpx.AsyncClient(timeout=20) as client:
-            resp = await client.post(
-                "https://api.deepseek.com/chat/completions",
-                headers=headers,
-                json=payload,
-            )
-            resp.raise_for_status()
-            data = resp.json()
-            return data.get("choices", [{}])[0].get("message", {}).get(
-                "content", "I can help you explore!"
-            )
+        context = _prompt_context(location_id, db)
+    finally:
+        db.close()
+    snippets = retrieval_index.search(location_id, payload.message)
+    return build_prompt(context, history, payload.message, snippets)
+
+
+def _admit(user_id: uuid.UUID) -> str:
+    """Counts a reply against the user's limit (429 when at it)."""
+    user_key = str(user_id)
+    if not llm_limiter.admit(user_key):
+        raise HTTPException(status_code=429, detail="Too many chatbot replies in progress")
+    return user_key
+
+
+async def _generate_reply(prompt: list[dict[str, str]], deadline: float | None = None) -> str:
+    from app.utils.llm import llm_backend
+
+    if not llm_backend.configured:
+        return NOT_CONFIGURED_REPLY
+    if deadline is None:
+        deadline = llm_limiter.deadline()
+
+    try:
+        async with llm_limiter.slot(deadline):
+            try:
+                async with asyncio.timeout_at(deadline):
+                    return await llm_backend.complete(prompt)
+            except TimeoutError:
+                llm_limiter.expired()
+                raise
     except Exception:
-        return "I'm having trouble reaching the AI guide right now. Please try again later."
+        return UNAVAILABLE_REPLY
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _whole_reply(reply: str, location_id: uuid.UUID) -> AsyncIterator[str]:
+    """A reply that is already known, as the events of a stream."""
+    yield _sse("token", {"text": reply})
+    yield _sse("done", {"reply": reply, "location_id": str(location_id)})
+
+
+async def _stream_reply(
+    prompt: list[dict[str, str]],
+    location_id: uuid.UUID,
+    cache_question: str | None = None,
+    deadline: float | None = None,
+) -> AsyncIterator[str]:
+    """
+    Relays a streamed completion as SSE: a "token" event per content
+    delta, then "done" with the whole reply, or "error" if the upstream
+    fails or the reply runs past `deadline`. The model is only read as
+    fast as the client takes the events (each yield waits for the
+    send), and a client disconnect cancels this generator, which closes
+    the upstream request. A generation slot is held until the stream
+    ends. A complete reply is cached under `cache_question` if given.
+    """
+    from app.utils.llm import llm_backend
+    from app.utils.upstream import UpstreamError
+
+    if not llm_backend.configured:
+        async for event in _whole_reply(NOT_CONFIGURED_REPLY, location_id):
+            yield event
+        return
+    if deadline is None:
+        deadline = llm_limiter.deadline()
+
+    parts: list[str] = []
+    try:
+        async with llm_limiter.slot(deadline), aclosing(llm_backend.stream(prompt)) as pieces:
+            while True:
+                # The deadline bounds the model, not the client reading
+                try:
+                    async with asyncio.timeout_at(deadline):
+                        text = await anext(pieces)
+                except StopAsyncIteration:
+                    break
+                except TimeoutError:
+                    llm_limiter.expired()
+                    raise
+                parts.append(text)
+                yield _sse("token", {"text": text})
+    except (UpstreamError, TimeoutError):
+        yield _sse("error", {"detail": UNAVAILABLE_REPLY})
+        return
+
+    reply = "".join(parts)
+    if cache_question is not None and reply:
+        answer_cache.put(location_id, cache_question, reply)
+    yield _sse("done", {"reply": reply, "location_id": str(location_id)})
 
 
 @router.post("/{location_id}", response_model=ChatBotResponse)
 async def chat_with_bot(
     location_id: uuid.UUID,
     payload: ChatBotRequest,
-    db: Session = Depends(get_db),
-    user=Depends(get_current_user),
+    user_id: uuid.UUID = Depends(get_current_user_id),
 ):
-    location = db.query(Location).filter(Location.id == location_id).first()
-    if not location:
-        raise HTTPException(status_code=404, detail="Location not found")
-
-    system_prompt = (
-        "You are a friendly, knowledgeable tour guide for this destination. "
-        "Keep responses concise, helpful, and focused on the location."
-    )
+    cacheable = answer_cache.applies(payload.history)
+    if cacheable:
+        cached = answer_cache.get(location_id, payload.message)
+        if cached is not None:
+            return ChatBotResponse(reply=cached, location_id=location_id)
 
-    location_context = " ".join(
-        part
-        for part in [
-            f"You are helping a visitor explore {location.name}.",
-            f"Area: {location.area}." if location.area else "",
-            f"Region: {location.region}." if getattr(location, "region", None) else "",
-            f"Overview: {location.description}." if location.description else "",
-            f"Summary: {location.summary}." if getattr(location, "summary", None) else "",
-        ]
-        if part
-    )
+    user_key = _admit(user_id)
+    try:
+        prompt = await run_in_threadpool(_build_messages, location_id, payload)
+        reply_text = await _generate_reply(prompt)
+    finally:
+        llm_limiter.leave(user_key)
+    if cacheable and reply_text not in FALLBACK_REPLIES:
+        answer_cache.put(location_id, payload.message, reply_text)
 
-    messages: list[dict[str, str]] = [
-        {"role": "system", "content": system_prompt},
-        {"role": "assistant", "content": f"Hi, I'm your tour guide for {location.name}."},
-    ]
-    if location_context:
-        messages.append({"role": "system", "content": location_context})
-    for turn in payload.history:
-        messages.append({"role": turn.role, "content": turn.content})
-    messages.append({"role": "user", "content": payload.message})
+    return ChatBotResponse(reply=reply_text, location_id=location_id)
 
-    reply_text = await _generate_reply(messages)
 
-    return ChatBotResponse(reply=reply_text, location_id=location_id)
+@router.post("/{location_id}/stream")
+async def stream_chat_with_bot(
+    location_id: uuid.UUID,
+    payload: ChatBotRequest,
+    user_id: uuid.UUID = Depends(get_current_user_id),
+):
+    """
+    Same as POST /chatbot/{location_id}, streamed as Server-Sent Events:
+
+        event: token
+        data: {"text": "The light"}
+
+        event: done
+        data: {"reply": "The lighthouse...", "location_id": "..."}
+
+    or a final `event: error` with {"detail": ...} if the AI guide fails.
+    """
+    cacheable = answer_cache.applies(payload.history)
+    cached = answer_cache.get(location_id, payload.message) if cacheable else None
+    if cached is not None:
+        events = _whole_reply(cached, location_id)
+        finish = events.aclose
+    else:
+        user_key = _admit(user_id)
+        try:
+            prompt = await run_in_threadpool(_build_messages, location_id, payload)
+            events = _stream_reply(
+                prompt,
+                location_id,
+                payload.message if cacheable else None,
+                llm_limiter.deadline(),
+            )
+        except BaseException:
+            llm_limiter.leave(user_key)
+            raise
+
+        async def finish():
+            try:
+                await events.aclose()
+            finally:
+                llm_limiter.leave(user_key)
+
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        # No caching, and no buffering by reverse proxies (nginx)
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # A disconnect can leave the generator suspended at a yield;
+        # closing it ends the upstream request right away
+        background=BackgroundTask(finish),
+    )
@@ -1,3 +1,4 @@
+from anyio import from_thread
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, status
 from sqlalchemy.orm import Session
 from typing import List, Optional
@@ -21,6 +22,7 @@ from app.schemas.location import (
     TagResponse,
 )
 from app.utils.security import get_current_user
+from app.utils.location_changes import location_changes
 
 router = APIRouter()
 
@@ -368,6 +370,8 @@ def create_location(
         db.add(new_location)
         _commit(db)
         db.refresh(new_location)
+        # Lets the chatbot's retrieval index find it before the next rebuild
+        from_thread.run(location_changes.announce, new_location.id)
         return LocationResponse.model_validate(new_location)
     except HTTPException:
         raise
@@ -439,6 +443,8 @@ def update_location(
 
     _commit(db)
     db.refresh(location)
+    # Chatbot caches may hold the old details
+    from_thread.run(location_changes.announce, location_id)
     return LocationResponse.model_validate(location)
 
 
@@ -456,6 +462,7 @@ def delete_location(
 
     db.delete(location)
     _commit(db)
+    from_thread.run(location_changes.announce, location_id)
     return {"message": "Location deleted"}
 
 
@@ -566,6 +573,8 @@ def add_tags_to_location(
                 added_tags.append(tag)
 
         _commit(db)
+        if added_tags:
+            from_thread.run(location_changes.announce, location_id)
 
         # Return only Tag objects per schema
         return LocationTagsResponse.model_validate({
@@ -598,5 +607,6 @@ def remove_tag_from_location(
 
     db.delete(link)
     _commit(db)
+    from_thread.run(location_changes.announce, location_id)
 
     return {"message": "Tag removed"}
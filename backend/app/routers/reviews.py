@@ -1,7 +1,10 @@
 # app/routers/reviews.py
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from anyio import from_thread
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, UploadFile, File
+from sqlalchemy import tuple_
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Literal, Optional
+from datetime import datetime
 import uuid
 import os
 
@@ -15,6 +18,8 @@ from app.schemas.review import (
     ReviewWithPhotosResponse,
 )
 from app.utils.security import get_current_user
+from app.utils.location_changes import location_changes
+from app.utils.pagination import decode_cursor, encode_cursor
 
 router = APIRouter()
 
@@ -27,6 +32,78 @@ UPLOAD_FOLDER = os.path.join(BASE_DIR, "..", "media", "review_photos")
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
 
+def _with_photos(db: Session, reviews: List[Review]) -> List[dict]:
+    """
+    Pairs each review with its photos, fetched for the whole page in one
+    query instead of one per review.
+    """
+    if not reviews:
+        return []
+
+    photos = (
+        db.query(ReviewPhoto)
+        .filter(ReviewPhoto.review_id.in_([r.id for r in reviews]))
+        .order_by(ReviewPhoto.id)
+        .all()
+    )
+
+    photos_by_review = {}
+    for photo in photos:
+        photos_by_review.setdefault(photo.review_id, []).append(photo)
+
+    return [{"review": r, "photos": photos_by_review.get(r.id, [])} for r in reviews]
+
+
+# ------------------------------------
+# Keyset pagination
+# ------------------------------------
+
+MAX_PAGE_SIZE = 100
+
+ReviewSort = Literal["newest", "highest_rating", "lowest_rating", "most_photos"]
+
+# sort -> (key columns, descending). Each key is a composite index on
+# reviews (after the feed's location_id / user_id); lowest_rating walks
+# the rating index backwards, so equal ratings come oldest first.
+SORT_KEYS = {
+    "newest": ((Review.created_at, Review.id), True),
+    "highest_rating": ((Review.rating, Review.created_at, Review.id), True),
+    "lowest_rating": ((Review.rating, Review.created_at, Review.id), False),
+    "most_photos": ((Review.photo_count, Review.created_at, Review.id), True),
+}
+
+
+def page_reviews(
+    query, response: Response, sort: str, limit: int, cursor: Optional[str], offset: int = 0
+) -> List[Review]:
+    """
+    One keyset page of reviews in `sort` order, starting after `cursor`
+    (the X-Next-Cursor header of the previous page). Sets X-Next-Cursor
+    when the page is full.
+    """
+    columns, descending = SORT_KEYS[sort]
+    key = tuple_(*columns)
+
+    if cursor is not None:
+        types = (int,) * (len(columns) - 2) + (datetime, uuid.UUID)
+        try:
+            values = decode_cursor(cursor, str, *types)
+        except ValueError:
+            values = None
+        # A cursor only continues the sort it came from
+        if values is None or values[0] != sort:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.filter(key < values[1:] if descending else key > values[1:])
+
+    order = [c.desc() if descending else c.asc() for c in columns]
+    reviews = query.order_by(*order).offset(offset).limit(limit).all()
+
+    if len(reviews) == limit:
+        last = reviews[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(sort, *(getattr(last, c.key) for c in columns))
+    return reviews
+
+
 
 # ------------------------------------
 # 1. CREATE REVIEW
@@ -62,6 +139,8 @@ def create_review(
     db.add(new_review)
     db.commit()
     db.refresh(new_review)
+    # The chatbot quotes recent reviews
+    from_thread.run(location_changes.announce, new_review.location_id)
 
     return new_review
 
@@ -103,37 +182,25 @@ def get_review_by_id(
 
 @router.get("/", response_model=List[ReviewWithPhotosResponse])
 def get_all_reviews(
-    limit: int = 50,
-    offset: int = 0,
+    response: Response,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    offset: int = Query(0, ge=0, deprecated=True),
     db: Session = Depends(get_db),
     user=Depends(get_current_user)
 ):
     """
-    Returns all reviews with photos, paginated.
+    Returns all reviews with photos, newest first.
     Useful for admin views or public review feeds.
+    - limit: reviews per page
+    - cursor: X-Next-Cursor of the previous page
+    - offset: deprecated, use cursor; ignored when a cursor is given
     """
-    reviews = (
-        db.query(Review)
-        .order_by(Review.created_at.desc())
-        .limit(limit)
-        .offset(offset)
-        .all()
-    )
+    if cursor is not None:
+        offset = 0
+    reviews = page_reviews(db.query(Review), response, "newest", limit, cursor, offset)
     
-    results = []
-    for r in reviews:
-        photos = (
-            db.query(ReviewPhoto)
-            .filter(ReviewPhoto.review_id == r.id)
-            .all()
-        )
-        
-        results.append({
-            "review": r,
-            "photos": photos
-        })
-    
-    return results
+    return _with_photos(db, reviews)
 
 
 # ------------------------------------
@@ -143,29 +210,24 @@ def get_all_reviews(
 @router.get("/location/{location_id}", response_model=List[ReviewWithPhotosResponse])
 def get_reviews_for_location(
     location_id: uuid.UUID,
+    response: Response,
+    sort: ReviewSort = "newest",
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     user=Depends(get_current_user)
 ):
     """
-    Returns all reviews + photos for a location.
+    Returns reviews + photos for a location, a page at a time.
+    - sort: newest, highest_rating, lowest_rating or most_photos
+    - limit: reviews per page
+    - cursor: X-Next-Cursor of the previous page (same sort)
     """
 
-    reviews = db.query(Review).filter(Review.location_id == location_id).all()
-
-    results = []
-    for r in reviews:
-        photos = (
-            db.query(ReviewPhoto)
-            .filter(ReviewPhoto.review_id == r.id)
-            .all()
-        )
-
-        results.append({
-            "review": r,
-            "photos": photos
-        })
+    query = db.query(Review).filter(Review.location_id == location_id)
+    reviews = page_reviews(query, response, sort, limit, cursor)
 
-    return results
+    return _with_photos(db, reviews)
 
 
 # ------------------------------------
@@ -175,34 +237,24 @@ def get_reviews_for_location(
 @router.get("/user/{user_id}", response_model=List[ReviewWithPhotosResponse])
 def get_reviews_by_user(
     user_id: uuid.UUID,
+    response: Response,
+    sort: ReviewSort = "newest",
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     user=Depends(get_current_user)
 ):
     """
-    Returns all reviews created by a specific user, with photos.
+    Returns reviews created by a specific user, with photos, a page at a time.
     Useful for user profile pages.
+    - sort: newest, highest_rating, lowest_rating or most_photos
+    - limit: reviews per page
+    - cursor: X-Next-Cursor of the previous page (same sort)
     """
-    reviews = (
-        db.query(Review)
-        .filter(Review.user_id == user_id)
-        .order_by(Review.created_at.desc())
-        .all()
-    )
+    query = db.query(Review).filter(Review.user_id == user_id)
+    reviews = page_reviews(query, response, sort, limit, cursor)
     
-    results = []
-    for r in reviews:
-        photos = (
-            db.query(ReviewPhoto)
-            .filter(ReviewPhoto.review_id == r.id)
-            .all()
-        )
-        
-        results.append({
-            "review": r,
-            "photos": photos
-        })
-    
-    return results
+    return _with_photos(db, reviews)
 
 
 # ------------------------------------
@@ -211,33 +263,23 @@ def get_reviews_by_user(
 
 @router.get("/me/reviews", response_model=List[ReviewWithPhotosResponse])
 def get_my_reviews(
+    response: Response,
+    sort: ReviewSort = "newest",
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     user=Depends(get_current_user)
 ):
     """
-    Returns all reviews created by the authenticated user.
+    Returns reviews created by the authenticated user, a page at a time.
+    - sort: newest, highest_rating, lowest_rating or most_photos
+    - limit: reviews per page
+    - cursor: X-Next-Cursor of the previous page (same sort)
     """
-    reviews = (
-        db.query(Review)
-        .filter(Review.user_id == user.id)
-        .order_by(Review.created_at.desc())
-        .all()
-    )
-    
-    results = []
-    for r in reviews:
-        photos = (
-            db.query(ReviewPhoto)
-            .filter(ReviewPhoto.review_id == r.id)
-            .all()
-        )
-        
-        results.append({
-            "review": r,
-            "photos": photos
-        })
+    query = db.query(Review).filter(Review.user_id == user.id)
+    reviews = page_reviews(query, response, sort, limit, cursor)
     
-    return results
+    return _with_photos(db, reviews)
 
 
 
@@ -277,6 +319,7 @@ def update_review(
 
     db.commit()
     db.refresh(review)
+    from_thread.run(location_changes.announce, review.location_id)
 
     return review
 
@@ -304,8 +347,10 @@ def delete_review(
     if review.user_id != user.id:
         raise HTTPException(status_code=403, detail="Not your review")
 
+    location_id = review.location_id
     db.delete(review)
     db.commit()
+    from_thread.run(location_changes.announce, location_id)
 
     return {"message": "Review deleted"}
 
@@ -348,6 +393,8 @@ async def upload_review_photo(
     )
 
     db.add(photo)
+    # In SQL, so concurrent uploads do not lose a count
+    review.photo_count = Review.photo_count + 1
     db.commit()
     db.refresh(photo)
 
@@ -18,6 +18,7 @@ from app.models import (
     Tag,
 )
 from app.utils.security import get_current_user
+from app.utils.user_cache import user_directory
 from app.schemas.user import UserUpdate
 from app.schemas.location import LocationDetailResponse
 from pydantic import BaseModel
@@ -138,6 +139,7 @@ def update_my_profile(
 
     db.commit()
     db.refresh(db_user)
+    user_directory.invalidate(db_user.id)
 
     # Re-run the same profile generation as GET /users/me
     visit_rows = (
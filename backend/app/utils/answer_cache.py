@@ -0,0 +1,225 @@
+# app/utils/answer_cache.py
+"""
+Per-worker cache of chatbot answers, keyed by location and question.
+
+Visitors ask the same few questions about a place ("opening hours?",
+"how hard is the trail?"), so an answer is reused for ANSWER_CACHE_TTL
+seconds. Questions are normalized first (case, punctuation, filler
+words, simple suffixes), so "What are the opening hours?" and "what
+opening hour" share a key. The question words (what, where, when...)
+stay in the key: "Where can I park?" and "When can I park?" differ
+only in them. Failing an exact match, the location's cached questions
+with the same question words are compared by TF-IDF cosine similarity
+and the best one at ANSWER_CACHE_SIMILARITY or above is used.
+
+Only questions asked with at most ANSWER_CACHE_MAX_HISTORY earlier user
+turns are cached or answered from the cache, since later answers depend
+on the conversation. Updating or deleting a location drops its answers
+on every worker (app.utils.location_changes).
+
+At most ANSWER_CACHE_PER_LOCATION questions per location and
+ANSWER_CACHE_SIZE in total (LRU over locations).
+"""
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+import uuid
+from collections import Counter, OrderedDict
+
+from app.utils.location_changes import location_changes
+
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "21600"))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "20000"))
+ANSWER_CACHE_PER_LOCATION = int(os.getenv("ANSWER_CACHE_PER_LOCATION", "100"))
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.85"))
+ANSWER_CACHE_MAX_HISTORY = int(os.getenv("ANSWER_CACHE_MAX_HISTORY", "0"))
+
+# Words that do not change what a question is about (question words are
+# kept apart, see question_kind)
+STOPWORDS = frozenset(
+    """
+    a an the is are was were be been am do does did can could would will shall should may might
+    i me my we us our you your it its this that these those there here
+    of to in on at for from by with about as into
+    and or but so if then than
+    what whats which who whom how when where why
+    please pls hi hello hey thanks thank tell know want like just any some
+    """.split()
+)
+
+# Not content words, but they change what is asked about the content
+QUESTION_WORDS = {
+    "what": "what", "whats": "what", "which": "which", "who": "who", "whom": "who",
+    "how": "how", "when": "when", "where": "where", "why": "why",
+}
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def _stem(word: str) -> str:
+    for suffix in ("ing", "ed", "es", "s"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[: -len(suffix)]
+    return word
+
+
+def _words(text: str) -> list[str]:
+    return _WORD_RE.findall(unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode().lower())
+
+
+def question_terms(question: str) -> list[str]:
+    return [_stem(w) for w in _words(question) if w not in STOPWORDS]
+
+
+def question_kind(question: str) -> str:
+    """The question words asked, e.g. "how when"."""
+    return " ".join(sorted({QUESTION_WORDS[w] for w in _words(question) if w in QUESTION_WORDS}))
+
+
+def normalize_question(question: str) -> str:
+    """The exact-match key: question words, then content words, stemmed, in order."""
+    return f"{question_kind(question)}: {' '.join(question_terms(question))}"
+
+
+class _Entry:
+    __slots__ = ("answer", "expires_at", "kind", "terms")
+
+    def __init__(self, answer: str, expires_at: float, kind: str, terms: Counter):
+        self.answer = answer
+        self.expires_at = expires_at
+        self.kind = kind
+        self.terms = terms
+
+
+class AnswerCache:
+    def __init__(
+        self,
+        ttl: float = ANSWER_CACHE_TTL,
+        max_entries: int = ANSWER_CACHE_SIZE,
+        per_location: int = ANSWER_CACHE_PER_LOCATION,
+        similarity: float = ANSWER_CACHE_SIMILARITY,
+        max_history: int = ANSWER_CACHE_MAX_HISTORY,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.per_location = per_location
+        self.similarity = similarity
+        self.max_history = max_history
+        # location_id -> normalized question -> entry, both in LRU order
+        self._locations: OrderedDict[uuid.UUID, OrderedDict[str, _Entry]] = OrderedDict()
+        self._size = 0
+        # Document frequency of each term over all cached questions, for IDF
+        self._df: Counter = Counter()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    def applies(self, history: list) -> bool:
+        """Whether a question with this history may use the cache."""
+        return sum(1 for turn in history if turn.role == "user") <= self.max_history
+
+    def _idf(self, term: str) -> float:
+        return math.log((1 + self._size) / (1 + self._df[term])) + 1
+
+    def _cosine(self, a: Counter, b: Counter) -> float:
+        dot = sum(a[t] * b[t] * self._idf(t) ** 2 for t in a.keys() & b.keys())
+        if not dot:
+            return 0.0
+        norm_a = math.sqrt(sum((n * self._idf(t)) ** 2 for t, n in a.items()))
+        norm_b = math.sqrt(sum((n * self._idf(t)) ** 2 for t, n in b.items()))
+        return dot / (norm_a * norm_b)
+
+    def _forget(self, entry: _Entry) -> None:
+        for term in entry.terms:
+            left = self._df[term] - 1
+            if left:
+                self._df[term] = left
+            else:
+                del self._df[term]
+        self._size -= 1
+
+    def _remove(self, entries: OrderedDict, key: str) -> None:
+        self._forget(entries.pop(key))
+
+    def get(self, location_id: uuid.UUID, question: str) -> str | None:
+        terms = question_terms(question)
+        if not terms:
+            return None
+        kind = question_kind(question)
+        key = f"{kind}: {' '.join(terms)}"
+        now = time.monotonic()
+        with self._lock:
+            entries = self._locations.get(location_id)
+            if entries is not None:
+                entry = entries.get(key)
+                if entry is not None and entry.expires_at <= now:
+                    self._remove(entries, key)
+                    entry = None
+                if entry is None:
+                    wanted = Counter(terms)
+                    best, best_score = None, self.similarity
+                    for candidate_key, candidate in entries.items():
+                        if candidate.expires_at <= now or candidate.kind != kind:
+                            continue
+                        score = self._cosine(wanted, candidate.terms)
+                        if score >= best_score:
+                            best, best_score = candidate_key, score
+                    if best is not None:
+                        entry = entries[best]
+                        key = best
+                        self.near_hits += 1
+                else:
+                    self.hits += 1
+                if entry is not None:
+                    entries.move_to_end(key)
+                    self._locations.move_to_end(location_id)
+                    return entry.answer
+            self.misses += 1
+            return None
+
+    def put(self, location_id: uuid.UUID, question: str, answer: str) -> None:
+        terms = question_terms(question)
+        if not terms:
+            return
+        kind = question_kind(question)
+        key = f"{kind}: {' '.join(terms)}"
+        with self._lock:
+            entries = self._locations.setdefault(location_id, OrderedDict())
+            self._locations.move_to_end(location_id)
+            if key in entries:
+                self._remove(entries, key)
+            entries[key] = _Entry(answer, time.monotonic() + self.ttl, kind, Counter(terms))
+            self._df.update(entries[key].terms.keys())
+            self._size += 1
+            while len(entries) > self.per_location:
+                self._remove(entries, next(iter(entries)))
+            while self._size > self.max_entries:
+                oldest_id, oldest = next(iter(self._locations.items()))
+                self._remove(oldest, next(iter(oldest)))
+                if not oldest:
+                    del self._locations[oldest_id]
+
+    def invalidate(self, location_id: uuid.UUID) -> None:
+        """Drops this worker's answers for the location."""
+        with self._lock:
+            for entry in self._locations.pop(location_id, {}).values():
+                self._forget(entry)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.near_hits + self.misses
+        return {
+            "size": self._size,
+            "locations": len(self._locations),
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.near_hits) / lookups, 4) if lookups else None,
+        }
+
+
+answer_cache = AnswerCache()
+location_changes.listen(answer_cache.invalidate)
@@ -0,0 +1,167 @@
+# app/utils/chat_cache.py
+"""
+Hot tail cache for chat history.
+
+Keeps the newest TAIL_SIZE serialized messages of recently read rooms
+and locations in memory, so opening a chat screen does not query and
+join the database. A cached tail holds a pub/sub subscription to the
+room's chat channel and is appended from it, which keeps it current with
+messages written on any worker.
+
+A new tail is only served once it has been re-read from the database at
+least CHAT_TAIL_SETTLE_SECONDS after subscribing, so messages broadcast
+before the subscription but committed later (write-behind) are included.
+Capacity is CHAT_TAIL_CACHE_MESSAGES messages in total, LRU over rooms.
+
+load() runs in sync endpoints (threadpool); callbacks run on the loop.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Callable
+
+from anyio import from_thread
+
+from app.utils.chat_retention import MAX_MESSAGES
+from app.utils.pubsub import chat_channel, pubsub as default_pubsub
+
+logger = logging.getLogger(__name__)
+
+TAIL_SIZE = MAX_MESSAGES
+CACHE_MESSAGES = int(os.getenv("CHAT_TAIL_CACHE_MESSAGES", "50000"))
+SETTLE_SECONDS = float(os.getenv("CHAT_TAIL_SETTLE_SECONDS", "1"))
+
+
+class _Tail:
+    __slots__ = ("messages", "subscribed_at", "ready")
+
+    def __init__(self, size: int):
+        self.messages: deque[dict] = deque(maxlen=size)
+        self.subscribed_at: float | None = None
+        self.ready = False
+
+    def merge(self, rows: list[dict]) -> None:
+        by_id = {m["id"]: m for m in rows}
+        for message in self.messages:
+            by_id.setdefault(message["id"], message)
+        merged = sorted(by_id.values(), key=lambda m: (m["created_at"], m["id"]))
+        self.messages = deque(merged[-self.messages.maxlen:], maxlen=self.messages.maxlen)
+
+
+class ChatTailCache:
+    def __init__(
+        self,
+        namespace: str,
+        pubsub=None,
+        tail_size: int = TAIL_SIZE,
+        max_messages: int = CACHE_MESSAGES,
+        settle: float = SETTLE_SECONDS,
+    ):
+        self.namespace = namespace
+        self.pubsub = pubsub or default_pubsub
+        self.tail_size = tail_size
+        self.max_rooms = max(1, max_messages // tail_size)
+        self.settle = settle
+        self._tails: OrderedDict[uuid.UUID, _Tail] = OrderedDict()
+        self._rooms: dict[str, uuid.UUID] = {}  # channel -> room_id
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def latest(self, room_id: uuid.UUID, limit: int) -> list[dict] | None:
+        """The newest `limit` messages, oldest first, or None on a miss."""
+        if limit > self.tail_size:
+            return None
+        with self._lock:
+            tail = self._tails.get(room_id)
+            if tail is None or not tail.ready:
+                self.misses += 1
+                return None
+            self._tails.move_to_end(room_id)
+            self.hits += 1
+            messages = list(tail.messages)
+        if limit <= 0:
+            return []
+        return messages[-limit:]
+
+    def since(self, room_id: uuid.UUID, last_id: int) -> list[dict] | None:
+        """
+        Messages after the one with id `last_id`, oldest first, or None
+        unless the cached tail still holds it. Costs O(messages returned).
+        """
+        with self._lock:
+            tail = self._tails.get(room_id)
+            if tail is not None and tail.ready:
+                missed = []
+                for message in reversed(tail.messages):
+                    if message["id"] == last_id:
+                        self._tails.move_to_end(room_id)
+                        self.hits += 1
+                        missed.reverse()
+                        return missed
+                    missed.append(message)
+            self.misses += 1
+            return None
+
+    def load(self, room_id: uuid.UUID, fetch: Callable[[], list[dict]]) -> list[dict]:
+        """
+        Returns fetch() (the newest tail_size messages, oldest first, as
+        JSON-ready dicts) and merges it into the cached tail, subscribing
+        the room on first use.
+        """
+        channel = chat_channel(self.namespace, room_id)
+        evicted: list[uuid.UUID] = []
+        with self._lock:
+            tail = self._tails.get(room_id)
+            new = tail is None
+            if new:
+                tail = self._tails[room_id] = _Tail(self.tail_size)
+                self._rooms[channel] = room_id
+                while len(self._tails) > self.max_rooms:
+                    old, _ = self._tails.popitem(last=False)
+                    self._rooms.pop(chat_channel(self.namespace, old), None)
+                    evicted.append(old)
+
+        for old in evicted:
+            self._unsubscribe(chat_channel(self.namespace, old))
+
+        if new:
+            try:
+                from_thread.run(self.pubsub.subscribe, channel, self._on_message)
+            except Exception:
+                logger.exception("Chat tail cache could not subscribe to %s", channel)
+                with self._lock:
+                    self._tails.pop(room_id, None)
+                    self._rooms.pop(channel, None)
+                return fetch()
+            tail.subscribed_at = time.monotonic()
+
+        started = time.monotonic()
+        rows = fetch()
+        with self._lock:
+            if self._tails.get(room_id) is tail:
+                tail.merge(rows)
+                if tail.subscribed_at is not None and started >= tail.subscribed_at + self.settle:
+                    tail.ready = True
+        return rows
+
+    def _on_message(self, channel: str, data: str) -> None:
+        with self._lock:
+            room_id = self._rooms.get(channel)
+            tail = self._tails.get(room_id)
+            if tail is not None:
+                tail.messages.append(json.loads(data))
+
+    def _unsubscribe(self, channel: str) -> None:
+        try:
+            from_thread.run(self.pubsub.unsubscribe, channel, self._on_message)
+        except Exception:
+            logger.exception("Chat tail cache could not unsubscribe from %s", channel)
+
+
+room_tails = ChatTailCache("room")
+location_tails = ChatTailCache("location")
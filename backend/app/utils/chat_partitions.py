@@ -0,0 +1,219 @@
+# app/utils/chat_partitions.py
+"""
+Monthly partition maintenance for chat_messages and chat_room_messages.
+
+On PostgreSQL both tables are range-partitioned by month on created_at
+(migration 7b2e4c9d1a58). Once at startup and then every
+CHAT_PARTITION_INTERVAL seconds, one worker at a time (advisory lock):
+  - creates partitions up to CHAT_PARTITION_MONTHS_AHEAD months ahead
+  - archives partitions that ended more than the table's retention ago,
+    per CHAT_ARCHIVE_MODE:
+      "table" (default): detach and move to the chat_archive schema
+      "file": COPY to CHAT_ARCHIVE_DIR/<partition>.csv.gz, then drop
+      "drop": detach and drop
+
+Room chat keeps CHAT_ROOM_RETENTION_MONTHS (default 12, 0 keeps
+everything). Location chat is already pruned per location by
+chat_retention, and a quiet location's newest messages can be old, so
+its partitions are only archived if CHAT_LOCATION_RETENTION_MONTHS is set.
+
+Does nothing on other databases or on tables that are not partitioned
+(development create_all).
+"""
+import asyncio
+import gzip
+import logging
+import os
+import re
+from datetime import datetime, timezone
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from app.database import engine as default_engine
+
+logger = logging.getLogger(__name__)
+
+MAINTENANCE_INTERVAL = float(os.getenv("CHAT_PARTITION_INTERVAL", "86400"))  # seconds
+MONTHS_AHEAD = int(os.getenv("CHAT_PARTITION_MONTHS_AHEAD", "3"))
+ARCHIVE_MODE = os.getenv("CHAT_ARCHIVE_MODE", "table")
+ARCHIVE_DIR = os.getenv("CHAT_ARCHIVE_DIR", "archive/")
+ARCHIVE_SCHEMA = "chat_archive"
+
+# table -> months to keep (0: never archive)
+RETENTION_MONTHS = {
+    "chat_room_messages": int(os.getenv("CHAT_ROOM_RETENTION_MONTHS", "12")),
+    "chat_messages": int(os.getenv("CHAT_LOCATION_RETENTION_MONTHS", "0")),
+}
+
+# Any constant works, as long as nothing else uses it
+ADVISORY_LOCK_KEY = 0x63686174  # "chat"
+
+_UPPER_BOUND_RE = re.compile(r"TO \('([^']+)'\)")
+
+
+def month_start(value: datetime) -> datetime:
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month: datetime, n: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + n
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(table: str, month: datetime) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def _bound(value: datetime) -> str:
+    return value.strftime("'%Y-%m-%d %H:%M:%S+00'")
+
+
+def is_partitioned(conn: Connection, table: str) -> bool:
+    return conn.execute(
+        text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table)"),
+        {"table": table},
+    ).first() is not None
+
+
+def list_partitions(conn: Connection, table: str) -> list[tuple[str, datetime | None]]:
+    """(partition, exclusive upper bound) for each partition; None for MAXVALUE."""
+    rows = conn.execute(
+        text(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+            "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(:table)"
+        ),
+        {"table": table},
+    ).all()
+    partitions = []
+    for name, bound in rows:
+        match = _UPPER_BOUND_RE.search(bound or "")
+        upper = datetime.fromisoformat(match.group(1)).astimezone(timezone.utc) if match else None
+        partitions.append((name, upper))
+    return partitions
+
+
+def ensure_partitions(conn: Connection, table: str, now: datetime, months_ahead: int = MONTHS_AHEAD) -> list[str]:
+    """Creates missing monthly partitions from the current month on. Returns their names."""
+    covered = max((upper for _, upper in list_partitions(conn, table) if upper), default=None)
+    created = []
+    for n in range(months_ahead + 1):
+        start = add_months(month_start(now), n)
+        if covered is not None and start < covered:
+            continue  # already inside an existing partition (e.g. the legacy one)
+        name = partition_name(table, start)
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} "
+            f"FOR VALUES FROM ({_bound(start)}) TO ({_bound(add_months(start, 1))})"
+        ))
+        created.append(name)
+    return created
+
+
+def _detach(conn: Connection, table: str, name: str) -> None:
+    # CONCURRENTLY (PostgreSQL 14+) does not block queries on the parent
+    concurrently = " CONCURRENTLY" if conn.dialect.server_version_info >= (14,) else ""
+    conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}{concurrently}"))
+
+
+def _copy_to_file(conn: Connection, name: str, archive_dir: str) -> str:
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"{name}.csv.gz")
+    partial = path + ".part"
+    cursor = conn.connection.driver_connection.cursor()
+    try:
+        with gzip.open(partial, "wb") as f:
+            cursor.copy_expert(f"COPY {name} TO STDOUT WITH (FORMAT csv, HEADER)", f)
+    finally:
+        cursor.close()
+    os.replace(partial, path)
+    return path
+
+
+def archive_partitions(
+    conn: Connection,
+    table: str,
+    now: datetime,
+    retention_months: int,
+    mode: str = ARCHIVE_MODE,
+    archive_dir: str = ARCHIVE_DIR,
+) -> list[str]:
+    """Detaches and archives partitions that ended before the retention cutoff."""
+    if retention_months <= 0:
+        return []
+    cutoff = add_months(month_start(now), -retention_months)
+    archived = []
+    for name, upper in list_partitions(conn, table):
+        if upper is None or upper > cutoff:
+            continue
+        _detach(conn, table, name)
+        if mode == "file":
+            path = _copy_to_file(conn, name, archive_dir)
+            conn.execute(text(f"DROP TABLE {name}"))
+            logger.info("Archived %s to %s", name, path)
+        elif mode == "drop":
+            conn.execute(text(f"DROP TABLE {name}"))
+            logger.info("Dropped %s", name)
+        else:
+            conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}"))
+            conn.execute(text(f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}"))
+            logger.info("Moved %s to %s", name, ARCHIVE_SCHEMA)
+        archived.append(name)
+    return archived
+
+
+def maintain(engine: Engine = default_engine, now: datetime | None = None) -> dict:
+    """One maintenance pass. Returns {table: {"created": [...], "archived": [...]}}."""
+    if engine.dialect.name != "postgresql":
+        return {}
+    now = now or datetime.now(timezone.utc)
+    summary = {}
+    with engine.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        if not conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": ADVISORY_LOCK_KEY}).scalar():
+            return {}  # another worker is on it
+        try:
+            # Fail fast instead of queueing behind long queries on the parent
+            conn.execute(text("SET lock_timeout = '5s'"))
+            for table, retention in RETENTION_MONTHS.items():
+                if not is_partitioned(conn, table):
+                    continue
+                summary[table] = {
+                    "created": ensure_partitions(conn, table, now),
+                    "archived": archive_partitions(conn, table, now, retention),
+                }
+        finally:
+            conn.execute(text("RESET lock_timeout"))
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": ADVISORY_LOCK_KEY})
+    return summary
+
+
+class ChatPartitionMaintenance:
+    def __init__(self, engine: Engine = default_engine, interval: float = MAINTENANCE_INTERVAL):
+        self.engine = engine
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+
+    async def run(self) -> None:
+        while True:
+            try:
+                summary = await run_in_threadpool(maintain, self.engine)
+                if any(s["created"] or s["archived"] for s in summary.values()):
+                    logger.info("Chat partition maintenance: %s", summary)
+            except Exception:
+                logger.exception("Chat partition maintenance failed")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None and self.engine.dialect.name == "postgresql":
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+chat_partitions = ChatPartitionMaintenance()
@@ -0,0 +1,141 @@
+# app/utils/chat_retention.py
+"""
+Amortized retention for location chat.
+
+Writers only call record(); nothing is counted or deleted on the
+message path. Once a location has received RETENTION_SLACK new messages
+it is marked dirty, and the background sweeper trims every dirty
+location back to MAX_MESSAGES in one batch, off the event loop.
+
+The counts are per process and start at zero, so a location whose
+messages were spread over restarts or workers might never reach the
+slack in any one of them. The sweeper therefore also marks every
+location over the limit dirty, whatever was counted: on its first pass
+after startup and then every CHAT_RETENTION_FULL_INTERVAL seconds.
+"""
+import asyncio
+import logging
+import os
+import uuid
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models import ChatMessage
+
+logger = logging.getLogger(__name__)
+
+MAX_MESSAGES = 200   # Limit per location
+RETENTION_SLACK = int(os.getenv("CHAT_RETENTION_SLACK", "50"))
+SWEEP_INTERVAL = float(os.getenv("CHAT_RETENTION_INTERVAL", "30"))  # seconds
+FULL_SWEEP_INTERVAL = float(os.getenv("CHAT_RETENTION_FULL_INTERVAL", "3600"))  # seconds, 0 = never
+
+
+def prune_location(db: Session, location_id: uuid.UUID, keep: int = MAX_MESSAGES) -> int:
+    """
+    Deletes everything older than the `keep` newest messages of a
+    location in a single statement. Does not commit.
+    """
+    # created_at of the keep-th newest message
+    cutoff = (
+        select(ChatMessage.created_at)
+        .where(ChatMessage.location_id == location_id)
+        .order_by(ChatMessage.created_at.desc())
+        .offset(keep - 1)
+        .limit(1)
+        .scalar_subquery()
+    )
+    return (
+        db.query(ChatMessage)
+        .filter(
+            ChatMessage.location_id == location_id,
+            ChatMessage.created_at < cutoff,
+        )
+        .delete(synchronize_session=False)
+    )
+
+
+def over_limit(db: Session, keep: int = MAX_MESSAGES) -> list[uuid.UUID]:
+    """Locations holding more than `keep` messages."""
+    return list(db.scalars(
+        select(ChatMessage.location_id)
+        .group_by(ChatMessage.location_id)
+        .having(func.count() > keep)
+    ))
+
+
+class ChatRetention:
+    def __init__(self, keep: int = MAX_MESSAGES, slack: int = RETENTION_SLACK):
+        self.keep = keep
+        self.slack = slack
+        self._since_prune: dict[uuid.UUID, int] = {}
+        self._dirty: set[uuid.UUID] = set()
+        self._task: asyncio.Task | None = None
+
+    def record(self, location_id: uuid.UUID, count: int = 1) -> None:
+        """Counts new messages; O(1), no DB access."""
+        pending = self._since_prune.get(location_id, 0) + count
+        if pending >= self.slack:
+            self._dirty.add(location_id)
+            pending = 0
+        self._since_prune[location_id] = pending
+
+    def mark_over_limit(self) -> int:
+        """Marks every location over the limit dirty. Returns how many."""
+        db = SessionLocal()
+        try:
+            found = over_limit(db, self.keep)
+        finally:
+            db.close()
+        self._dirty.update(found)
+        return len(found)
+
+    def sweep(self) -> int:
+        """Prunes all dirty locations in one transaction. Returns rows deleted."""
+        if not self._dirty:
+            return 0
+
+        dirty, self._dirty = self._dirty, set()
+        db = SessionLocal()
+        try:
+            deleted = sum(prune_location(db, loc_id, self.keep) for loc_id in dirty)
+            db.commit()
+            return deleted
+        except Exception:
+            db.rollback()
+            self._dirty |= dirty  # retry on the next sweep
+            raise
+        finally:
+            db.close()
+
+    async def run(self, interval: float = SWEEP_INTERVAL, full_interval: float = FULL_SWEEP_INTERVAL) -> None:
+        loop = asyncio.get_running_loop()
+        next_full = loop.time()  # first pass after startup
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if full_interval and loop.time() >= next_full:
+                    next_full = loop.time() + full_interval
+                    await run_in_threadpool(self.mark_over_limit)
+                await run_in_threadpool(self.sweep)
+            except Exception:
+                logger.exception("Chat retention sweep failed")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        # Final flush so a clean shutdown leaves nothing over the limit
+        try:
+            await run_in_threadpool(self.sweep)
+        except Exception:
+            logger.exception("Chat retention sweep failed")
+
+
+chat_retention = ChatRetention()
@@ -0,0 +1,202 @@
+# app/utils/chat_writer.py
+"""
+Write-behind persistence for websocket chat messages.
+
+Websocket handlers hand rows to chat_writer.submit() instead of opening a
+session per frame. Ids come from blocks reserved ahead of time and
+timestamps are assigned on submit, so a message can be broadcast before
+it is stored. A background task flushes pending rows every
+CHAT_FLUSH_INTERVAL_MS or CHAT_FLUSH_MAX_BATCH rows, as one multi-row
+INSERT per table in a threadpool.
+
+CHAT_WRITE_DURABILITY:
+  - "async": submit() returns immediately; rows are written on the next flush
+  - "group": submit() returns once the batch containing the row is committed
+  - "sync":  every row is committed on its own before submit() returns
+"""
+import asyncio
+import logging
+import os
+from collections import deque
+from datetime import datetime, timezone
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.database import Base, SessionLocal, engine
+from app.models import ChatMessage, ChatRoomMessage
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL_MS = int(os.getenv("CHAT_FLUSH_INTERVAL_MS", "50"))
+FLUSH_MAX_BATCH = int(os.getenv("CHAT_FLUSH_MAX_BATCH", "500"))
+DURABILITY = os.getenv("CHAT_WRITE_DURABILITY", "async")
+ID_BLOCK_SIZE = int(os.getenv("CHAT_ID_BLOCK_SIZE", "1000"))
+
+
+class IdAllocator:
+    """
+    Hands out primary keys for one table from blocks reserved in advance.
+
+    On PostgreSQL a block is drawn from the table's sequence, so ids never
+    collide with other workers or regular INSERTs. Other databases take
+    one id at a time past MAX(id), which is only safe with a single
+    process (dev).
+    """
+
+    def __init__(self, model: type[Base], block_size: int = ID_BLOCK_SIZE):
+        self.model = model
+        self.block_size = block_size
+        self._ids: deque[int] = deque()
+        self._lock = asyncio.Lock()
+        self._next_local: int | None = None
+
+    def _reserve(self) -> list[int]:
+        table = self.model.__tablename__
+        with engine.connect() as conn:
+            if engine.dialect.name == "postgresql":
+                rows = conn.execute(
+                    text(f"SELECT nextval(pg_get_serial_sequence('{table}', 'id')) FROM generate_series(1, :n)"),
+                    {"n": self.block_size},
+                )
+                return [row[0] for row in rows]
+
+            current = conn.execute(select(func.max(self.model.id))).scalar() or 0
+        # Skip past ids handed out but not yet flushed
+        next_id = max(current + 1, self._next_local or 0)
+        self._next_local = next_id + 1
+        return [next_id]
+
+    async def next_id(self) -> int:
+        if not self._ids:
+            async with self._lock:
+                if not self._ids:
+                    self._ids.extend(await run_in_threadpool(self._reserve))
+        return self._ids.popleft()
+
+
+class ChatWriteBehind:
+    def __init__(
+        self,
+        interval_ms: int = FLUSH_INTERVAL_MS,
+        max_batch: int = FLUSH_MAX_BATCH,
+        durability: str = DURABILITY,
+    ):
+        if durability not in ("async", "group", "sync"):
+            raise ValueError(f"Unknown CHAT_WRITE_DURABILITY: {durability}")
+        self.interval = interval_ms / 1000
+        self.max_batch = max_batch
+        self.durability = durability
+        self.ids = {
+            ChatMessage: IdAllocator(ChatMessage),
+            ChatRoomMessage: IdAllocator(ChatRoomMessage),
+        }
+        # (model, row, future-or-None)
+        self._pending: list[tuple[type[Base], dict, asyncio.Future | None]] = []
+        self._kick: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self.written = 0
+        self.dropped = 0
+
+    async def prepare(self, model: type[Base], **values) -> dict:
+        """Builds a row with its id and created_at assigned, ready to broadcast."""
+        values["id"] = await self.ids[model].next_id()
+        # Aware, like rows read back from the timestamptz column
+        values["created_at"] = datetime.now(timezone.utc)
+        return values
+
+    async def submit(self, model: type[Base], row: dict) -> None:
+        """
+        Queues a prepared row for writing. Depending on durability, waits
+        for it to be committed; raises if that write failed.
+        """
+        if self.durability == "sync":
+            await run_in_threadpool(self._write, [(model, row, None)])
+            return
+
+        future = asyncio.get_running_loop().create_future() if self.durability == "group" else None
+        self._pending.append((model, row, future))
+        if self._task is None:
+            # No flusher running (e.g. scripts): write through
+            await self.flush()
+        elif len(self._pending) >= self.max_batch:
+            self._kick.set()
+        if future is not None:
+            await future
+
+    async def flush(self) -> None:
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        try:
+            failed = await run_in_threadpool(self._write, batch)
+        except Exception as e:
+            logger.exception("Chat write-behind flush failed; %d messages lost", len(batch))
+            self.dropped += len(batch)
+            for _, _, future in batch:
+                if future is not None and not future.done():
+                    future.set_exception(e)
+            return
+
+        for position, (_, row, future) in enumerate(batch):
+            if future is None or future.done():
+                continue
+            if position in failed:
+                future.set_exception(RuntimeError(f"Chat message {row['id']} was rejected by the database"))
+            else:
+                future.set_result(None)
+
+    def _write(self, batch: list) -> set[int]:
+        """Writes a batch; returns the positions of rows that were dropped."""
+        rows_by_model: dict[type[Base], list[dict]] = {}
+        for model, row, _ in batch:
+            rows_by_model.setdefault(model, []).append(row)
+
+        failed: set[int] = set()
+        db = SessionLocal()
+        try:
+            # One multi-row INSERT per table, one commit per batch
+            for model, rows in rows_by_model.items():
+                db.execute(insert(model), rows)
+            db.commit()
+        except SQLAlchemyError:
+            db.rollback()
+            # Isolate rows that violate a constraint instead of losing the batch
+            for position, (model, row, _) in enumerate(batch):
+                try:
+                    db.execute(insert(model), [row])
+                    db.commit()
+                except SQLAlchemyError:
+                    db.rollback()
+                    failed.add(position)
+                    logger.warning("Dropping chat message %s for %s", row["id"], model.__tablename__)
+        finally:
+            db.close()
+
+        self.written += len(batch) - len(failed)
+        self.dropped += len(failed)
+        return failed
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._kick.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._kick.clear()
+            await self.flush()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._kick = asyncio.Event()
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+
+chat_writer = ChatWriteBehind()
@@ -0,0 +1,171 @@
+# app/utils/llm.py
+"""
+LLM backends for the chatbot, chosen with CHATBOT_BACKEND:
+
+  "deepseek" (default)  api.deepseek.com with DEEPSEEK_API_KEY
+  "openai"              any OpenAI-compatible server, e.g. a local
+                        vLLM / llama.cpp / Ollama: CHATBOT_OPENAI_BASE_URL
+                        (default http://localhost:8000/v1) and optional
+                        CHATBOT_OPENAI_API_KEY
+  "fake"                no network: a deterministic reply per question,
+                        streamed at a configurable pace, for CI and load tests
+
+CHATBOT_MODEL overrides the model name sent upstream (deepseek-chat
+for DeepSeek, "default" for OpenAI-compatible servers).
+
+Every backend has complete(messages) -> str and stream(messages), an
+async iterator of text pieces; both raise UpstreamError on failure.
+Network backends go through app.utils.upstream.UpstreamClient (pooling,
+retries, circuit breaker).
+"""
+import asyncio
+import hashlib
+import json
+import os
+from typing import AsyncIterator
+
+from app.utils.upstream import UPSTREAM_URL, UpstreamClient
+
+
+class LLMBackend:
+    name = "base"
+
+    @property
+    def configured(self) -> bool:
+        return True
+
+    async def complete(self, messages: list[dict[str, str]]) -> str:
+        raise NotImplementedError
+
+    def stream(self, messages: list[dict[str, str]]) -> AsyncIterator[str]:
+        raise NotImplementedError
+
+    def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {"backend": self.name}
+
+
+class OpenAICompatibleBackend(LLMBackend):
+    """POST {base_url}/chat/completions, as served by OpenAI, DeepSeek, vLLM, llama.cpp, ..."""
+
+    name = "openai"
+
+    def __init__(self, base_url: str, api_key: str | None, model: str, upstream: UpstreamClient | None = None):
+        self.api_key = api_key
+        self.model = model
+        self.upstream = upstream or UpstreamClient(base_url=base_url)
+        self.headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+
+    async def complete(self, messages: list[dict[str, str]]) -> str:
+        payload = {"model": self.model, "messages": messages, "stream": False}
+        data = await self.upstream.post_json("/chat/completions", payload, self.headers)
+        return data.get("choices", [{}])[0].get("message", {}).get("content", "I can help you explore!")
+
+    async def stream(self, messages: list[dict[str, str]]) -> AsyncIterator[str]:
+        payload = {"model": self.model, "messages": messages, "stream": True}
+        lines = self.upstream.stream_lines("/chat/completions", payload, self.headers)
+        try:
+            async for line in lines:
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                try:
+                    text = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                except (ValueError, KeyError, IndexError, AttributeError):
+                    continue
+                if text:
+                    yield text
+        finally:
+            await lines.aclose()
+
+    def start(self) -> None:
+        self.upstream.start()
+
+    async def stop(self) -> None:
+        await self.upstream.stop()
+
+    def stats(self) -> dict:
+        return {"backend": self.name, **self.upstream.stats()}
+
+
+class DeepSeekBackend(OpenAICompatibleBackend):
+    name = "deepseek"
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.api_key)
+
+
+FAKE_WORDS = (
+    "the view from the top is best in the early morning, bring water and comfortable shoes; "
+    "the nearest bus stop is a short walk away and the cafe by the entrance serves good coffee. "
+    "weekends are busy, so arrive before ten if you can, and check the weather before you go."
+).split()
+
+
+class FakeBackend(LLMBackend):
+    """
+    Deterministic stand-in: the same messages always get the same reply.
+    Waits `first_token` seconds, then yields `tokens` words `token_delay`
+    seconds apart, roughly like a hosted model.
+    """
+
+    name = "fake"
+
+    def __init__(self, first_token: float = 0.2, token_delay: float = 0.01, tokens: int = 40):
+        self.first_token = first_token
+        self.token_delay = token_delay
+        self.tokens = tokens
+        self.calls = 0
+
+    def _words(self, messages: list[dict[str, str]]) -> list[str]:
+        question = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+        seed = int.from_bytes(hashlib.sha1(question.encode()).digest()[:4], "big")
+        words = [FAKE_WORDS[(seed + n * 7) % len(FAKE_WORDS)] for n in range(self.tokens)]
+        words[0] = words[0].capitalize()
+        return words
+
+    async def complete(self, messages: list[dict[str, str]]) -> str:
+        self.calls += 1
+        words = self._words(messages)
+        await asyncio.sleep(self.first_token + self.token_delay * (len(words) - 1))
+        return " ".join(words)
+
+    async def stream(self, messages: list[dict[str, str]]) -> AsyncIterator[str]:
+        self.calls += 1
+        await asyncio.sleep(self.first_token)
+        for n, word in enumerate(self._words(messages)):
+            if n:
+                await asyncio.sleep(self.token_delay)
+            yield word if n == 0 else " " + word
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "calls": self.calls}
+
+
+def build_backend() -> LLMBackend:
+    kind = os.getenv("CHATBOT_BACKEND", "deepseek")
+    model = os.getenv("CHATBOT_MODEL")
+    if kind == "fake":
+        return FakeBackend(
+            first_token=float(os.getenv("CHATBOT_FAKE_FIRST_TOKEN_MS", "200")) / 1000,
+            token_delay=float(os.getenv("CHATBOT_FAKE_TOKEN_MS", "10")) / 1000,
+            tokens=int(os.getenv("CHATBOT_FAKE_TOKENS", "40")),
+        )
+    if kind == "openai":
+        return OpenAICompatibleBackend(
+            os.getenv("CHATBOT_OPENAI_BASE_URL", "http://localhost:8000/v1"),
+            os.getenv("CHATBOT_OPENAI_API_KEY"),
+            model or "default",
+        )
+    return DeepSeekBackend(UPSTREAM_URL, os.getenv("DEEPSEEK_API_KEY"), model or "deepseek-chat")
+
+
+llm_backend = build_backend()
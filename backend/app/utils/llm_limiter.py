@@ -0,0 +1,116 @@
+# app/utils/llm_limiter.py
+"""
+Bounds chatbot generations per worker.
+
+  - each user may have CHATBOT_USER_CONCURRENCY replies in progress;
+    admit() refuses more and the endpoint answers 429
+  - at most CHATBOT_CONCURRENCY generations run at once; the others wait
+    for a slot in arrival order
+  - every reply has a deadline, CHATBOT_DEADLINE seconds after it was
+    admitted, covering both the wait and the generation
+
+stats() reports how long replies waited for a slot (queue_ms, over the
+last QUEUE_SAMPLES), how many are waiting or running, and how many were
+refused or ran out of time.
+"""
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict
+
+CONCURRENCY = int(os.getenv("CHATBOT_CONCURRENCY", "16"))
+USER_CONCURRENCY = int(os.getenv("CHATBOT_USER_CONCURRENCY", "2"))
+DEADLINE = float(os.getenv("CHATBOT_DEADLINE", "45"))
+
+QUEUE_SAMPLES = 1000
+
+
+def _percentile(ordered: list[float], fraction: float) -> float:
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+class LLMLimiter:
+    def __init__(
+        self, concurrency: int = CONCURRENCY, per_user: int = USER_CONCURRENCY, deadline: float = DEADLINE
+    ):
+        self.concurrency = concurrency
+        self.per_user = per_user
+        self.timeout = deadline
+        self._slots = asyncio.Semaphore(concurrency)
+        self._per_user: Dict[str, int] = {}
+        self._queue_ms: deque[float] = deque(maxlen=QUEUE_SAMPLES)
+        self.queued = 0
+        self.in_flight = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def admit(self, user_key: str) -> bool:
+        """Counts a reply for the user; False if they are at the cap."""
+        count = self._per_user.get(user_key, 0)
+        if self.per_user and count >= self.per_user:
+            self.rejected += 1
+            return False
+        self._per_user[user_key] = count + 1
+        return True
+
+    def leave(self, user_key: str) -> None:
+        count = self._per_user.get(user_key, 0) - 1
+        if count > 0:
+            self._per_user[user_key] = count
+        else:
+            self._per_user.pop(user_key, None)
+
+    def deadline(self) -> float:
+        """Event-loop time by which a reply admitted now must be done."""
+        return asyncio.get_running_loop().time() + self.timeout
+
+    @asynccontextmanager
+    async def slot(self, deadline: float) -> AsyncIterator[None]:
+        """
+        Holds a generation slot, waiting for one until `deadline` at the
+        latest (raises TimeoutError).
+        """
+        started = time.perf_counter()
+        self.queued += 1
+        try:
+            async with asyncio.timeout_at(deadline):
+                await self._slots.acquire()
+        except TimeoutError:
+            self.timed_out += 1
+            raise
+        finally:
+            self.queued -= 1
+        self._queue_ms.append((time.perf_counter() - started) * 1000)
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+    def expired(self) -> None:
+        """A generation that ran past its deadline."""
+        self.timed_out += 1
+
+    def stats(self) -> dict:
+        waits = sorted(self._queue_ms)
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "users": len(self._per_user),
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "queue_ms": {
+                "p50": round(_percentile(waits, 0.5), 1),
+                "p95": round(_percentile(waits, 0.95), 1),
+                "p99": round(_percentile(waits, 0.99), 1),
+                "max": round(waits[-1], 1),
+            }
+            if waits
+            else None,
+        }
+
+
+llm_limiter = LLMLimiter()
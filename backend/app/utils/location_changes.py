@@ -0,0 +1,64 @@
+# app/utils/location_changes.py
+"""
+Tells per-worker caches that a location, its tags or its reviews changed.
+
+Caches derived from a location (chatbot answers, the chatbot's location
+context, the retrieval index) register a handler with listen(). announce() runs the handlers
+on this worker at once and publishes the location id on the chat pub/sub
+channel "chat:locations:changed", so every other worker runs them too.
+Messages carry the sender's worker id, and a worker skips its own (the
+backends deliver them back to it).
+"""
+import json
+import logging
+import uuid
+from typing import Callable
+
+from app.utils.pubsub import chat_channel, pubsub as default_pubsub
+
+logger = logging.getLogger(__name__)
+
+
+class LocationChanges:
+    def __init__(self, pubsub=None):
+        self.pubsub = pubsub or default_pubsub
+        self.channel = chat_channel("locations", "changed")
+        self._handlers: list[Callable[[uuid.UUID], None]] = []
+        self.worker_id = uuid.uuid4().hex[:12]
+
+    def listen(self, handler: Callable[[uuid.UUID], None]) -> None:
+        self._handlers.append(handler)
+
+    def _notify(self, location_id: uuid.UUID) -> None:
+        for handler in self._handlers:
+            try:
+                handler(location_id)
+            except Exception:
+                logger.exception("Location change handler %r failed", handler)
+
+    async def announce(self, location_id: uuid.UUID) -> None:
+        self._notify(location_id)
+        try:
+            await self.pubsub.publish(self.channel, json.dumps({"w": self.worker_id, "id": str(location_id)}))
+        except Exception:
+            logger.exception("Could not announce change of location %s", location_id)
+
+    def _on_message(self, channel: str, data: str) -> None:
+        message = json.loads(data)
+        if message["w"] != self.worker_id:
+            self._notify(uuid.UUID(message["id"]))
+
+    async def start(self) -> None:
+        try:
+            await self.pubsub.subscribe(self.channel, self._on_message)
+        except Exception:
+            logger.exception("Could not subscribe to %s", self.channel)
+
+    async def stop(self) -> None:
+        try:
+            await self.pubsub.unsubscribe(self.channel, self._on_message)
+        except Exception:
+            logger.exception("Could not unsubscribe from %s", self.channel)
+
+
+location_changes = LocationChanges()
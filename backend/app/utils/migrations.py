@@ -0,0 +1,60 @@
+# app/utils/migrations.py
+import os
+import re
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+VERSIONS_DIR = os.path.join(BACKEND_DIR, "alembic", "versions")
+
+_REVISION_RE = re.compile(r"^revision\b[^=]*=\s*(.+)$", re.MULTILINE)
+_DOWN_REVISION_RE = re.compile(r"^down_revision\b[^=]*=\s*(.+)$", re.MULTILINE)
+_QUOTED_RE = re.compile(r"['\"]([^'\"]+)['\"]")
+
+
+def get_head_revisions(versions_dir: str = VERSIONS_DIR) -> set[str]:
+    """
+    Reads the head revision(s) straight from the migration scripts.
+    Avoids importing alembic (and Mako) on the boot path.
+    """
+    revisions: set[str] = set()
+    parents: set[str] = set()
+
+    for filename in os.listdir(versions_dir):
+        if not filename.endswith(".py"):
+            continue
+        with open(os.path.join(versions_dir, filename), encoding="utf-8") as f:
+            source = f.read()
+
+        revision = _REVISION_RE.search(source)
+        if not revision:
+            continue
+        revisions.update(_QUOTED_RE.findall(revision.group(1)))
+
+        down_revision = _DOWN_REVISION_RE.search(source)
+        if down_revision:
+            parents.update(_QUOTED_RE.findall(down_revision.group(1)))
+
+    return revisions - parents
+
+
+def verify_migration_head(engine: Engine) -> None:
+    """
+    Fails fast unless the database has been migrated to the current head.
+    A single-row lookup instead of reflecting every table on boot.
+    """
+    heads = get_head_revisions()
+
+    try:
+        with engine.connect() as conn:
+            current = set(conn.execute(text("SELECT version_num FROM alembic_version")).scalars())
+    except SQLAlchemyError as e:
+        raise RuntimeError(f"Could not read alembic_version: {e}") from e
+
+    if current != heads:
+        raise RuntimeError(
+            f"Database is at revision {sorted(current)}, expected {sorted(heads)}. "
+            "Run `alembic upgrade head` before starting the server."
+        )
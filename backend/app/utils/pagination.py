@@ -0,0 +1,44 @@
+# app/utils/pagination.py
+"""
+Opaque keyset cursors.
+
+A cursor is the sort key of a row (e.g. (created_at, id)) as URL-safe
+base64 JSON. Clients pass it back unchanged; routers decode it with the
+expected types and compare with tuple_() so the index does the paging.
+"""
+import base64
+import binascii
+import json
+import uuid
+from datetime import datetime
+
+
+def _to_json(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+def _from_json(kind: type, value):
+    if kind is datetime:
+        return datetime.fromisoformat(value)
+    return kind(value)
+
+
+def encode_cursor(*values) -> str:
+    raw = json.dumps([_to_json(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *types: type) -> tuple:
+    """Inverse of encode_cursor(). Raises ValueError if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError
+        return tuple(_from_json(kind, value) for kind, value in zip(types, values))
+    except (ValueError, TypeError, binascii.Error, UnicodeDecodeError):
+        raise ValueError(f"Invalid cursor: {cursor!r}") from None
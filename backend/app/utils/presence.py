@@ -0,0 +1,243 @@
+# app/utils/presence.py
+"""
+Presence for chat rooms: who is online and who is typing.
+
+Nothing is broadcast per event. A socket's user counts as online while
+the socket is open and has sent any frame (message, "ping" or "typing")
+in the last PRESENCE_TTL seconds; "typing" marks the user as typing for
+PRESENCE_TYPING_TTL seconds. These calls only update local state.
+
+Every PRESENCE_INTERVAL seconds each worker publishes its own members
+for the rooms it has sockets in (when they changed, and as a keepalive
+every KEEPALIVE_EVERY ticks), merges them with the other workers'
+snapshots and sends its local sockets one diff frame per room, and only
+if something changed:
+
+    {"type": "presence", "online": 12,
+     "joined": [{"user_id": "...", "username": "..."}],
+     "left": ["<user_id>"], "typing": ["<user_id>"]}
+
+A socket gets the full member list once, right after connecting, in the
+same shape with "members" instead of "joined"/"left". A burst of typing
+events from any number of users costs one frame per room per interval.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Dict
+
+from fastapi import WebSocket
+
+from app.utils.pubsub import chat_channel
+from app.utils.ws_connections import ConnectionManager, Client, dumps
+
+logger = logging.getLogger(__name__)
+
+PRESENCE_INTERVAL = float(os.getenv("PRESENCE_INTERVAL", "2"))  # seconds
+PRESENCE_TTL = float(os.getenv("PRESENCE_TTL", "60"))
+PRESENCE_TYPING_TTL = float(os.getenv("PRESENCE_TYPING_TTL", "4"))
+KEEPALIVE_EVERY = 5  # ticks between unchanged snapshots
+
+
+class _Member:
+    __slots__ = ("user_id", "username", "last_seen")
+
+    def __init__(self, user_id: str, username: str | None, last_seen: float):
+        self.user_id = user_id
+        self.username = username
+        self.last_seen = last_seen
+
+
+class _Room:
+    __slots__ = ("sockets", "typing", "published", "quiet_ticks", "remote", "view", "typing_view")
+
+    def __init__(self):
+        self.sockets: Dict[WebSocket, _Member] = {}
+        self.typing: Dict[str, float] = {}  # user_id -> expires_at
+        # Last snapshot this worker published, None forces a publish
+        self.published: tuple[dict, list] | None = None
+        self.quiet_ticks = 0
+        # worker_id -> (members, typing, expires_at)
+        self.remote: Dict[str, tuple[dict, list, float]] = {}
+        # What local clients were last told
+        self.view: Dict[str, str | None] = {}
+        self.typing_view: list[str] = []
+
+
+class PresenceTracker:
+    def __init__(
+        self,
+        manager: ConnectionManager,
+        pubsub=None,
+        interval: float = PRESENCE_INTERVAL,
+        ttl: float = PRESENCE_TTL,
+        typing_ttl: float = PRESENCE_TYPING_TTL,
+    ):
+        self.manager = manager
+        self.pubsub = pubsub or manager.pubsub
+        self.namespace = f"presence:{manager.namespace}"
+        self.interval = interval
+        self.ttl = ttl
+        self.typing_ttl = typing_ttl
+        self.worker_id = uuid.uuid4().hex[:12]
+        self._rooms: Dict[uuid.UUID, _Room] = {}
+        self._channels: Dict[str, uuid.UUID] = {}  # channel -> room_id
+        self._task: asyncio.Task | None = None
+
+    def channel(self, room_id: uuid.UUID) -> str:
+        return chat_channel(self.namespace, room_id)
+
+    def online(self, room_id: uuid.UUID) -> int:
+        """Members as of the last tick, across all workers."""
+        room = self._rooms.get(room_id)
+        return len(room.view) if room is not None else 0
+
+    async def watch(self, room_id: uuid.UUID, client: Client) -> None:
+        """Sends a newly connected socket the current member list."""
+        room = self._rooms.get(room_id)
+        if room is None:
+            room = self._rooms[room_id] = _Room()
+            channel = self.channel(room_id)
+            self._channels[channel] = room_id
+            try:
+                await self.pubsub.subscribe(channel, self._on_message)
+                # Ask the other workers for their members now, not at their next keepalive
+                await self.pubsub.publish(channel, dumps({"w": self.worker_id, "r": 1}))
+            except Exception:
+                logger.exception("Presence could not subscribe to %s", channel)
+        client.offer_json({
+            "type": "presence",
+            "online": len(room.view),
+            "members": [{"user_id": k, "username": v} for k, v in room.view.items()],
+            "typing": room.typing_view,
+        })
+
+    def touch(
+        self,
+        room_id: uuid.UUID,
+        websocket: WebSocket,
+        user_id: uuid.UUID,
+        username: str | None,
+        typing: bool | None = None,
+    ) -> None:
+        """
+        Marks the socket's user as seen. typing=True starts (or extends)
+        a typing indicator, False clears it, None leaves it alone. O(1).
+        """
+        room = self._rooms.get(room_id)
+        if room is None:
+            return
+        now = time.monotonic()
+        key = str(user_id)
+        member = room.sockets.get(websocket)
+        if member is None or member.user_id != key:
+            room.sockets[websocket] = _Member(key, username, now)
+        else:
+            member.last_seen = now
+        if typing:
+            room.typing[key] = now + self.typing_ttl
+        elif typing is False:
+            room.typing.pop(key, None)
+
+    def leave(self, room_id: uuid.UUID, websocket: WebSocket) -> None:
+        room = self._rooms.get(room_id)
+        if room is not None:
+            room.sockets.pop(websocket, None)
+
+    def _on_message(self, channel: str, data: str) -> None:
+        room = self._rooms.get(self._channels.get(channel))
+        if room is None:
+            return
+        snapshot = json.loads(data)
+        worker = snapshot.get("w")
+        if worker == self.worker_id:
+            return
+        if snapshot.get("r"):
+            room.published = None
+            return
+        members = snapshot.get("m") or {}
+        if members:
+            expires = time.monotonic() + self.interval * KEEPALIVE_EVERY * 2
+            room.remote[worker] = (members, snapshot.get("t") or [], expires)
+        else:
+            room.remote.pop(worker, None)
+
+    def _local_snapshot(self, room: _Room, now: float) -> tuple[dict, list]:
+        cutoff = now - self.ttl
+        members = {
+            m.user_id: m.username for m in room.sockets.values() if m.last_seen >= cutoff
+        }
+        for user_id in [u for u, expires in room.typing.items() if expires <= now]:
+            del room.typing[user_id]
+        typing = sorted(u for u in room.typing if u in members)
+        return members, typing
+
+    async def _tick_room(self, room_id: uuid.UUID, room: _Room, now: float) -> None:
+        channel = self.channel(room_id)
+        if not room.sockets and room_id not in self.manager.active_connections:
+            # Last local socket is gone: tell the others, then stop listening
+            if room.published and room.published[0]:
+                await self.pubsub.publish(channel, dumps({"w": self.worker_id, "m": {}, "t": []}))
+            self._rooms.pop(room_id, None)
+            self._channels.pop(channel, None)
+            await self.pubsub.unsubscribe(channel, self._on_message)
+            return
+
+        members, typing = self._local_snapshot(room, now)
+        room.quiet_ticks += 1
+        if (members, typing) != room.published or room.quiet_ticks >= KEEPALIVE_EVERY:
+            if members or room.published is None or room.published[0]:
+                await self.pubsub.publish(
+                    channel, dumps({"w": self.worker_id, "m": members, "t": typing})
+                )
+            room.published = (members, typing)
+            room.quiet_ticks = 0
+
+        merged = dict(members)
+        typing_all = set(typing)
+        for worker, (remote_members, remote_typing, expires) in list(room.remote.items()):
+            if expires <= now:
+                del room.remote[worker]
+                continue
+            merged.update(remote_members)
+            typing_all.update(remote_typing)
+
+        joined = [{"user_id": k, "username": v} for k, v in merged.items() if k not in room.view]
+        left = [k for k in room.view if k not in merged]
+        typing_list = sorted(typing_all)
+        if not joined and not left and typing_list == room.typing_view:
+            return
+        room.view = merged
+        room.typing_view = typing_list
+        self.manager.send_local(room_id, dumps({
+            "type": "presence",
+            "online": len(merged),
+            "joined": joined,
+            "left": left,
+            "typing": typing_list,
+        }))
+
+    async def tick(self) -> None:
+        now = time.monotonic()
+        for room_id, room in list(self._rooms.items()):
+            try:
+                await self._tick_room(room_id, room, now)
+            except Exception:
+                logger.exception("Presence update failed for %s", room_id)
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.tick()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
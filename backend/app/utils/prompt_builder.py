@@ -0,0 +1,213 @@
+# app/utils/prompt_builder.py
+"""
+Chatbot prompt assembly within a token budget.
+
+The start of every prompt for a location (system prompt, greeting and
+location context) is built once and kept per worker in
+location_contexts, together with its token count; updating or deleting
+the location drops it (app.utils.location_changes).
+
+build_prompt() then adds snippets retrieved for the question
+(app.utils.retrieval, up to CHATBOT_RETRIEVAL_TOKENS), the visitor's
+message and as much of the conversation as fits in
+CHATBOT_PROMPT_TOKENS, newest turns first.
+Older turns that do not fit are replaced by one short note listing what
+the visitor asked earlier (at most CHATBOT_SUMMARY_TOKENS), so the
+model keeps the thread without the full text.
+
+Tokens are estimated locally (count_tokens) the way BPE tokenizers
+usually split text, without downloading a vocabulary.
+"""
+import os
+import re
+import threading
+import uuid
+from collections import OrderedDict
+from functools import lru_cache
+
+from app.models import Location
+from app.utils.location_changes import location_changes
+
+PROMPT_TOKENS = int(os.getenv("CHATBOT_PROMPT_TOKENS", "3000"))
+SUMMARY_TOKENS = int(os.getenv("CHATBOT_SUMMARY_TOKENS", "200"))
+RETRIEVAL_TOKENS = int(os.getenv("CHATBOT_RETRIEVAL_TOKENS", "600"))
+CONTEXT_CACHE_SIZE = int(os.getenv("CHATBOT_CONTEXT_CACHE_SIZE", "10000"))
+
+# Role markers and separators the API adds around each message
+MESSAGE_OVERHEAD = 4
+SUMMARY_QUESTION_CHARS = 80
+
+SYSTEM_PROMPT = (
+    "You are a friendly, knowledgeable tour guide for this destination. "
+    "Keep responses concise, helpful, and focused on the location."
+)
+
+_PIECE_RE = re.compile(r"[A-Za-z]+|\d{1,3}|[^\sA-Za-z\d]")
+_LONG_WORD_RE = re.compile(r"[A-Za-z]{7,}")
+
+
+# Clients resend the whole history with every message, so most turns
+# have been counted before
+@lru_cache(maxsize=4096)
+def count_tokens(text: str) -> int:
+    """
+    BPE-style estimate: a short English word is one token and longer
+    ones one more per 6 letters, numbers one per 3 digits, and every
+    other character (punctuation, non-Latin script) one each.
+    """
+    return len(_PIECE_RE.findall(text)) + sum((len(w) - 1) // 6 for w in _LONG_WORD_RE.findall(text))
+
+
+def message_tokens(message: dict[str, str]) -> int:
+    return count_tokens(message["content"]) + MESSAGE_OVERHEAD
+
+
+def location_context(location: Location) -> list[dict[str, str]]:
+    """The messages every prompt for this location starts with."""
+    context = " ".join(
+        part
+        for part in [
+            f"You are helping a visitor explore {location.name}.",
+            f"Area: {location.area}." if location.area else "",
+            f"Region: {location.region}." if getattr(location, "region", None) else "",
+            f"Overview: {location.description}." if location.description else "",
+            f"Summary: {location.summary}." if getattr(location, "summary", None) else "",
+        ]
+        if part
+    )
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "assistant", "content": f"Hi, I'm your tour guide for {location.name}."},
+    ]
+    if context:
+        messages.append({"role": "system", "content": context})
+    return messages
+
+
+class LocationContexts:
+    """Per-worker LRU of location_id -> (context messages, their tokens)."""
+
+    def __init__(self, max_size: int = CONTEXT_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: OrderedDict[uuid.UUID, tuple[list[dict[str, str]], int]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, location_id: uuid.UUID) -> tuple[list[dict[str, str]], int] | None:
+        with self._lock:
+            entry = self._entries.get(location_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(location_id)
+            self.hits += 1
+            return entry
+
+    def put(self, location: Location) -> tuple[list[dict[str, str]], int]:
+        messages = location_context(location)
+        entry = (messages, sum(message_tokens(m) for m in messages))
+        with self._lock:
+            self._entries[location.id] = entry
+            self._entries.move_to_end(location.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, location_id: uuid.UUID) -> None:
+        with self._lock:
+            self._entries.pop(location_id, None)
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+def _summary(dropped: list[dict[str, str]], budget: int) -> dict[str, str] | None:
+    """A note of the visitor's questions in the dropped turns, newest kept first."""
+    intro = "Earlier in this conversation the visitor asked about: "
+    used = count_tokens(intro) + MESSAGE_OVERHEAD
+    questions: list[str] = []
+    for turn in reversed(dropped):
+        if turn["role"] != "user":
+            continue
+        question = " ".join(turn["content"].split())
+        if len(question) > SUMMARY_QUESTION_CHARS:
+            question = question[:SUMMARY_QUESTION_CHARS].rsplit(" ", 1)[0] + "..."
+        cost = count_tokens(question) + 1
+        if used + cost > budget:
+            break
+        questions.append(question)
+        used += cost
+    if not questions:
+        return None
+    questions.reverse()
+    return {"role": "system", "content": intro + "; ".join(questions)}
+
+
+def _notes(snippets: list[str], budget: int) -> dict[str, str] | None:
+    """Retrieved snippets, in order, as far as they fit."""
+    intro = "Reviews of this place and related places, for reference:"
+    used = count_tokens(intro) + MESSAGE_OVERHEAD
+    lines = [intro]
+    for snippet in snippets:
+        cost = count_tokens(snippet) + 2
+        if used + cost > budget:
+            break
+        lines.append(f"- {snippet}")
+        used += cost
+    if len(lines) == 1:
+        return None
+    return {"role": "system", "content": "\n".join(lines)}
+
+
+def build_prompt(
+    context: tuple[list[dict[str, str]], int],
+    history: list[dict[str, str]],
+    message: str,
+    snippets: list[str] | None = None,
+    budget: int = PROMPT_TOKENS,
+    summary_budget: int = SUMMARY_TOKENS,
+    snippets_budget: int = RETRIEVAL_TOKENS,
+) -> list[dict[str, str]]:
+    """
+    context + retrieved snippets + as much recent history as fits + the
+    visitor's message. The context and the message are always included,
+    even over budget.
+    """
+    context_messages, used = context
+    notes = _notes(snippets, min(snippets_budget, max(budget - used, 0))) if snippets else None
+    if notes is not None:
+        context_messages = [*context_messages, notes]
+        used += message_tokens(notes)
+    question = {"role": "user", "content": message}
+    used += message_tokens(question)
+
+    # Newest first, counting only until the budget runs out
+    history_budget = budget - used
+    costs: list[int] = []
+    for turn in reversed(history):
+        costs.append(message_tokens(turn))
+        history_budget -= costs[-1]
+        if history_budget < 0:
+            break
+    else:
+        return [*context_messages, *history, question]
+
+    # Not everything fits: keep the newest turns and a note of the rest
+    summary_budget = min(summary_budget, max(budget - used, 0))
+    history_budget = budget - used - summary_budget
+    start = len(history)
+    for cost in costs:
+        if cost > history_budget:
+            break
+        start -= 1
+        history_budget -= cost
+    kept = history[start:]
+    note = _summary(history[:start], summary_budget)
+    if note is not None:
+        kept = [note, *kept]
+    return [*context_messages, *kept, question]
+
+
+location_contexts = LocationContexts()
+location_changes.listen(location_contexts.invalidate)
@@ -0,0 +1,284 @@
+# app/utils/pubsub.py
+"""
+Pub/sub transport for chat fan-out across workers.
+
+ConnectionManager publishes every broadcast to a channel per room and
+delivers to its local sockets from its subscription, so clients on
+different uvicorn workers or pods see the same messages. Each process
+holds at most one subscription per channel, however many sockets (or
+other local listeners, like the history cache) it has for that room.
+
+CHAT_PUBSUB_BACKEND:
+  - "memory" (default): in-process only, for a single worker
+  - "postgres": LISTEN/NOTIFY on DATABASE_URL (payloads up to ~8 KB)
+  - "redis": any Redis-compatible server at CHAT_PUBSUB_REDIS_URL
+"""
+import asyncio
+import logging
+import os
+from typing import Callable, Dict
+
+from fastapi.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+# callback(channel, data)
+Callback = Callable[[str, str], None]
+
+
+def chat_channel(namespace: str, room_id) -> str:
+    return f"chat:{namespace}:{room_id}"
+
+
+class _Listeners:
+    """Local callbacks per channel. add()/remove() report the first/last one."""
+
+    def __init__(self):
+        self._by_channel: Dict[str, list[Callback]] = {}
+
+    def add(self, channel: str, callback: Callback) -> bool:
+        callbacks = self._by_channel.setdefault(channel, [])
+        if callback not in callbacks:
+            callbacks.append(callback)
+        return len(callbacks) == 1
+
+    def remove(self, channel: str, callback: Callback) -> bool:
+        callbacks = self._by_channel.get(channel)
+        if not callbacks or callback not in callbacks:
+            return False
+        callbacks.remove(callback)
+        if callbacks:
+            return False
+        del self._by_channel[channel]
+        return True
+
+    def dispatch(self, channel: str, data: str) -> None:
+        for callback in self._by_channel.get(channel, ()):
+            try:
+                callback(channel, data)
+            except Exception:
+                logger.exception("Chat pub/sub callback failed on %s", channel)
+
+    def channels(self):
+        return list(self._by_channel)
+
+    def clear(self) -> None:
+        self._by_channel.clear()
+
+
+class InMemoryPubSub:
+    """Delivers published messages straight to local subscribers."""
+
+    def __init__(self):
+        self._listeners = _Listeners()
+
+    async def publish(self, channel: str, data: str) -> None:
+        self._listeners.dispatch(channel, data)
+
+    async def subscribe(self, channel: str, callback: Callback) -> None:
+        self._listeners.add(channel, callback)
+
+    async def unsubscribe(self, channel: str, callback: Callback) -> None:
+        self._listeners.remove(channel, callback)
+
+    async def close(self) -> None:
+        self._listeners.clear()
+
+
+class PostgresPubSub:
+    """
+    LISTEN/NOTIFY over one dedicated connection per process, read from
+    the event loop with add_reader(). Connecting, LISTEN/UNLISTEN and
+    publishing (on a second connection) block, so they run in the
+    threadpool. Subscriptions are restored if the listener drops.
+    """
+
+    MAX_PAYLOAD = 7999  # NOTIFY limit is 8000 bytes
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._listeners = _Listeners()
+        self._listener = None
+        self._publisher = None
+        # Serializes listener setup and LISTEN/UNLISTEN
+        self._lock = asyncio.Lock()
+
+    def _connect(self):
+        raw = self.engine.raw_connection()
+        raw.detach()  # keep it out of the pool
+        conn = raw.driver_connection
+        conn.autocommit = True
+        return conn
+
+    @staticmethod
+    def _quote(channel: str) -> str:
+        return '"' + channel.replace('"', '""') + '"'
+
+    @staticmethod
+    def _execute(conn, statements: list[str]) -> None:
+        with conn.cursor() as cur:
+            for statement in statements:
+                cur.execute(statement)
+
+    def _open_listener(self, channels: list[str]):
+        conn = self._connect()
+        self._execute(conn, [f"LISTEN {self._quote(channel)}" for channel in channels])
+        return conn
+
+    async def _ensure_listener(self) -> None:
+        """Connects the listener if needed. Call with self._lock held."""
+        if self._listener is None:
+            self._listener = await run_in_threadpool(self._open_listener, self._listeners.channels())
+            asyncio.get_running_loop().add_reader(self._listener.fileno(), self._on_readable)
+
+    async def _listen(self, statements: list[str]) -> None:
+        """
+        Runs LISTEN/UNLISTEN on the listener in the threadpool. Call with
+        self._lock held. The loop stops reading the connection meanwhile,
+        so it never waits for the thread on the connection's lock.
+        """
+        listener = self._listener
+        loop = asyncio.get_running_loop()
+        loop.remove_reader(listener.fileno())
+        try:
+            await run_in_threadpool(self._execute, listener, statements)
+        except Exception:
+            self._drop_listener()
+            raise
+        if self._listener is listener:
+            loop.add_reader(listener.fileno(), self._on_readable)
+            # Notifications that arrived with the statements' replies
+            self._dispatch()
+
+    async def _reconnect(self) -> None:
+        async with self._lock:
+            try:
+                await self._ensure_listener()
+            except Exception:
+                logger.exception("Chat pub/sub reconnect failed; retrying on next subscribe")
+
+    def _on_readable(self) -> None:
+        try:
+            self._listener.poll()
+        except Exception:
+            logger.exception("Chat pub/sub listener lost; reconnecting")
+            self._drop_listener()
+            asyncio.ensure_future(self._reconnect())
+            return
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        while self._listener.notifies:
+            notify = self._listener.notifies.pop(0)
+            self._listeners.dispatch(notify.channel, notify.payload)
+
+    def _drop_listener(self) -> None:
+        if self._listener is None:
+            return
+        try:
+            asyncio.get_running_loop().remove_reader(self._listener.fileno())
+            self._listener.close()
+        except Exception:
+            pass
+        self._listener = None
+
+    def _notify(self, channel: str, data: str) -> None:
+        if self._publisher is None or self._publisher.closed:
+            self._publisher = self._connect()
+        with self._publisher.cursor() as cur:
+            cur.execute("SELECT pg_notify(%s, %s)", (channel, data))
+
+    async def publish(self, channel: str, data: str) -> None:
+        if len(data.encode()) > self.MAX_PAYLOAD:
+            # Too large for NOTIFY: other workers miss it, local clients still get it
+            logger.warning("Chat message too large for NOTIFY on %s; delivering locally", channel)
+            self._listeners.dispatch(channel, data)
+            return
+        await run_in_threadpool(self._notify, channel, data)
+
+    async def subscribe(self, channel: str, callback: Callback) -> None:
+        if not self._listeners.add(channel, callback):
+            return
+        async with self._lock:
+            if self._listener is None:
+                # Listens to every subscribed channel, this one included
+                await self._ensure_listener()
+            else:
+                await self._listen([f"LISTEN {self._quote(channel)}"])
+
+    async def unsubscribe(self, channel: str, callback: Callback) -> None:
+        if not self._listeners.remove(channel, callback):
+            return
+        async with self._lock:
+            if self._listener is not None:
+                await self._listen([f"UNLISTEN {self._quote(channel)}"])
+
+    async def close(self) -> None:
+        self._listeners.clear()
+        self._drop_listener()
+        if self._publisher is not None:
+            self._publisher.close()
+            self._publisher = None
+
+
+class RedisPubSub:
+    """One PUBLISH/SUBSCRIBE connection pair per process, read by one task."""
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("CHAT_PUBSUB_BACKEND=redis requires `pip install redis`.") from e
+
+        self._client = redis.from_url(url)
+        self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        self._listeners = _Listeners()
+        self._reader: asyncio.Task | None = None
+
+    async def _read(self) -> None:
+        while True:
+            try:
+                message = await self._pubsub.get_message(timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Chat pub/sub read failed")
+                await asyncio.sleep(1)
+                continue
+            if message is None or message["type"] != "message":
+                continue
+            self._listeners.dispatch(message["channel"].decode(), message["data"].decode())
+
+    async def publish(self, channel: str, data: str) -> None:
+        await self._client.publish(channel, data)
+
+    async def subscribe(self, channel: str, callback: Callback) -> None:
+        if self._listeners.add(channel, callback):
+            await self._pubsub.subscribe(channel)
+        if self._reader is None:
+            self._reader = asyncio.create_task(self._read())
+
+    async def unsubscribe(self, channel: str, callback: Callback) -> None:
+        if self._listeners.remove(channel, callback):
+            await self._pubsub.unsubscribe(channel)
+
+    async def close(self) -> None:
+        self._listeners.clear()
+        if self._reader is not None:
+            self._reader.cancel()
+            self._reader = None
+        await self._pubsub.aclose()
+        await self._client.aclose()
+
+
+def build_pubsub():
+    kind = os.getenv("CHAT_PUBSUB_BACKEND", "memory")
+    if kind == "postgres":
+        from app.database import engine
+        return PostgresPubSub(engine)
+    if kind == "redis":
+        return RedisPubSub(os.getenv("CHAT_PUBSUB_REDIS_URL", "redis://localhost:6379/0"))
+    return InMemoryPubSub()
+
+
+pubsub = build_pubsub()
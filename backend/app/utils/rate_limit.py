@@ -0,0 +1,318 @@
+# app/utils/rate_limit.py
+"""
+Token-bucket rate limiting and admission control.
+
+- Policies are matched per route (method + path) in RateLimitMiddleware.
+- Clients are keyed by X-User-ID on routes that authenticate it (a
+  forged id gets 401 there) and by client IP everywhere else.
+- InMemoryBackend keeps buckets per process; RedisBackend shares them
+  across workers (any Redis-compatible server, e.g. a local redis-server).
+"""
+import logging
+import math
+import os
+import re
+import time
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class RateLimitPolicy:
+    name: str
+    limit: int          # bucket capacity (burst)
+    window: float       # seconds to refill a full bucket
+
+    @property
+    def rate(self) -> float:
+        return self.limit / self.window
+
+
+# ---------- Policies ----------
+
+CHATBOT = RateLimitPolicy("chatbot", limit=10, window=60)
+UPLOADS = RateLimitPolicy("uploads", limit=10, window=60)
+LOCATION_LISTING = RateLimitPolicy("location_listing", limit=30, window=60)
+WS_CONNECT = RateLimitPolicy("ws_connect", limit=20, window=60)
+WS_MESSAGE = RateLimitPolicy("ws_message", limit=20, window=10)
+
+# (method, path pattern, policy, keyed by user); "WEBSOCKET" matches
+# websocket handshakes. Only authenticated routes may key by X-User-ID:
+# elsewhere a client could send a new id per request for a fresh bucket.
+ROUTE_POLICIES = [
+    ("POST", r"^/chatbot/[^/]+(/stream)?$", CHATBOT, True),
+    ("POST", r"^/locations/[^/]+/images$", UPLOADS, False),
+    ("POST", r"^/reviews/[^/]+/photos$", UPLOADS, True),
+    ("GET", r"^/locations/?$", LOCATION_LISTING, False),
+    ("WEBSOCKET", r"^/chat/.+/ws$", WS_CONNECT, False),
+]
+
+
+# ---------- In-process buckets ----------
+
+class TokenBucketLimiter:
+    """
+    Token buckets for one policy, keyed by client.
+
+    consume() is O(1): one dict lookup and an in-place update of the
+    client's [tokens, last_refill] list. Returns the tokens left after
+    taking one (>= 0), or minus the seconds until a token is available.
+    """
+
+    __slots__ = ("capacity", "rate", "max_keys", "_buckets")
+
+    def __init__(self, policy: RateLimitPolicy, max_keys: int = 100_000):
+        self.capacity = float(policy.limit)
+        self.rate = policy.rate
+        self.max_keys = max_keys
+        self._buckets: dict[str, list[float]] = {}
+
+    def consume(self, key: str, now: float) -> float:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_keys:
+                self._evict(now)
+            self._buckets[key] = [self.capacity - 1.0, now]
+            return self.capacity - 1.0
+
+        tokens = bucket[0] + (now - bucket[1]) * self.rate
+        if tokens > self.capacity:
+            tokens = self.capacity
+        bucket[1] = now
+
+        if tokens >= 1.0:
+            tokens -= 1.0
+            bucket[0] = tokens
+            return tokens
+
+        bucket[0] = tokens
+        return -(1.0 - tokens) / self.rate
+
+    def _evict(self, now: float) -> None:
+        """Drop buckets that have refilled completely (idle clients)."""
+        full_after = self.capacity / self.rate
+        idle = [k for k, (_, ts) in self._buckets.items() if now - ts >= full_after]
+        for key in idle:
+            del self._buckets[key]
+        if len(self._buckets) >= self.max_keys:
+            # Everyone is active: fail open rather than grow without bound
+            self._buckets.clear()
+
+
+# ---------- Backends ----------
+
+class InMemoryBackend:
+    """Per-process buckets. Limits are per worker."""
+
+    def __init__(self):
+        self._limiters: dict[str, TokenBucketLimiter] = {}
+
+    async def consume(self, policy: RateLimitPolicy, key: str) -> float:
+        limiter = self._limiters.get(policy.name)
+        if limiter is None:
+            limiter = self._limiters[policy.name] = TokenBucketLimiter(policy)
+        return limiter.consume(key, time.monotonic())
+
+
+# Atomic refill + take, using the server clock so workers agree on time
+_TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local result
+if tokens >= 1 then
+  tokens = tokens - 1
+  result = tokens
+else
+  result = -(1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return tostring(result)
+"""
+
+
+class RedisBackend:
+    """
+    Buckets shared by all workers through a Redis-compatible server.
+    Fails open (allows the request) if the server is unreachable.
+    """
+
+    def __init__(self, url: str, prefix: str = "ratelimit"):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requires `pip install redis`.") from e
+
+        self.prefix = prefix
+        self._client = redis.from_url(url)
+        self._script = self._client.register_script(_TOKEN_BUCKET_LUA)
+
+    async def consume(self, policy: RateLimitPolicy, key: str) -> float:
+        try:
+            result = await self._script(
+                keys=[f"{self.prefix}:{policy.name}:{key}"],
+                args=[policy.limit, policy.rate],
+            )
+        except Exception:
+            logger.warning("Rate limit backend unavailable; allowing request", exc_info=True)
+            return float(policy.limit)
+        return float(result)
+
+
+def build_backend():
+    if os.getenv("RATE_LIMIT_BACKEND", "memory") == "redis":
+        return RedisBackend(os.getenv("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0"))
+    return InMemoryBackend()
+
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+MAX_INFLIGHT_REQUESTS = int(os.getenv("MAX_INFLIGHT_REQUESTS", "0"))  # 0 = unlimited
+
+backend = build_backend()
+
+
+async def allow_ws_message(scope, connection_key: str | None) -> float:
+    """
+    Per-client limit for frames sent over chat websockets, keyed by the
+    user the socket claimed at connect time and the client IP. Never by
+    the user id inside a frame: it is unchecked and may change per frame.
+    Same return convention as TokenBucketLimiter.consume().
+    """
+    if not RATE_LIMIT_ENABLED:
+        return float(WS_MESSAGE.limit)
+    key = ip_key(scope)
+    if connection_key:
+        key = f"u:{connection_key}@{key}"
+    return await backend.consume(WS_MESSAGE, key)
+
+
+# ---------- Middleware ----------
+
+@dataclass
+class _Rule:
+    method: str
+    pattern: re.Pattern
+    policy: RateLimitPolicy
+    by_user: bool
+    # Constant headers, encoded once
+    static_headers: list = field(default_factory=list)
+
+
+def ip_key(scope) -> str:
+    client = scope.get("client")
+    return "ip:" + (client[0] if client else "unknown")
+
+
+def client_key(scope, by_user: bool = False) -> str:
+    """X-User-ID if `by_user` and present, else the client IP."""
+    if by_user:
+        for name, value in scope["headers"]:
+            if name == b"x-user-id":
+                return "u:" + value.decode("latin-1")
+    return ip_key(scope)
+
+
+def _limit_headers(rule: _Rule, remaining: float) -> list:
+    policy = rule.policy
+    left = max(0, math.floor(remaining))
+    reset = math.ceil((policy.limit - max(remaining, 0)) / policy.rate)
+    return rule.static_headers + [
+        (b"ratelimit-remaining", str(left).encode()),
+        (b"ratelimit-reset", str(reset).encode()),
+    ]
+
+
+class RateLimitMiddleware:
+    """
+    Applies ROUTE_POLICIES to matching requests and caps in-flight HTTP
+    requests (admission control). Adds RateLimit-* headers to limited
+    routes; rejected requests get 429 (or 503 when over capacity) with
+    Retry-After. Rejected websocket handshakes are closed with 1008.
+    """
+
+    def __init__(self, app, backend=None, route_policies=None, max_inflight: int = MAX_INFLIGHT_REQUESTS):
+        self.app = app
+        self.backend = backend
+        self.max_inflight = max_inflight
+        self.inflight = 0
+        self.rules = [
+            _Rule(
+                method,
+                re.compile(pattern),
+                policy,
+                by_user,
+                [
+                    (b"ratelimit-limit", str(policy.limit).encode()),
+                    (b"ratelimit-policy", f"{policy.limit};w={int(policy.window)}".encode()),
+                ],
+            )
+            for method, pattern, policy, by_user in (route_policies or ROUTE_POLICIES)
+        ]
+
+    def _match(self, method: str, path: str) -> _Rule | None:
+        for rule in self.rules:
+            if rule.method == method and rule.pattern.match(path):
+                return rule
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket") or not RATE_LIMIT_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        method = "WEBSOCKET" if scope["type"] == "websocket" else scope["method"]
+        rule = self._match(method, scope["path"])
+
+        headers = None
+        if rule is not None:
+            remaining = await (self.backend or backend).consume(rule.policy, client_key(scope, rule.by_user))
+            if remaining < 0:
+                if scope["type"] == "websocket":
+                    await send({"type": "websocket.close", "code": 1008})
+                    return
+                retry_after = str(math.ceil(-remaining)).encode()
+                await self._reject(send, 429, b"Rate limit exceeded", _limit_headers(rule, 0) + [(b"retry-after", retry_after)])
+                return
+            headers = _limit_headers(rule, remaining)
+
+        if scope["type"] == "websocket":
+            await self.app(scope, receive, send)
+            return
+
+        if self.max_inflight and self.inflight >= self.max_inflight:
+            await self._reject(send, 503, b"Server busy", [(b"retry-after", b"1")])
+            return
+
+        if headers is not None:
+            inner_send = send
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    message["headers"] = list(message.get("headers", [])) + headers
+                await inner_send(message)
+
+        self.inflight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.inflight -= 1
+
+    @staticmethod
+    async def _reject(send, status: int, detail: bytes, headers: list) -> None:
+        body = b'{"detail":"' + detail + b'"}'
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ] + headers,
+        })
+        await send({"type": "http.response.body", "body": body})
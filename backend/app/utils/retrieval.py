@@ -0,0 +1,699 @@
+# app/utils/retrieval.py
+"""
+Local BM25 index over locations and reviews, for the chatbot.
+
+search(location_id, question) returns short snippets for the prompt:
+  - up to RETRIEVAL_REVIEWS of the location's reviews that best match
+    the question, topped up with its newest ones
+  - up to RETRIEVAL_PLACES other places matching the question together
+    with this location's area, region and tags ("similar nearby")
+
+The index is one file, RETRIEVAL_INDEX_PATH: a document per location
+(name, area, region, description, summary, tags) and per review with a
+comment, for each location's RETRIEVAL_REVIEWS_PER_LOCATION newest.
+Each term's postings hold precomputed BM25 term weights. Place postings
+are sorted by weight, so a query can stop early: it reads at most
+RETRIEVAL_MAX_POSTINGS in all, rarest terms first, each term's best
+documents. Review postings are sorted by document, so one location's
+reviews are found by binary search. Workers memory-map the file: the OS keeps
+one copy for all of them, and a query touches only its own terms.
+Nothing reads the database per request.
+
+Kept current incrementally: a location change (app.utils.location_changes:
+location updates and deletes, tag and review changes) reloads that
+location into a per-worker overlay that takes precedence over the file.
+The file is rebuilt from the database by the first worker that finds it
+missing, built from another database (the header records which), older than RETRIEVAL_REBUILD_SECONDS or with more than
+RETRIEVAL_MAX_OVERLAY locations overlaid (or by
+scripts/build_retrieval_index.py), written beside the old one and
+swapped in; every worker maps the new file within
+RETRIEVAL_REFRESH_SECONDS.
+
+Queries run in the threadpool while upkeep runs on the event loop, so
+upkeep never changes what a query reads: it swaps in a new Snapshot of
+(file, overlay), and a replaced file is unmapped only once no query
+holds it.
+"""
+import asyncio
+import bisect
+import fcntl
+import hashlib
+import heapq
+import io
+import logging
+import math
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import time
+import uuid
+from array import array
+from collections import Counter, defaultdict
+from typing import Iterable, Iterator
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal, engine
+from app.models import Location, LocationTag, Review, Tag
+from app.utils.answer_cache import question_terms
+from app.utils.location_changes import location_changes
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+INDEX_PATH = os.getenv("RETRIEVAL_INDEX_PATH") or os.path.join(BASE_DIR, "data", "retrieval.idx")
+REVIEWS_PER_LOCATION = int(os.getenv("RETRIEVAL_REVIEWS_PER_LOCATION", "20"))
+REVIEW_RESULTS = int(os.getenv("RETRIEVAL_REVIEWS", "3"))
+PLACE_RESULTS = int(os.getenv("RETRIEVAL_PLACES", "3"))
+MAX_POSTINGS = int(os.getenv("RETRIEVAL_MAX_POSTINGS", "2000"))
+MAX_OVERLAY = int(os.getenv("RETRIEVAL_MAX_OVERLAY", "500"))
+REBUILD_SECONDS = float(os.getenv("RETRIEVAL_REBUILD_SECONDS", "86400"))
+REFRESH_SECONDS = float(os.getenv("RETRIEVAL_REFRESH_SECONDS", "5"))
+
+# BM25
+K1 = 1.2
+B = 0.75
+# Weight of the current location's area, region and tags in place queries
+PROFILE_WEIGHT = 0.5
+SNIPPET_CHARS = 240
+
+MAGIC = b"RIX2"
+# magic, database id, built_at, locations, reviews, terms, mean location / review length
+HEADER = struct.Struct("<4s16sdIIIdd")
+# offsets of: locations, documents, term table, term text, postings, text
+SECTIONS = struct.Struct("<6Q")
+# id, first review, reviews, profile offset, profile length
+LOCATION = struct.Struct("<16sIIQI")
+# snippet offset, snippet length
+DOC = struct.Struct("<QI")
+# term offset, term length, postings offset, place postings, review postings
+TERM = struct.Struct("<QIQII")
+
+
+def _clip(text: str, limit: int = SNIPPET_CHARS) -> str:
+    text = " ".join(text.split())
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit(" ", 1)[0] + "..."
+
+
+def _idf(docs: int, df: int) -> float:
+    return math.log(1 + (docs - df + 0.5) / (df + 0.5))
+
+
+def _weight(tf: int, length: int, mean_length: float) -> float:
+    """BM25 term weight, before IDF."""
+    relative = length / mean_length if mean_length else 1.0
+    return tf * (K1 + 1) / (tf + K1 * (1 - B + B * relative))
+
+
+class LocationDocs:
+    """A location's documents as indexed: its own and its newest reviews'."""
+
+    __slots__ = ("location_id", "terms", "snippet", "profile", "reviews")
+
+    def __init__(self, location, tags: list[str], reviews: Iterable[tuple[int, str]]):
+        self.location_id = location.id
+        place = location.area or location.region
+        about = location.summary or location.description or ""
+        snippet = f"{location.name} ({place})" if place else location.name
+        if about:
+            snippet += f": {_clip(about)}"
+        if tags:
+            snippet += f" Tags: {', '.join(tags)}."
+        self.snippet = "Related place: " + snippet
+        text = " ".join(
+            part or "" for part in (location.name, location.area, location.region, location.description, location.summary)
+        )
+        self.terms = Counter(question_terms(f"{text} {' '.join(tags)}"))
+        self.profile = " ".join(part for part in (location.area, location.region, *tags) if part)
+        # Newest first
+        self.reviews = [
+            (Counter(question_terms(comment)), f"Review ({rating}/5): {_clip(comment)}")
+            for rating, comment in reviews
+        ]
+
+
+def database_id(url=engine.url) -> bytes:
+    """
+    Identifies the database an index is built from, by its URL (without
+    the password), so a file built from another database is not used.
+    """
+    return hashlib.sha256(url.render_as_string(hide_password=True).encode()).digest()[:16]
+
+
+DATABASE_ID = database_id()
+
+
+def write_index(path: str, locations: Iterable[LocationDocs], built_at: float, source: bytes = DATABASE_ID) -> dict:
+    """
+    Writes the index file for `locations` (in ascending id order), built
+    from database `source`, and swaps it in at `path` atomically.
+    Returns its counts.
+    """
+    location_rows = io.BytesIO()
+    place_docs = io.BytesIO()
+    review_docs = io.BytesIO()
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    text = tempfile.TemporaryFile(dir=directory)
+    text_size = 0
+    # term -> place ids, place tfs, review ids, review tfs
+    postings: dict[str, tuple[array, array, array, array]] = {}
+    place_lengths = array("I")
+    review_lengths = array("I")
+    previous = b""
+
+    def put(value: str) -> tuple[int, int]:
+        nonlocal text_size
+        data = value.encode()
+        text.write(data)
+        text_size += len(data)
+        return text_size - len(data), len(data)
+
+    def add(terms: Counter, doc: int, kind: int) -> None:
+        for term, tf in terms.items():
+            entry = postings.get(term)
+            if entry is None:
+                entry = postings[term] = (array("I"), array("I"), array("I"), array("I"))
+            entry[kind].append(doc)
+            entry[kind + 1].append(tf)
+
+    try:
+        for docs in locations:
+            key = docs.location_id.bytes
+            if key <= previous:
+                raise ValueError("Locations must be in ascending id order")
+            previous = key
+            location_rows.write(LOCATION.pack(key, len(review_lengths), len(docs.reviews), *put(docs.profile)))
+            place_docs.write(DOC.pack(*put(docs.snippet)))
+            add(docs.terms, len(place_lengths), 0)
+            place_lengths.append(sum(docs.terms.values()))
+            for terms, snippet in docs.reviews:
+                review_docs.write(DOC.pack(*put(snippet)))
+                add(terms, len(review_lengths), 2)
+                review_lengths.append(sum(terms.values()))
+
+        places, reviews = len(place_lengths), len(review_lengths)
+        mean_place = sum(place_lengths) / places if places else 0.0
+        mean_review = sum(review_lengths) / reviews if reviews else 0.0
+
+        term_table = io.BytesIO()
+        term_text = io.BytesIO()
+        postings_data = io.BytesIO()
+        for term in sorted(postings):
+            place_ids, place_tfs, review_ids, review_tfs = postings.pop(term)
+            place_weights = [_weight(tf, place_lengths[doc], mean_place) for doc, tf in zip(place_ids, place_tfs)]
+            # Heaviest first, so queries can stop early
+            order = sorted(range(len(place_ids)), key=place_weights.__getitem__, reverse=True)
+            encoded = term.encode()
+            term_table.write(
+                TERM.pack(term_text.tell(), len(encoded), postings_data.tell(), len(place_ids), len(review_ids))
+            )
+            term_text.write(encoded)
+            postings_data.write(array("I", (place_ids[i] for i in order)).tobytes())
+            postings_data.write(array("f", (place_weights[i] for i in order)).tobytes())
+            postings_data.write(review_ids.tobytes())
+            postings_data.write(
+                array("f", (_weight(tf, review_lengths[doc], mean_review) for doc, tf in zip(review_ids, review_tfs))).tobytes()
+            )
+
+        parts = [
+            location_rows.getvalue(),
+            place_docs.getvalue() + review_docs.getvalue(),
+            term_table.getvalue(),
+            term_text.getvalue(),
+        ]
+        sections = [HEADER.size + SECTIONS.size]
+        for part in parts:
+            sections.append(sections[-1] + len(part))
+        # Postings are read as arrays of 4-byte items
+        padding = -sections[-1] % 4
+        sections[-1] += padding
+        sections.append(sections[-1] + len(postings_data.getvalue()))
+        terms = len(parts[2]) // TERM.size
+
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as out:
+            out.write(HEADER.pack(MAGIC, source, built_at, places, reviews, terms, mean_place, mean_review))
+            out.write(SECTIONS.pack(*sections))
+            for part in parts:
+                out.write(part)
+            out.write(b"\0" * padding)
+            out.write(postings_data.getvalue())
+            text.seek(0)
+            shutil.copyfileobj(text, out)
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp, path)
+    finally:
+        text.close()
+    return {"locations": places, "reviews": reviews, "terms": terms}
+
+
+class IndexFile:
+    """A memory-mapped index file."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self.mtime_ns = os.fstat(f.fileno()).st_mtime_ns
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        magic, self.source, self.built_at, self.places, self.reviews, self.terms, self.mean_place, self.mean_review = (
+            HEADER.unpack_from(self._map, 0)
+        )
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a retrieval index")
+        self._locations, self._docs, self._term_table, self._term_text, self._postings, self._text = (
+            SECTIONS.unpack_from(self._map, HEADER.size)
+        )
+
+    def close(self) -> None:
+        self._view.release()
+        self._map.close()
+
+    def _string(self, offset: int, length: int) -> str:
+        return bytes(self._view[self._text + offset:self._text + offset + length]).decode()
+
+    def location(self, location_id: uuid.UUID) -> tuple[int, int, int, str] | None:
+        """(place doc, first review, reviews, profile) for a location id."""
+        key = location_id.bytes
+        lo, hi = 0, self.places
+        while lo < hi:
+            mid = (lo + hi) // 2
+            found, first, count, profile_at, profile_length = LOCATION.unpack_from(
+                self._map, self._locations + mid * LOCATION.size
+            )
+            if found == key:
+                return mid, first, count, self._string(profile_at, profile_length)
+            if found < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def location_id(self, place: int) -> uuid.UUID:
+        return uuid.UUID(bytes=bytes(self._view[self._locations + place * LOCATION.size:][:16]))
+
+    def snippet(self, doc: int) -> str:
+        """Place docs are 0..places-1, reviews follow."""
+        return self._string(*DOC.unpack_from(self._map, self._docs + doc * DOC.size))
+
+    def postings(self, term: str) -> tuple[memoryview, memoryview, memoryview, memoryview] | None:
+        """(place ids, place weights, review ids, review weights) for a term."""
+        key = term.encode()
+        lo, hi = 0, self.terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            text_at, length, at, places, reviews = TERM.unpack_from(self._map, self._term_table + mid * TERM.size)
+            found = self._view[self._term_text + text_at:self._term_text + text_at + length]
+            if found == key:
+                at += self._postings
+                ends = at + 4 * places, at + 8 * places, at + 8 * places + 4 * reviews
+                return (
+                    self._view[at:ends[0]].cast("I"),
+                    self._view[ends[0]:ends[1]].cast("f"),
+                    self._view[ends[1]:ends[2]].cast("I"),
+                    self._view[ends[2]:ends[2] + 4 * reviews].cast("f"),
+                )
+            if bytes(found) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+
+def _recent_reviews(per_location: int):
+    ranked = (
+        select(
+            Review.location_id,
+            Review.rating,
+            Review.comment,
+            func.row_number()
+            .over(partition_by=Review.location_id, order_by=Review.created_at.desc())
+            .label("n"),
+        )
+        .where(Review.comment.isnot(None), Review.comment != "")
+        .subquery()
+    )
+    return (
+        select(ranked.c.location_id, ranked.c.rating, ranked.c.comment)
+        .where(ranked.c.n <= per_location)
+        .order_by(ranked.c.location_id, ranked.c.n)
+    )
+
+
+def load_locations(db: Session, per_location: int = REVIEWS_PER_LOCATION) -> Iterator[LocationDocs]:
+    """Every location's documents in id order, streaming the reviews."""
+    tags: dict[uuid.UUID, list[str]] = defaultdict(list)
+    for location_id, name in db.execute(
+        select(LocationTag.location_id, Tag.name).join(Tag, Tag.id == LocationTag.tag_id).order_by(Tag.name)
+    ):
+        tags[location_id].append(name)
+    locations = sorted(db.query(Location).all(), key=lambda location: location.id.bytes)
+
+    # Both in location id order; the database sorts UUIDs bytewise
+    reviews = iter(db.execute(_recent_reviews(per_location).execution_options(yield_per=5000)))
+    review = next(reviews, None)
+    for location in locations:
+        own = []
+        while review is not None and review.location_id.bytes <= location.id.bytes:
+            if review.location_id == location.id:
+                own.append((review.rating, review.comment))
+            review = next(reviews, None)
+        yield LocationDocs(location, tags[location.id], own)
+
+
+def load_location(
+    db: Session, location_id: uuid.UUID, per_location: int = REVIEWS_PER_LOCATION
+) -> LocationDocs | None:
+    location = db.query(Location).filter(Location.id == location_id).first()
+    if location is None:
+        return None
+    tags = db.scalars(
+        select(Tag.name).join(LocationTag, LocationTag.tag_id == Tag.id).where(LocationTag.location_id == location_id).order_by(Tag.name)
+    ).all()
+    reviews = db.execute(
+        select(Review.rating, Review.comment)
+        .where(Review.location_id == location_id, Review.comment.isnot(None), Review.comment != "")
+        .order_by(Review.created_at.desc())
+        .limit(per_location)
+    ).all()
+    return LocationDocs(location, list(tags), [tuple(review) for review in reviews])
+
+
+def build_index(path: str = INDEX_PATH, per_location: int = REVIEWS_PER_LOCATION) -> dict | None:
+    """
+    Rebuilds the index file from the database. Returns its counts, or
+    None if another process is already building it.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(f"{path}.lock", "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None
+        # Changes committed after this are reloaded into the overlay
+        built_at = time.time()
+        db = SessionLocal()
+        try:
+            return write_index(path, load_locations(db, per_location), built_at)
+        finally:
+            db.close()
+
+
+class Snapshot:
+    """The index file and overlay one query reads. Replaced whole, never changed."""
+
+    __slots__ = ("file", "overlay", "_overlay_postings")
+
+    def __init__(self, file: IndexFile | None, overlay: dict[uuid.UUID, tuple[float, LocationDocs | None]]):
+        self.file = file
+        # location id -> (when loaded, its documents or None if deleted)
+        self.overlay = overlay
+        # term -> (location id, weight) over the overlay, built when needed
+        self._overlay_postings: dict[str, list[tuple[uuid.UUID, float]]] | None = None
+
+    def postings(self, term: str):
+        return self.file.postings(term) if self.file is not None else None
+
+    def overlay_places(self) -> dict[str, list[tuple[uuid.UUID, float]]]:
+        # Queries racing to build it build the same thing
+        if self._overlay_postings is None:
+            overlaid = [docs for _, docs in self.overlay.values() if docs is not None]
+            if self.file is not None:
+                mean = self.file.mean_place
+            else:
+                mean = sum(sum(docs.terms.values()) for docs in overlaid) / (len(overlaid) or 1)
+            postings = defaultdict(list)
+            for docs in overlaid:
+                length = sum(docs.terms.values())
+                for term, tf in docs.terms.items():
+                    postings[term].append((docs.location_id, _weight(tf, length, mean)))
+            self._overlay_postings = postings
+        return self._overlay_postings
+
+
+class RetrievalIndex:
+    def __init__(
+        self,
+        path: str = INDEX_PATH,
+        reviews: int = REVIEW_RESULTS,
+        places: int = PLACE_RESULTS,
+        max_postings: int = MAX_POSTINGS,
+        max_overlay: int = MAX_OVERLAY,
+        rebuild_after: float = REBUILD_SECONDS,
+        source: bytes = DATABASE_ID,
+    ):
+        self.path = path
+        self.source = source
+        self.reviews = reviews
+        self.places = places
+        self.max_postings = max_postings
+        self.max_overlay = max_overlay
+        self.rebuild_after = rebuild_after
+        self.snapshot = Snapshot(None, {})
+        # mtime of an index file on disk built from another database
+        self._foreign_mtime: int | None = None
+        self._dirty: set[uuid.UUID] = set()
+        self._wake: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self._building: asyncio.Future | None = None
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.slowest = 0.0
+
+    @property
+    def file(self) -> IndexFile | None:
+        return self.snapshot.file
+
+    def changed(self, location_id: uuid.UUID) -> None:
+        """Queues a location to be reloaded into the overlay."""
+        self._dirty.add(location_id)
+        if self._wake is not None:
+            self._wake.set()
+
+    # ---------- Queries ----------
+
+    def search(self, location_id: uuid.UUID, question: str) -> list[str]:
+        """Snippets of the location's reviews, then of related places."""
+        started = time.perf_counter()
+        terms = set(question_terms(question))
+        snapshot = self.snapshot
+        snippets = self._search_reviews(snapshot, location_id, terms) + self._search_places(snapshot, location_id, terms)
+        elapsed = time.perf_counter() - started
+        self.queries += 1
+        self.query_seconds += elapsed
+        self.slowest = max(self.slowest, elapsed)
+        return snippets
+
+    def _search_reviews(self, snapshot: Snapshot, location_id: uuid.UUID, terms: set[str]) -> list[str]:
+        if not self.reviews:
+            return []
+        index = snapshot.file
+        if location_id in snapshot.overlay:
+            docs = snapshot.overlay[location_id][1]
+            if docs is None:
+                return []
+            total = index.reviews if index else 0
+            mean = index.mean_review if index else 0.0
+            idfs = {}
+            for term in terms:
+                postings = snapshot.postings(term)
+                idfs[term] = _idf(total + 1, len(postings[2]) if postings else 0)
+            candidates = [
+                (sum(idfs[term] * _weight(counts[term], sum(counts.values()), mean) for term in terms & counts.keys()), n)
+                for n, (counts, _) in enumerate(docs.reviews)
+            ]
+            snippets = [docs.reviews[n][1] for n in range(len(docs.reviews))]
+        else:
+            found = index.location(location_id) if index else None
+            if found is None:
+                return []
+            _, first, count, _ = found
+            scores = defaultdict(float)
+            for term in terms:
+                postings = index.postings(term)
+                if postings is None:
+                    continue
+                ids, weights = postings[2], postings[3]
+                lo = bisect.bisect_left(ids, first)
+                hi = bisect.bisect_left(ids, first + count, lo)
+                idf = _idf(index.reviews, len(ids))
+                for i in range(lo, hi):
+                    scores[ids[i] - first] += idf * weights[i]
+            candidates = [(scores.get(n, 0.0), n) for n in range(count)]
+            snippets = None
+
+        # Best matches, then the newest of the rest
+        best = [n for score, n in heapq.nlargest(self.reviews, (c for c in candidates if c[0]))]
+        best += [n for score, n in candidates if not score][: self.reviews - len(best)]
+        if snippets is not None:
+            return [snippets[n] for n in best]
+        return [index.snippet(index.places + first + n) for n in best]
+
+    def _search_places(self, snapshot: Snapshot, location_id: uuid.UUID, terms: set[str]) -> list[str]:
+        if not self.places:
+            return []
+        index = snapshot.file
+        overlay = snapshot.overlay
+        if location_id in overlay:
+            docs = overlay[location_id][1]
+            profile = docs.profile if docs else ""
+        else:
+            found = index.location(location_id) if index else None
+            profile = found[3] if found else ""
+        boosts = dict.fromkeys(question_terms(profile), PROFILE_WEIGHT)
+        boosts.update(dict.fromkeys(terms, 1.0))
+
+        total = index.places if index else 0
+        idfs = {}
+        found_postings = []
+        for term, boost in boosts.items():
+            postings = snapshot.postings(term)
+            idfs[term] = boost * _idf(total + 1, len(postings[0]) if postings else 0)
+            if postings is not None and len(postings[0]):
+                found_postings.append((len(postings[0]), term, postings))
+
+        # Rarest terms first, each reading up to an equal share of what
+        # is left; every term reads its heaviest documents first
+        scores = defaultdict(float)
+        budget = self.max_postings
+        found_postings.sort(key=lambda found: found[0])
+        for n, (count, term, postings) in enumerate(found_postings):
+            read = min(count, budget // (len(found_postings) - n))
+            budget -= read
+            idf = idfs[term]
+            for doc, weight in zip(postings[0][:read], postings[1][:read]):
+                scores[doc] += idf * weight
+
+        results = []
+        for doc in sorted(scores, key=scores.__getitem__, reverse=True):
+            found_id = index.location_id(doc)
+            # This location, and ones whose overlay entry replaces the file's
+            if found_id != location_id and found_id not in overlay:
+                results.append((scores[doc], index.snippet(doc)))
+                if len(results) == self.places:
+                    break
+        overlay_scores = defaultdict(float)
+        overlay_postings = snapshot.overlay_places()
+        for term, idf in idfs.items():
+            for found_id, weight in overlay_postings.get(term, ()):
+                overlay_scores[found_id] += idf * weight
+        overlay_scores.pop(location_id, None)
+        results += [(score, overlay[found_id][1].snippet) for found_id, score in overlay_scores.items()]
+        return [snippet for _, snippet in heapq.nlargest(self.places, results)]
+
+    # ---------- Upkeep ----------
+
+    def _open(self) -> IndexFile | None:
+        try:
+            return IndexFile(self.path)
+        except FileNotFoundError:
+            return None
+        except (ValueError, struct.error):
+            logger.exception("Ignoring unreadable retrieval index %s", self.path)
+            return None
+
+    def _reload(self) -> None:
+        """Maps the index file if it is new, dropping overlaid locations it includes."""
+        try:
+            mtime_ns = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if self.file is not None and mtime_ns == self.file.mtime_ns or mtime_ns == self._foreign_mtime:
+            return
+        index = self._open()
+        if index is None:
+            return
+        if index.source != self.source:
+            logger.warning("Retrieval index %s was built from another database; rebuilding", self.path)
+            self._foreign_mtime = index.mtime_ns
+            index.close()
+            return
+        self._foreign_mtime = None
+        overlay = {
+            location_id: entry for location_id, entry in self.snapshot.overlay.items() if entry[0] >= index.built_at
+        }
+        # Queries in flight keep the old snapshot; its file is unmapped
+        # when the last of them drops it
+        self.snapshot = Snapshot(index, overlay)
+
+    def _load(self, location_ids: list[uuid.UUID]) -> dict[uuid.UUID, tuple[float, LocationDocs | None]]:
+        loaded_at = time.time()
+        db = SessionLocal()
+        try:
+            return {location_id: (loaded_at, load_location(db, location_id)) for location_id in location_ids}
+        finally:
+            db.close()
+
+    def _stale(self) -> bool:
+        if self.file is None or self._foreign_mtime is not None or len(self.snapshot.overlay) > self.max_overlay:
+            return True
+        return bool(self.rebuild_after) and time.time() - self.file.built_at > self.rebuild_after
+
+    def _built(self, future: asyncio.Future) -> None:
+        self._building = None
+        if not future.cancelled() and future.exception() is not None:
+            logger.error("Retrieval index build failed", exc_info=future.exception())
+        elif self._wake is not None:
+            self._wake.set()
+
+    async def refresh(self) -> None:
+        self._reload()
+        if self._dirty:
+            dirty, self._dirty = list(self._dirty), set()
+            try:
+                loaded = await run_in_threadpool(self._load, dirty)
+                self.snapshot = Snapshot(self.snapshot.file, {**self.snapshot.overlay, **loaded})
+            except Exception:
+                self._dirty.update(dirty)  # retry on the next refresh
+                raise
+        if self._building is None and self._stale():
+            self._building = asyncio.ensure_future(run_in_threadpool(build_index, self.path))
+            self._building.add_done_callback(self._built)
+
+    async def run(self, interval: float = REFRESH_SECONDS) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Retrieval index refresh failed")
+            try:
+                await asyncio.wait_for(self._wake.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> dict:
+        index = self.file
+        return {
+            "locations": index.places if index else 0,
+            "reviews": index.reviews if index else 0,
+            "age_seconds": round(time.time() - index.built_at) if index else None,
+            "overlay": len(self.snapshot.overlay),
+            "building": self._building is not None,
+            "queries": self.queries,
+            "query_ms_avg": round(self.query_seconds / self.queries * 1000, 3) if self.queries else None,
+            "query_ms_max": round(self.slowest * 1000, 3),
+        }
+
+
+retrieval_index = RetrievalIndex()
+location_changes.listen(retrieval_index.changed)
@@ -0,0 +1,135 @@
+# app/utils/room_registry.py
+"""
+In-memory registry of chat rooms.
+
+Rooms are few and rarely created, so every worker keeps all of them.
+Default rooms are seeded once at startup (under an advisory lock on
+PostgreSQL, so workers booting together do not duplicate them) and the
+rooms are loaded into memory. create_chat_room adds the new room locally
+and announces it over the chat pub/sub channel "chat:rooms:all" so other
+workers add it too.
+
+GET /chat/rooms is served from memory with an ETag, and room ids are
+checked with a dict lookup. An unknown id reloads the registry at most
+once every ROOM_REGISTRY_MISS_RELOAD seconds, in case an announcement
+was missed or a room was added outside the API.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models import ChatRoom
+from app.schemas.chat import ChatRoomResponse
+from app.utils.pubsub import chat_channel, pubsub as default_pubsub
+
+logger = logging.getLogger(__name__)
+
+MISS_RELOAD_SECONDS = float(os.getenv("ROOM_REGISTRY_MISS_RELOAD", "5"))
+
+# Any constant works, as long as nothing else uses it
+SEED_LOCK_KEY = 0x726F6F6D  # "room"
+
+
+class RoomRegistry:
+    def __init__(self, pubsub=None, miss_reload: float = MISS_RELOAD_SECONDS):
+        self.pubsub = pubsub or default_pubsub
+        self.miss_reload = miss_reload
+        self.channel = chat_channel("rooms", "all")
+        # room_id -> room as JSON-ready dict, in listing order
+        self._rooms: dict[uuid.UUID, dict] = {}
+        self._listing: list[dict] = []
+        self.etag = ""
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def seed(self, default_rooms: list[dict]) -> None:
+        """Creates any missing default rooms, then loads all rooms. Run once at startup."""
+        db = SessionLocal()
+        try:
+            if db.get_bind().dialect.name == "postgresql":
+                # Held until commit; other workers wait, then find the rooms
+                db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SEED_LOCK_KEY})
+            existing = {name for (name,) in db.query(ChatRoom.name)}
+            for room in default_rooms:
+                if room["name"] not in existing:
+                    db.add(ChatRoom(name=room["name"], category=room["category"]))
+            db.commit()
+            self.reload(db)
+        finally:
+            db.close()
+
+    def reload(self, db: Session | None = None) -> None:
+        own_session = db is None
+        if own_session:
+            db = SessionLocal()
+        try:
+            rooms = db.query(ChatRoom).order_by(ChatRoom.created_at.asc()).all()
+            listing = [ChatRoomResponse.model_validate(r).model_dump(mode="json") for r in rooms]
+        finally:
+            if own_session:
+                db.close()
+        with self._lock:
+            self._listing = listing
+            self._rooms = {uuid.UUID(r["id"]): r for r in listing}
+            self._loaded_at = time.monotonic()
+            self._update_etag()
+
+    def _update_etag(self) -> None:
+        digest = hashlib.sha1(json.dumps(self._listing, sort_keys=True).encode()).hexdigest()
+        self.etag = f'W/"{digest[:20]}"'
+
+    def add(self, room: dict) -> bool:
+        """Adds a JSON-ready room. False if it was already known."""
+        room_id = uuid.UUID(str(room["id"]))
+        with self._lock:
+            if room_id in self._rooms:
+                return False
+            self._rooms[room_id] = room
+            self._listing = self._listing + [room]
+            self._update_etag()
+        return True
+
+    def get(self, room_id: uuid.UUID) -> dict | None:
+        """Memory only; never touches the DB."""
+        return self._rooms.get(room_id)
+
+    def find(self, room_id: uuid.UUID) -> dict | None:
+        """get(), reloading from the DB on a miss if the last load is old enough."""
+        room = self._rooms.get(room_id)
+        if room is None and time.monotonic() - self._loaded_at >= self.miss_reload:
+            self.reload()
+            room = self._rooms.get(room_id)
+        return room
+
+    def listing(self) -> tuple[list[dict], str]:
+        with self._lock:
+            return self._listing, self.etag
+
+    async def announce(self, room: dict) -> None:
+        await self.pubsub.publish(self.channel, json.dumps(room))
+
+    def _on_message(self, channel: str, data: str) -> None:
+        self.add(json.loads(data))
+
+    async def start(self) -> None:
+        try:
+            await self.pubsub.subscribe(self.channel, self._on_message)
+        except Exception:
+            logger.exception("Room registry could not subscribe to %s", self.channel)
+
+    async def stop(self) -> None:
+        try:
+            await self.pubsub.unsubscribe(self.channel, self._on_message)
+        except Exception:
+            logger.exception("Room registry could not unsubscribe from %s", self.channel)
+
+
+room_registry = RoomRegistry()
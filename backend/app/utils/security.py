@@ -1,7 +1,9 @@
 # app/utils/security.py
+import uuid
+
 from fastapi import Header, HTTPException, Depends
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import SessionLocal, get_db
 from app.models import User
 
 from passlib.context import CryptContext
@@ -32,12 +34,40 @@ async def get_current_user(
     Later: replace this with JWT verification.
     """
 
-    if not x_user_id:
-        raise HTTPException(status_code=401, detail="X-User-ID header missing")
-
-    user = db.query(User).filter(User.id == x_user_id).first()
+    user_id = _parse_user_id(x_user_id)
+    user = db.query(User).filter(User.id == user_id).first()
 
     if not user:
         raise HTTPException(status_code=401, detail="Invalid user ID")
 
     return user
+
+
+def get_current_user_id(x_user_id: str = Header(None)) -> uuid.UUID:
+    """
+    Like get_current_user, for endpoints that run long (e.g. while a
+    model answers): checks the user in a session of its own, closed
+    right away, so the request holds no pooled connection meanwhile.
+    Sync, so FastAPI runs it in the threadpool.
+    """
+    user_id = _parse_user_id(x_user_id)
+    db = SessionLocal()
+    try:
+        found = db.query(User.id).filter(User.id == user_id).first()
+    finally:
+        db.close()
+
+    if not found:
+        raise HTTPException(status_code=401, detail="Invalid user ID")
+
+    return user_id
+
+
+def _parse_user_id(x_user_id: str | None) -> uuid.UUID:
+    if not x_user_id:
+        raise HTTPException(status_code=401, detail="X-User-ID header missing")
+
+    try:
+        return uuid.UUID(x_user_id)
+    except ValueError:
+        raise HTTPException(status_code=401, detail="Invalid user ID")
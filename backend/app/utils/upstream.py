@@ -0,0 +1,291 @@
+# app/utils/upstream.py
+"""
+HTTP client for the chatbot's LLM upstream (see app.utils.llm).
+
+One httpx.AsyncClient per worker, opened at startup and closed at
+shutdown, so calls reuse keep-alive connections (HTTP/2 when the h2
+package is installed, `pip install "httpx[http2]"`) instead of paying a
+TCP and TLS handshake each time. Around it:
+  - CHATBOT_CONNECT_TIMEOUT / CHATBOT_READ_TIMEOUT per attempt, and up
+    to CHATBOT_POOL_TIMEOUT waiting for a pooled connection
+  - up to CHATBOT_RETRIES retries of connection errors, timeouts, 429
+    and 5xx, after a random sleep of up to CHATBOT_RETRY_BACKOFF * 2^n
+    seconds (full jitter, so callers do not retry in lockstep)
+  - a circuit breaker: after CHATBOT_BREAKER_FAILURES calls in a row
+    fail, calls fail at once with CircuitOpenError for
+    CHATBOT_BREAKER_RESET seconds, then one trial call decides whether
+    to close it again
+
+post_json() returns a whole response; stream_lines() yields a streamed
+one line by line (only opening the stream is retried). How many calls
+are in flight is up to the caller (app.utils.llm_limiter).
+
+start() opens the client in a background task and httpx is imported in
+a thread, so neither module import nor the first request waits for it
+(see scripts/bench_startup.py).
+"""
+import asyncio
+import importlib
+import logging
+import os
+import random
+import time
+from typing import AsyncIterator, Awaitable, Callable
+
+from fastapi.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+UPSTREAM_URL = os.getenv("CHATBOT_UPSTREAM_URL", "https://api.deepseek.com")
+CONNECT_TIMEOUT = float(os.getenv("CHATBOT_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("CHATBOT_READ_TIMEOUT", "20"))
+POOL_TIMEOUT = float(os.getenv("CHATBOT_POOL_TIMEOUT", "10"))
+MAX_CONNECTIONS = int(os.getenv("CHATBOT_MAX_CONNECTIONS", "20"))
+KEEPALIVE_EXPIRY = float(os.getenv("CHATBOT_KEEPALIVE_EXPIRY", "60"))
+RETRIES = int(os.getenv("CHATBOT_RETRIES", "2"))
+RETRY_BACKOFF = float(os.getenv("CHATBOT_RETRY_BACKOFF", "0.5"))
+BREAKER_FAILURES = int(os.getenv("CHATBOT_BREAKER_FAILURES", "5"))
+BREAKER_RESET = float(os.getenv("CHATBOT_BREAKER_RESET", "30"))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRY_SLEEP = 10.0
+
+
+class UpstreamError(Exception):
+    """The upstream call failed (after any retries)."""
+
+
+class CircuitOpenError(UpstreamError):
+    """The breaker is open; the upstream was not called."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed -> open -> half-open (one trial) -> closed."""
+
+    def __init__(self, failures: int = BREAKER_FAILURES, reset_after: float = BREAKER_RESET):
+        self.failures = failures
+        self.reset_after = reset_after
+        self.consecutive = 0
+        self.opened_at: float | None = None
+        self._trial = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_after:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self._trial:
+            self._trial = True
+            return True
+        return False
+
+    def success(self) -> None:
+        self.consecutive = 0
+        self.opened_at = None
+        self._trial = False
+
+    def abandon(self) -> None:
+        """A trial call that never reached the upstream."""
+        self._trial = False
+
+    def failure(self) -> None:
+        self.consecutive += 1
+        self._trial = False
+        if self.failures and (self.opened_at is not None or self.consecutive >= self.failures):
+            if self.opened_at is None:
+                logger.warning("Upstream circuit opened after %d failures", self.consecutive)
+            self.opened_at = time.monotonic()
+
+
+class UpstreamClient:
+    def __init__(
+        self,
+        base_url: str = UPSTREAM_URL,
+        connect_timeout: float = CONNECT_TIMEOUT,
+        read_timeout: float = READ_TIMEOUT,
+        pool_timeout: float = POOL_TIMEOUT,
+        max_connections: int = MAX_CONNECTIONS,
+        keepalive_expiry: float = KEEPALIVE_EXPIRY,
+        retries: int = RETRIES,
+        retry_backoff: float = RETRY_BACKOFF,
+        breaker: CircuitBreaker | None = None,
+    ):
+        self.base_url = base_url
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.pool_timeout = pool_timeout
+        self.max_connections = max_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.breaker = breaker or CircuitBreaker()
+        self._opening: asyncio.Task | None = None
+        self._client = None
+        self.calls = 0
+        self.retried = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def start(self) -> None:
+        """Opens the client in the background, importing httpx off the event loop."""
+        if self._opening is None:
+            self._opening = asyncio.create_task(self._open())
+
+    async def _open(self) -> None:
+        try:
+            await self._create_client()
+        except BaseException:
+            # Let the next call try again
+            if self._opening is asyncio.current_task():
+                self._opening = None
+            raise
+
+    async def _create_client(self) -> None:
+        httpx = await run_in_threadpool(importlib.import_module, "httpx")
+        try:
+            import h2  # noqa: F401
+            http2 = True
+        except ImportError:
+            http2 = False
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            http2=http2,
+            timeout=httpx.Timeout(
+                self.read_timeout, connect=self.connect_timeout, pool=self.pool_timeout
+            ),
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+        )
+
+    async def stop(self) -> None:
+        if self._opening is None:
+            return
+        opening, self._opening = self._opening, None
+        try:
+            await asyncio.shield(opening)
+        except Exception:
+            pass  # Never opened; the callers that waited for it got the error
+        client, self._client = self._client, None
+        if client is not None:
+            await client.aclose()
+
+    def _backoff(self, attempt: int, retry_after: str | None = None) -> float:
+        if retry_after is not None:
+            try:
+                return min(float(retry_after), MAX_RETRY_SLEEP)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.retry_backoff * 2**attempt, MAX_RETRY_SLEEP))
+
+    async def _ready(self) -> bool:
+        """Waits for the client. Returns whether this call is the breaker's half-open trial."""
+        if not self.breaker.allow():
+            self.rejected += 1
+            raise CircuitOpenError("Upstream circuit is open")
+        trial = self.breaker.state != "closed"
+        try:
+            self.start()
+            # Shared by every caller: one being cancelled must not cancel the open
+            await asyncio.shield(self._opening)
+        except Exception as exc:
+            if trial:
+                self.breaker.abandon()
+            raise UpstreamError(f"Upstream client failed to open: {exc}") from exc
+        except BaseException:
+            if trial:
+                self.breaker.abandon()
+            raise
+        self.calls += 1
+        return trial
+
+    async def _with_retries(self, send: Callable[[], Awaitable], trial: bool = False):
+        """
+        Calls send() until it returns a response with a success status,
+        which is returned with its body possibly unread. Raises UpstreamError.
+        """
+        import httpx
+
+        try:
+            for attempt in range(self.retries + 1):
+                retry_after = None
+                try:
+                    resp = await send()
+                except httpx.TransportError as exc:
+                    error = f"{type(exc).__name__}: {exc}"
+                else:
+                    if resp.status_code < 400:
+                        self.breaker.success()
+                        return resp
+                    await resp.aclose()
+                    if resp.status_code not in RETRY_STATUSES:
+                        # The upstream is up; the request itself is wrong
+                        self.breaker.success()
+                        self.failed += 1
+                        raise UpstreamError(f"Upstream returned {resp.status_code}")
+                    error = f"Upstream returned {resp.status_code}"
+                    retry_after = resp.headers.get("retry-after")
+                if attempt < self.retries:
+                    self.retried += 1
+                    await asyncio.sleep(self._backoff(attempt, retry_after))
+
+            self.breaker.failure()
+            self.failed += 1
+            raise UpstreamError(error)
+        except BaseException:
+            # Cancelled mid-call (a deadline, a client that went away):
+            # neither success() nor failure() ran, so release a half-open trial
+            if trial:
+                self.breaker.abandon()
+            raise
+
+    async def post_json(self, path: str, payload: dict, headers: dict | None = None) -> dict:
+        """POSTs JSON and returns the decoded response. Raises UpstreamError."""
+        trial = await self._ready()
+
+        resp = await self._with_retries(lambda: self._client.post(path, json=payload, headers=headers), trial)
+        try:
+            return resp.json()
+        except ValueError as exc:
+            self.failed += 1
+            raise UpstreamError(f"Upstream returned invalid JSON: {exc}") from exc
+
+    async def stream_lines(self, path: str, payload: dict, headers: dict | None = None) -> AsyncIterator[str]:
+        """
+        POSTs JSON and yields the response body line by line as it arrives.
+        Only opening the stream is retried. Use contextlib.aclosing() so a
+        cancelled consumer closes the upstream connection at once.
+        Raises UpstreamError.
+        """
+        import httpx
+
+        trial = await self._ready()
+        request = self._client.build_request("POST", path, json=payload, headers=headers)
+        resp = await self._with_retries(lambda: self._client.send(request, stream=True), trial)
+        try:
+            async for line in resp.aiter_lines():
+                yield line
+        except httpx.TransportError as exc:
+            self.breaker.failure()
+            self.failed += 1
+            raise UpstreamError(f"{type(exc).__name__}: {exc}") from exc
+        finally:
+            await resp.aclose()
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "retried": self.retried,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "circuit": self.breaker.state,
+        }
@@ -0,0 +1,106 @@
+# app/utils/user_cache.py
+"""
+Shared cache of user display data (id -> username) for chat serialization.
+
+Entries expire after USER_CACHE_TTL seconds and the cache holds at most
+USER_CACHE_SIZE users (LRU). Profile updates invalidate the entry on the
+worker that handled them; other workers pick up the change within the TTL.
+Unknown ids are cached too, as None.
+"""
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Iterable
+
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models import User
+
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "300"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "100000"))
+
+
+class UserDirectory:
+    def __init__(self, ttl: float = USER_CACHE_TTL, max_size: int = USER_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        # user_id -> (username, expires_at)
+        self._entries: OrderedDict[uuid.UUID, tuple[str | None, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def cached(self, user_id: uuid.UUID) -> tuple[bool, str | None]:
+        """(found, username) from memory only; never touches the DB."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[1] <= now:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return True, entry[0]
+
+    def get_many(self, user_ids: Iterable[uuid.UUID | None], db: Session | None = None) -> dict:
+        """
+        Usernames for the given ids, loading misses in one query.
+        Opens its own session when `db` is not given.
+        """
+        names: dict = {}
+        missing = []
+        for user_id in set(user_ids):
+            if user_id is None:
+                continue
+            found, username = self.cached(user_id)
+            if found:
+                names[user_id] = username
+            else:
+                missing.append(user_id)
+        if not missing:
+            return names
+
+        own_session = db is None
+        if own_session:
+            db = SessionLocal()
+        try:
+            rows = db.query(User.id, User.username).filter(User.id.in_(missing)).all()
+        finally:
+            if own_session:
+                db.close()
+
+        loaded = dict.fromkeys(missing)
+        loaded.update(rows)
+        for user_id, username in loaded.items():
+            self.put(user_id, username)
+        names.update(loaded)
+        return names
+
+    def get(self, user_id: uuid.UUID, db: Session | None = None) -> str | None:
+        return self.get_many([user_id], db).get(user_id)
+
+    def put(self, user_id: uuid.UUID, username: str | None) -> None:
+        with self._lock:
+            self._entries[user_id] = (username, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: uuid.UUID) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+user_directory = UserDirectory()
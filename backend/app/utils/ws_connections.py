@@ -0,0 +1,437 @@
+# app/utils/ws_connections.py
+"""
+Websocket connection registry for chat rooms and location chat.
+
+broadcast() never awaits a socket: each connection has a bounded
+outbound queue drained by its own writer task, so one slow client
+cannot hold up the rest of the room. A client whose queue is full
+(WS_SEND_QUEUE_SIZE frames behind) or whose send takes longer than
+WS_SEND_TIMEOUT seconds is disconnected with code 1013 (try again later).
+
+Broadcasts go through app.utils.pubsub, so every worker with sockets in
+the room delivers them; see that module for the backends. A message is
+encoded to JSON once, when published, and the same text frame is queued
+for every socket (orjson is used when installed).
+
+Lifecycle: the same watchdog sends {"type": "ping"} to a client that has
+been silent for WS_HEARTBEAT_INTERVAL seconds and drops it (1001) after
+WS_IDLE_TIMEOUT seconds without any frame, which also clears half-open
+connections. Frames over WS_MAX_FRAME_BYTES close the socket (1009), a
+client may hold WS_SEND_BUFFER_BYTES of queued frames, and a user may
+have WS_MAX_CONNECTIONS_PER_USER sockets per worker. Dropping a client
+also ends its handler's receive(), so the handler's finally block runs
+even if the peer never answers the close.
+"""
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import uuid
+from typing import Dict
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+from app.utils.pubsub import chat_channel, pubsub as default_pubsub
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "5"))
+SEND_BUFFER_BYTES = int(os.getenv("WS_SEND_BUFFER_BYTES", str(1024 * 1024)))
+HEARTBEAT_INTERVAL = float(os.getenv("WS_HEARTBEAT_INTERVAL", "20"))
+IDLE_TIMEOUT = float(os.getenv("WS_IDLE_TIMEOUT", "60"))
+MAX_FRAME_BYTES = int(os.getenv("WS_MAX_FRAME_BYTES", str(64 * 1024)))
+MAX_CONNECTIONS_PER_USER = int(os.getenv("WS_MAX_CONNECTIONS_PER_USER", "5"))
+
+SLOW_CONSUMER_CODE = 1013
+IDLE_CODE = 1001
+TOO_LARGE_CODE = 1009
+POLICY_CODE = 1008
+
+PING_FRAME = '{"type":"ping"}'
+
+
+def dumps(message) -> str:
+    """Compact JSON text for a websocket frame."""
+    if orjson is not None:
+        return orjson.dumps(message).decode()
+    return json.dumps(message, separators=(",", ":"))
+
+
+def _message_id(frame: str):
+    try:
+        message = json.loads(frame)
+    except ValueError:
+        return None
+    return message.get("id") if isinstance(message, dict) else None
+
+
+class Client:
+    """One connected websocket and its outbound queue."""
+
+    __slots__ = (
+        "websocket", "queue", "task", "busy_since", "max_buffer", "buffered",
+        "room_id", "user_key", "handler", "receiving", "last_seen", "pinged_at", "close_code",
+        "held",
+    )
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        queue_size: int = SEND_QUEUE_SIZE,
+        max_buffer: int = SEND_BUFFER_BYTES,
+    ):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.task: asyncio.Task | None = None
+        # Loop time the current send started, None when idle
+        self.busy_since: float | None = None
+        # Characters queued but not yet sent; 0 disables the cap
+        self.max_buffer = max_buffer
+        self.buffered = 0
+        self.room_id: uuid.UUID | None = None
+        self.user_key: str | None = None
+        # Task running the endpoint's receive loop
+        self.handler: asyncio.Task | None = None
+        self.receiving = False
+        # Loop times of the last frame received and the last ping sent
+        self.last_seen = 0.0
+        self.pinged_at = 0.0
+        # Set when the manager drops the client
+        self.close_code: int | None = None
+        # Live frames kept back while missed messages are replayed
+        self.held: list[str] | None = None
+
+    def offer(self, frame: str) -> bool:
+        """Queues an encoded frame without waiting. False if the client is too far behind."""
+        size = len(frame)
+        if self.max_buffer and self.buffered and self.buffered + size > self.max_buffer:
+            return False
+        if self.held is not None:
+            if self.queue.maxsize and len(self.held) >= self.queue.maxsize:
+                return False
+            self.held.append(frame)
+            self.buffered += size
+            return True
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            return False
+        self.buffered += size
+        return True
+
+    def offer_json(self, message: dict) -> bool:
+        return self.offer(dumps(message))
+
+
+class ConnectionRegistry:
+    """Every chat websocket on this worker, across managers."""
+
+    def __init__(self, max_per_user: int = MAX_CONNECTIONS_PER_USER):
+        self.max_per_user = max_per_user
+        self.clients: set[Client] = set()
+        self._per_user: Dict[str, int] = {}
+        self.rejected = 0
+        # close reason -> count
+        self.dropped: Dict[str, int] = {"slow": 0, "idle": 0, "too_large": 0}
+
+    def add(self, client: Client) -> bool:
+        """Registers a client; False if its user is at the connection cap."""
+        user_key = client.user_key
+        if user_key is not None:
+            count = self._per_user.get(user_key, 0)
+            if self.max_per_user and count >= self.max_per_user:
+                self.rejected += 1
+                return False
+            self._per_user[user_key] = count + 1
+        self.clients.add(client)
+        return True
+
+    def remove(self, client: Client) -> None:
+        if client not in self.clients:
+            return
+        self.clients.discard(client)
+        user_key = client.user_key
+        if user_key is not None:
+            count = self._per_user.get(user_key, 0) - 1
+            if count > 0:
+                self._per_user[user_key] = count
+            else:
+                self._per_user.pop(user_key, None)
+
+    def stats(self) -> dict:
+        return {
+            "connections": len(self.clients),
+            "users": len(self._per_user),
+            "queued_frames": sum(client.queue.qsize() for client in self.clients),
+            # A frame shared by many sockets is counted once per socket
+            "buffered_bytes": sum(client.buffered for client in self.clients),
+            "rejected": self.rejected,
+            "dropped": dict(self.dropped),
+        }
+
+
+connection_registry = ConnectionRegistry()
+
+
+class ConnectionManager:
+    def __init__(
+        self,
+        namespace: str,
+        pubsub=None,
+        queue_size: int = SEND_QUEUE_SIZE,
+        send_timeout: float = SEND_TIMEOUT,
+        registry: ConnectionRegistry | None = None,
+        max_buffer: int = SEND_BUFFER_BYTES,
+        heartbeat_interval: float = HEARTBEAT_INTERVAL,
+        idle_timeout: float = IDLE_TIMEOUT,
+        max_frame: int = MAX_FRAME_BYTES,
+    ):
+        self.namespace = namespace
+        self.pubsub = pubsub or default_pubsub
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.registry = registry or connection_registry
+        self.max_buffer = max_buffer
+        self.heartbeat_interval = heartbeat_interval
+        self.idle_timeout = idle_timeout
+        self.max_frame = max_frame
+        # room_id -> {websocket: Client}; dicts give O(1) disconnect
+        self.active_connections: Dict[uuid.UUID, Dict[WebSocket, Client]] = {}
+        self.evicted = 0
+        # Keeps close() tasks referenced until they finish
+        self._closing: set[asyncio.Task] = set()
+        self._watchdog_task: asyncio.Task | None = None
+        self._unsubscribing: set[asyncio.Task] = set()
+        # channel -> room_id, for rooms this process is subscribed to
+        self._rooms: Dict[str, uuid.UUID] = {}
+        # room_id -> [lock, holders and waiters]: orders a room's
+        # subscribe and unsubscribe, which both await the backend
+        self._room_locks: Dict[uuid.UUID, list] = {}
+
+    def channel(self, room_id: uuid.UUID) -> str:
+        return chat_channel(self.namespace, room_id)
+
+    @contextlib.asynccontextmanager
+    async def _room_lock(self, room_id: uuid.UUID):
+        entry = self._room_locks.setdefault(room_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._room_locks[room_id]
+
+    async def connect(
+        self,
+        room_id: uuid.UUID,
+        websocket: WebSocket,
+        user_key: str | None = None,
+        hold: bool = False,
+    ) -> Client | None:
+        """
+        Accepts the socket and joins it to the room. Must be called from
+        the task that will run receive(). Returns None, after closing
+        the socket, if the user is at the connection cap. With hold=True
+        live frames are kept back until resume().
+        """
+        client = Client(websocket, self.queue_size, self.max_buffer)
+        if hold:
+            client.held = []
+        client.room_id = room_id
+        client.user_key = user_key
+        client.handler = asyncio.current_task()
+        if not self.registry.add(client):
+            await websocket.close(code=POLICY_CODE)
+            return None
+        try:
+            await websocket.accept()
+            async with self._room_lock(room_id):
+                channel = self.channel(room_id)
+                if channel not in self._rooms:
+                    # First local socket in the room: one subscription per process
+                    await self.pubsub.subscribe(channel, self._deliver)
+                    self._rooms[channel] = room_id
+                # Joined before the lock goes, so a pending _unsubscribe sees it
+                client.last_seen = asyncio.get_running_loop().time()
+                client.task = asyncio.create_task(self._writer(room_id, client))
+                self.active_connections.setdefault(room_id, {})[websocket] = client
+        except BaseException:
+            self.registry.remove(client)
+            raise
+        if self._watchdog_task is None:
+            self._watchdog_task = asyncio.create_task(self._watchdog())
+        return client
+
+    async def receive(self, client: Client) -> dict:
+        """
+        The next JSON object from the client ({} for anything else).
+        Raises WebSocketDisconnect when the socket closes or is dropped.
+        """
+        client.receiving = True
+        try:
+            message = await client.websocket.receive()
+        except asyncio.CancelledError:
+            if client.close_code is None:
+                raise
+            # Cancelled by _drop(): turn it into a normal disconnect
+            asyncio.current_task().uncancel()
+            raise WebSocketDisconnect(client.close_code) from None
+        finally:
+            client.receiving = False
+
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000))
+        data = message.get("text")
+        if data is None:
+            data = message.get("bytes") or b""
+        if len(data) > self.max_frame:
+            self._drop(client, TOO_LARGE_CODE, "too_large")
+            raise WebSocketDisconnect(TOO_LARGE_CODE)
+
+        client.last_seen = asyncio.get_running_loop().time()
+        try:
+            parsed = json.loads(data)
+        except ValueError:
+            parsed = None
+        if not isinstance(parsed, dict):
+            client.offer_json({"error": "invalid_frame"})
+            return {}
+        return parsed
+
+    def resume(self, client: Client, replay: list[str], replayed_ids: set) -> None:
+        """
+        Queues the replayed frames, then the live frames held since
+        connect() except those already replayed, and switches the client
+        to live delivery. Drops it if that does not fit in its queue.
+        """
+        held, client.held = client.held or [], None
+        for frame in held:
+            client.buffered -= len(frame)
+        if replayed_ids:
+            held = [frame for frame in held if _message_id(frame) not in replayed_ids]
+        for frame in replay + held:
+            if not client.offer(frame):
+                self._drop(client, SLOW_CONSUMER_CODE, "slow")
+                return
+
+    def disconnect(self, room_id: uuid.UUID, websocket: WebSocket) -> Client | None:
+        connections = self.active_connections.get(room_id)
+        if not connections:
+            return None
+        client = connections.pop(websocket, None)
+        if client is not None:
+            self.registry.remove(client)
+        if not connections:
+            self.active_connections.pop(room_id, None)
+            task = asyncio.create_task(self._unsubscribe(room_id))
+            self._unsubscribing.add(task)
+            task.add_done_callback(self._unsubscribing.discard)
+        if client is not None and client.task is not None and client.task is not asyncio.current_task():
+            client.task.cancel()
+        return client
+
+    async def _unsubscribe(self, room_id: uuid.UUID) -> None:
+        async with self._room_lock(room_id):
+            channel = self.channel(room_id)
+            if room_id in self.active_connections or channel not in self._rooms:
+                return  # someone joined again in the meantime
+            del self._rooms[channel]
+            try:
+                await self.pubsub.unsubscribe(channel, self._deliver)
+            except Exception:
+                logger.exception("Failed to unsubscribe from %s", channel)
+
+    async def broadcast(self, room_id: uuid.UUID, message: dict):
+        """Publishes to every worker with sockets in the room, this one included."""
+        await self.pubsub.publish(self.channel(room_id), dumps(message))
+
+    def send_local(self, room_id: uuid.UUID, frame: str) -> None:
+        """Queues an encoded frame for this worker's sockets in the room only."""
+        connections = self.active_connections.get(room_id)
+        if not connections:
+            return
+        # Every socket gets the same already-encoded frame
+        slow = [client for client in connections.values() if not client.offer(frame)]
+        for client in slow:
+            self._drop(client, SLOW_CONSUMER_CODE, "slow")
+
+    def _deliver(self, channel: str, data: str) -> None:
+        room_id = self._rooms.get(channel)
+        if room_id is not None:
+            self.send_local(room_id, data)
+
+    def _drop(self, client: Client, code: int, reason: str) -> None:
+        if self.disconnect(client.room_id, client.websocket) is None:
+            return
+        if code == SLOW_CONSUMER_CODE:
+            self.evicted += 1
+        self.registry.dropped[reason] = self.registry.dropped.get(reason, 0) + 1
+        client.close_code = code
+        task = asyncio.create_task(self._close(client.websocket, code))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+        # A half-open peer never answers the close; end the handler's receive() now
+        handler = client.handler
+        if client.receiving and handler is not None and handler is not asyncio.current_task():
+            handler.cancel()
+
+    async def _writer(self, room_id: uuid.UUID, client: Client) -> None:
+        websocket = client.websocket
+        loop = asyncio.get_running_loop()
+        while True:
+            frame = await client.queue.get()
+            client.busy_since = loop.time()
+            try:
+                await websocket.send_text(frame)
+            except Exception:
+                # Socket already closed; the receive loop will see the disconnect
+                self.disconnect(room_id, websocket)
+                return
+            client.buffered -= len(frame)
+            client.busy_since = None
+
+    async def _watchdog(self) -> None:
+        """
+        Evicts clients stuck in a single send for longer than send_timeout,
+        pings quiet clients and drops idle ones. One sweep for all
+        connections is much cheaper than a timeout per send or receive.
+        """
+        loop = asyncio.get_running_loop()
+        period = min(self.send_timeout, self.heartbeat_interval, self.idle_timeout) / 2
+        while self.active_connections:
+            await asyncio.sleep(period)
+            now = loop.time()
+            send_deadline = now - self.send_timeout
+            idle_deadline = now - self.idle_timeout
+            ping_deadline = now - self.heartbeat_interval
+            for room_id, connections in list(self.active_connections.items()):
+                dropped = []
+                for client in connections.values():
+                    if client.busy_since is not None and client.busy_since < send_deadline:
+                        logger.info("Dropping slow websocket client in %s", room_id)
+                        dropped.append((client, SLOW_CONSUMER_CODE, "slow"))
+                    elif client.last_seen < idle_deadline:
+                        dropped.append((client, IDLE_CODE, "idle"))
+                    elif client.last_seen < ping_deadline and client.pinged_at < ping_deadline:
+                        client.pinged_at = now
+                        if not client.offer(PING_FRAME):
+                            dropped.append((client, SLOW_CONSUMER_CODE, "slow"))
+                for client, code, reason in dropped:
+                    self._drop(client, code, reason)
+        self._watchdog_task = None
+
+    async def _close(self, websocket: WebSocket, code: int) -> None:
+        # Bounded, so closes to peers that never answer do not pile up
+        try:
+            await asyncio.wait_for(websocket.close(code=code), self.send_timeout)
+        except Exception:
+            pass
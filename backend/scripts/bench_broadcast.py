@@ -0,0 +1,114 @@
+# scripts/bench_broadcast.py
+"""
+Broadcast delivery latency for one large room with some slow consumers.
+
+    python scripts/bench_broadcast.py
+    python scripts/bench_broadcast.py --connections 10000 --slow-fraction 0.01 --messages 50
+
+Drives ConnectionManager in-process with stub websockets: fast clients
+take --send-ms per frame, slow ones --slow-send-ms. Reports the time from
+broadcast() to delivery at fast clients, and how many slow clients were
+evicted. --sequential runs the old one-await-per-connection loop for
+comparison.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+from app.utils.ws_connections import ConnectionManager
+
+
+# frame text -> broadcast time; frames are unique per message
+SENT_AT: dict[str, float] = {}
+
+
+class StubWebSocket:
+    def __init__(self, send_delay: float, latencies: list[float] | None):
+        self.send_delay = send_delay
+        self.latencies = latencies
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, frame: str):
+        if self.send_delay:
+            await asyncio.sleep(self.send_delay)
+        if self.latencies is not None:
+            self.latencies.append(time.perf_counter() - SENT_AT[frame])
+
+    async def send_json(self, message: dict):
+        # What Starlette does: encode for every recipient
+        await self.send_text(json.dumps(message, separators=(",", ":")))
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+async def run(args) -> None:
+    manager = ConnectionManager("bench", queue_size=args.queue_size, send_timeout=args.send_timeout)
+    room = uuid.uuid4()
+    latencies: list[float] = []
+    rng = random.Random(0)
+
+    sockets = []
+    for _ in range(args.connections):
+        slow = rng.random() < args.slow_fraction
+        ws = StubWebSocket(args.slow_send_ms / 1000 if slow else args.send_ms / 1000, None if slow else latencies)
+        sockets.append(ws)
+        await manager.connect(room, ws)
+    slow_count = sum(ws.latencies is None for ws in sockets)
+
+    started = time.perf_counter()
+    for seq in range(args.messages):
+        message = {"seq": seq, "text": "x" * 100}
+        SENT_AT[json.dumps(message, separators=(",", ":"))] = time.perf_counter()
+        if args.sequential:
+            for ws in sockets:
+                await ws.send_json(message)
+        else:
+            await manager.broadcast(room, message)
+        await asyncio.sleep(args.interval_ms / 1000)
+
+    # Let queues drain (fast clients only)
+    expected = (args.connections - slow_count) * args.messages
+    while len(latencies) < expected and time.perf_counter() - started < 120:
+        await asyncio.sleep(0.01)
+
+    latencies.sort()
+    print(f"connections      {args.connections} ({slow_count} slow)")
+    print(f"delivered        {len(latencies)}/{expected}")
+    print(f"p50 latency      {statistics.median(latencies) * 1000:.1f} ms")
+    print(f"p99 latency      {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f} ms")
+    print(f"max latency      {latencies[-1] * 1000:.1f} ms")
+    print(f"evicted          {manager.evicted}")
+
+    for ws in list(manager.active_connections.get(room, {})):
+        manager.disconnect(room, ws)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connections", type=int, default=10_000)
+    parser.add_argument("--slow-fraction", type=float, default=0.01)
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--interval-ms", type=float, default=20, help="gap between broadcasts")
+    parser.add_argument("--send-ms", type=float, default=0.0, help="per-frame send time, fast clients")
+    parser.add_argument("--slow-send-ms", type=float, default=500.0, help="per-frame send time, slow clients")
+    parser.add_argument("--queue-size", type=int, default=16)
+    parser.add_argument("--send-timeout", type=float, default=5.0)
+    parser.add_argument("--sequential", action="store_true", help="await each send in turn (old behaviour)")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+# scripts/bench_chat_partitions.py
+"""
+Room history queries and retention on a plain vs a monthly-partitioned
+chat_room_messages table.
+
+    python scripts/bench_chat_partitions.py                        # 100M rows, takes a while
+    python scripts/bench_chat_partitions.py --rows 1000000 --months 12
+
+Builds both layouts in a scratch schema (bench_chat) on DATABASE_URL with
+--rows messages spread evenly over --months months and --rooms rooms,
+with the app's indexes, then reports for each:
+  - latest page: newest 50 messages of a room (GET /chat/rooms/{id}/messages)
+  - cursor page: 50 messages before a cursor --cursor-months back
+  - partitions scanned and buffers touched by one run of each (EXPLAIN ANALYZE)
+  - index size in total and for the newest month
+  - dropping the oldest month: DELETE (plain) vs DETACH + DROP (partitioned)
+The schema is dropped at the end unless --keep.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
+
+load_dotenv()
+
+from app.utils.chat_partitions import add_months, month_start, partition_name
+
+SCHEMA = "bench_chat"
+BATCH = 1_000_000
+
+COLUMNS = """
+    id integer NOT NULL,
+    room_id uuid NOT NULL,
+    user_id uuid,
+    text text NOT NULL,
+    created_at timestamptz NOT NULL
+"""
+
+INDEXES = [
+    ("room_id",),
+    ("user_id",),
+    ("created_at",),
+    ("room_id", "created_at", "id"),
+]
+
+LATEST_PAGE = """
+    SELECT * FROM {table} WHERE room_id = :room
+    ORDER BY created_at DESC, id DESC LIMIT 50
+"""
+
+# Same shape as page_messages() with a before cursor
+CURSOR_PAGE = """
+    SELECT * FROM {table} WHERE room_id = :room
+      AND created_at <= :at AND (created_at, id) < (:at, :id)
+    ORDER BY created_at DESC, id DESC LIMIT 50
+"""
+
+
+def room_uuid(n: int) -> str:
+    """Matches md5('room' || n)::uuid used when loading."""
+    return str(uuid.UUID(hashlib.md5(f"room{n}".encode()).hexdigest()))
+
+
+def create_tables(conn, months: list[datetime]) -> None:
+    conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    conn.execute(text(f"CREATE TABLE {SCHEMA}.plain ({COLUMNS})"))
+    conn.execute(text(f"CREATE TABLE {SCHEMA}.partitioned ({COLUMNS}) PARTITION BY RANGE (created_at)"))
+    for month in months:
+        conn.execute(text(
+            f"CREATE TABLE {SCHEMA}.{partition_name('partitioned', month)} PARTITION OF {SCHEMA}.partitioned "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+        ))
+
+
+def load(conn, table: str, rows: int, rooms: int, start: datetime, end: datetime) -> float:
+    span = (end - start).total_seconds()
+    started = time.perf_counter()
+    for lo in range(1, rows + 1, BATCH):
+        hi = min(lo + BATCH - 1, rows)
+        conn.execute(
+            text(
+                f"INSERT INTO {SCHEMA}.{table} (id, room_id, user_id, text, created_at) "
+                "SELECT g, md5('room' || (g % :rooms))::uuid, NULL, 'message ' || g, "
+                "       :start + (g::float8 / :rows * :span) * interval '1 second' "
+                "FROM generate_series(:lo, :hi) g"
+            ),
+            {"rooms": rooms, "rows": rows, "span": span, "start": start, "lo": lo, "hi": hi},
+        )
+        print(f"\r  {table}: {hi:,}/{rows:,} rows", end="", flush=True)
+    print()
+    return time.perf_counter() - started
+
+
+def create_indexes(conn, table: str) -> None:
+    conn.execute(text(f"ALTER TABLE {SCHEMA}.{table} ADD PRIMARY KEY (id, created_at)"))
+    for columns in INDEXES:
+        conn.execute(text(f"CREATE INDEX ON {SCHEMA}.{table} ({', '.join(columns)})"))
+    conn.execute(text(f"ANALYZE {SCHEMA}.{table}"))
+
+
+def timed(conn, sql: str, params_list: list[dict]) -> float:
+    """Median milliseconds over the parameter sets."""
+    times = []
+    for params in params_list:
+        started = time.perf_counter()
+        conn.execute(text(sql), params).all()
+        times.append((time.perf_counter() - started) * 1000)
+    return statistics.median(times)
+
+
+def plan_stats(conn, sql: str, params: dict) -> tuple[int, int]:
+    """(relations scanned, shared buffers hit + read) for one execution."""
+    plan = conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}"), params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    root = plan[0]["Plan"]
+
+    scanned = set()
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if "Relation Name" in node and node.get("Actual Loops", 0) > 0:
+            scanned.add(node["Relation Name"])
+        stack.extend(node.get("Plans", []))
+    return len(scanned), root.get("Shared Hit Blocks", 0) + root.get("Shared Read Blocks", 0)
+
+
+def index_size(conn, tables: list[str]) -> int:
+    return sum(
+        conn.execute(text("SELECT pg_indexes_size(to_regclass(:t))"), {"t": f"{SCHEMA}.{t}"}).scalar() or 0
+        for t in tables
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--rows", type=int, default=100_000_000)
+    parser.add_argument("--months", type=int, default=24)
+    parser.add_argument("--rooms", type=int, default=1000)
+    parser.add_argument("--cursor-months", type=int, default=6, help="how far back the cursor page starts")
+    parser.add_argument("--runs", type=int, default=50, help="queries per measurement (random rooms)")
+    parser.add_argument("--keep", action="store_true", help="leave the bench_chat schema in place")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    if engine.dialect.name != "postgresql":
+        raise SystemExit("This benchmark requires PostgreSQL.")
+
+    end = month_start(datetime.now(timezone.utc))
+    months = [add_months(end, -n) for n in range(args.months, 0, -1)]
+    start = months[0]
+    rng = random.Random(0)
+    rooms = [{"room": room_uuid(rng.randrange(args.rooms))} for _ in range(args.runs)]
+    cursor_at = end - timedelta(days=30 * args.cursor_months)
+    cursors = [{**r, "at": cursor_at, "id": 2**31 - 1} for r in rooms]
+
+    with engine.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        create_tables(conn, months)
+        print(f"Loading {args.rows:,} rows over {args.months} months, {args.rooms} rooms")
+        results = {}
+        for table in ("plain", "partitioned"):
+            load_s = load(conn, table, args.rows, args.rooms, start, end)
+            create_indexes(conn, table)
+            newest = "plain" if table == "plain" else partition_name("partitioned", months[-1])
+            results[table] = {
+                "load_s": load_s,
+                "latest_ms": timed(conn, LATEST_PAGE.format(table=f"{SCHEMA}.{table}"), rooms),
+                "cursor_ms": timed(conn, CURSOR_PAGE.format(table=f"{SCHEMA}.{table}"), cursors),
+                "latest_plan": plan_stats(conn, LATEST_PAGE.format(table=f"{SCHEMA}.{table}"), rooms[0]),
+                "cursor_plan": plan_stats(conn, CURSOR_PAGE.format(table=f"{SCHEMA}.{table}"), cursors[0]),
+                "index_mb": index_size(conn, [table] + [partition_name(table, m) for m in months]) / 2**20,
+                "newest_index_mb": index_size(conn, [newest]) / 2**20,
+            }
+
+        # Retention: drop the oldest month
+        started = time.perf_counter()
+        conn.execute(text(f"DELETE FROM {SCHEMA}.plain WHERE created_at < :cutoff"), {"cutoff": months[1]})
+        results["plain"]["drop_month_s"] = time.perf_counter() - started
+        oldest = partition_name("partitioned", months[0])
+        started = time.perf_counter()
+        conn.execute(text(f"ALTER TABLE {SCHEMA}.partitioned DETACH PARTITION {SCHEMA}.{oldest}"))
+        conn.execute(text(f"DROP TABLE {SCHEMA}.{oldest}"))
+        results["partitioned"]["drop_month_s"] = time.perf_counter() - started
+
+        if not args.keep:
+            conn.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+
+    print(f"\n{'':<34}{'plain':>16}{'partitioned':>16}")
+    rows = [
+        ("load (s)", "load_s", "{:.0f}"),
+        ("latest page, median (ms)", "latest_ms", "{:.2f}"),
+        ("cursor page, median (ms)", "cursor_ms", "{:.2f}"),
+        ("latest page: tables, buffers", "latest_plan", "{0[0]}, {0[1]}"),
+        ("cursor page: tables, buffers", "cursor_plan", "{0[0]}, {0[1]}"),
+        ("index size (MiB)", "index_mb", "{:.0f}"),
+        ("newest month's indexes (MiB)", "newest_index_mb", "{:.0f}"),
+        ("drop oldest month (s)", "drop_month_s", "{:.2f}"),
+    ]
+    for label, key, fmt in rows:
+        print(f"{label:<34}" + "".join(f"{fmt.format(results[t][key]):>16}" for t in ("plain", "partitioned")))
+    print("\nplain: newest month's indexes = the whole table's; DELETE also leaves dead rows for VACUUM.")
+
+
+if __name__ == "__main__":
+    main()
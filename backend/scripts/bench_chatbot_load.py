@@ -0,0 +1,183 @@
+# scripts/bench_chatbot_load.py
+"""
+Chatbot throughput and tail latency, end to end, without network access.
+
+    python scripts/bench_chatbot_load.py
+    python scripts/bench_chatbot_load.py --users 200 --requests 5 --concurrency 32 --first-token-ms 500
+
+Starts the app in a uvicorn subprocess with the fake LLM backend
+(CHATBOT_BACKEND=fake: --first-token-ms before the first word, then
+--tokens words --token-ms apart) and rate limiting off, against
+DATABASE_URL or, if unset, a throwaway SQLite file. Creates a location
+and --users users through the API, then each user sends --requests
+questions, --parallel at a time, to POST /chatbot/{id} or, with
+--stream, POST /chatbot/{id}/stream. Every question is different, so
+none is answered from the answer cache. Reports:
+  - replies per second and latency p50/p95/p99 (for streams also the
+    time to the first token)
+  - replies refused (429: over CHATBOT_USER_CONCURRENCY) or failed
+    (fallback reply / error event, e.g. past CHATBOT_DEADLINE)
+  - the limiter's view from GET /metrics: time spent queued for one of
+    the --concurrency generation slots
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import httpx
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FAILED_REPLY = "I'm having trouble reaching the AI guide right now. Please try again later."
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int, env: dict, timeout: float = 30.0) -> subprocess.Popen:
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BASE_DIR,
+        env=env,
+    )
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        if proc.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with code {proc.returncode}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1):
+                return proc
+        except OSError:
+            time.sleep(0.05)
+    proc.terminate()
+    raise RuntimeError("server did not answer before timeout")
+
+
+def percentiles(values: list[float]) -> str:
+    if not values:
+        return "-"
+    values = sorted(values)
+    pick = lambda q: values[min(int(len(values) * q), len(values) - 1)] * 1000
+    return f"p50 {pick(0.5):8.1f} ms  p95 {pick(0.95):8.1f} ms  p99 {pick(0.99):8.1f} ms"
+
+
+async def ask(client: httpx.AsyncClient, path: str, headers: dict, question: str, stream: bool, results: dict) -> None:
+    started = time.perf_counter()
+    body = {"message": question}
+    if not stream:
+        resp = await client.post(path, json=body, headers=headers)
+        if resp.status_code == 429:
+            results["refused"] += 1
+        elif resp.status_code != 200 or resp.json()["reply"] == FAILED_REPLY:
+            results["failed"] += 1
+        else:
+            results["latency"].append(time.perf_counter() - started)
+        return
+
+    first = None
+    async with client.stream("POST", f"{path}/stream", json=body, headers=headers) as resp:
+        if resp.status_code == 429:
+            results["refused"] += 1
+            return
+        async for line in resp.aiter_lines():
+            if first is None and line == "event: token":
+                first = time.perf_counter() - started
+            elif line == "event: error":
+                results["failed"] += 1
+                return
+    results["latency"].append(time.perf_counter() - started)
+    results["first"].append(first)
+
+
+async def user(client: httpx.AsyncClient, path: str, user_id: str, n: int, args, results: dict) -> None:
+    headers = {"X-User-ID": user_id}
+    questions = [f"Question {n}-{i}: what is there to do near the harbour?" for i in range(args.requests)]
+    for i in range(0, len(questions), args.parallel):
+        await asyncio.gather(*(
+            ask(client, path, headers, q, args.stream, results) for q in questions[i:i + args.parallel]
+        ))
+
+
+async def run(base_url: str, args) -> None:
+    limits = httpx.Limits(max_connections=args.users * args.parallel + 10)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        location = (await client.post("/locations/", json={
+            "name": "Old Harbour", "area": "Central", "description": "A fishing harbour with a lighthouse",
+        })).json()["id"]
+        user_ids = []
+        for n in range(args.users):
+            resp = await client.post("/auth/register", json={
+                "email": f"bench-{n}-{time.time_ns()}@example.com", "username": f"bench{n}", "password": "bench",
+            })
+            user_ids.append(resp.json()["user_id"])
+
+        results = {"latency": [], "first": [], "refused": 0, "failed": 0}
+        path = f"/chatbot/{location}"
+        started = time.perf_counter()
+        await asyncio.gather(*(user(client, path, uid, n, args, results) for n, uid in enumerate(user_ids)))
+        elapsed = time.perf_counter() - started
+        limiter = (await client.get("/metrics")).json()["chatbot_limiter"]
+
+    sent = args.users * args.requests
+    print(f"{sent} {'streamed ' if args.stream else ''}replies from {args.users} users "
+          f"({args.parallel} at a time each), {args.concurrency} generation slots, "
+          f"fake model {args.first_token_ms:g} ms + {args.tokens} x {args.token_ms:g} ms")
+    print(f"  throughput   {len(results['latency']) / elapsed:8.1f} replies/s over {elapsed:.1f} s")
+    print(f"  latency      {percentiles(results['latency'])}")
+    if args.stream:
+        print(f"  first token  {percentiles(results['first'])}")
+    print(f"  refused (429) {results['refused']}, failed {results['failed']}")
+    queue = limiter["queue_ms"] or {}
+    print(f"  queued for a slot (last {min(sent, 1000)}): p50 {queue.get('p50')} ms  p95 {queue.get('p95')} ms  "
+          f"p99 {queue.get('p99')} ms  max {queue.get('max')} ms; timed out {limiter['timed_out']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=4, help="questions per user")
+    parser.add_argument("--parallel", type=int, default=1, help="questions per user in flight at once")
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--concurrency", type=int, default=16, help="CHATBOT_CONCURRENCY")
+    parser.add_argument("--user-concurrency", type=int, default=2, help="CHATBOT_USER_CONCURRENCY")
+    parser.add_argument("--deadline", type=float, default=45, help="CHATBOT_DEADLINE, seconds")
+    parser.add_argument("--first-token-ms", type=float, default=200)
+    parser.add_argument("--token-ms", type=float, default=10)
+    parser.add_argument("--tokens", type=int, default=40)
+    args = parser.parse_args()
+
+    env = dict(
+        os.environ,
+        RATE_LIMIT_ENABLED="false",
+        CHATBOT_BACKEND="fake",
+        CHATBOT_CONCURRENCY=str(args.concurrency),
+        CHATBOT_USER_CONCURRENCY=str(args.user_concurrency),
+        CHATBOT_DEADLINE=str(args.deadline),
+        CHATBOT_FAKE_FIRST_TOKEN_MS=str(args.first_token_ms),
+        CHATBOT_FAKE_TOKEN_MS=str(args.token_ms),
+        CHATBOT_FAKE_TOKENS=str(args.tokens),
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        env.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        env["RETRIEVAL_INDEX_PATH"] = os.path.join(tmp, "retrieval.idx")
+        port = _free_port()
+        proc = start_server(port, env)
+        try:
+            asyncio.run(run(f"http://127.0.0.1:{port}", args))
+        finally:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    main()
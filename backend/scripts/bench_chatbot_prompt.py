@@ -0,0 +1,139 @@
+# scripts/bench_chatbot_prompt.py
+"""
+Chatbot prompt size and latency against conversation length.
+
+    python scripts/bench_chatbot_prompt.py
+    python scripts/bench_chatbot_prompt.py --turns 0,10,50,100,400 --prefill-ms-per-kb 5
+
+For each conversation length compares the old prompt (location context
+rebuilt on every call, the whole history forwarded) with build_prompt()
+(cached context, history cut to CHATBOT_PROMPT_TOKENS with a note of
+older questions):
+  - prompt size in estimated tokens and in request bytes
+  - time to assemble the prompt
+  - round trip to the mock upstream from bench_chatbot_upstream.py, whose
+    reply time grows by --prefill-ms-per-kb per KB of request, as a
+    model's time to read the prompt does
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+from types import SimpleNamespace
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+sys.path.append(os.path.join(BASE_DIR, "scripts"))
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from bench_chatbot_upstream import MOCK, serve
+
+from app.utils.prompt_builder import LocationContexts, build_prompt, location_context, message_tokens
+from app.utils.upstream import UpstreamClient
+
+LOCATION = SimpleNamespace(
+    id=uuid.uuid4(),
+    name="Old Harbour",
+    area="Central",
+    region="Coast",
+    description=(
+        "A working fishing harbour with a restored 19th-century lighthouse, a fish market "
+        "on weekday mornings and a promenade lined with cafes. " * 3
+    ),
+    summary="Visitors praise the sunset views from the lighthouse and the seafood stalls.",
+)
+
+QUESTIONS = [
+    "What time does the lighthouse open, and is it worth climbing to the top?",
+    "Is there parking near the fish market, or should we take the bus from the station?",
+    "Which cafe on the promenade would you recommend for breakfast with kids?",
+    "How long does it take to walk from the harbour to the old town?",
+]
+ANSWER = (
+    "The lighthouse opens at 9am and closes at 6pm in summer; the climb is 120 steps and the view over "
+    "the bay is the best in town. Arrive early on weekends, as the queue builds up after 11am. "
+) * 2
+
+
+def conversation(turns: int) -> list[dict[str, str]]:
+    history = []
+    for n in range(turns // 2):
+        history.append({"role": "user", "content": QUESTIONS[n % len(QUESTIONS)]})
+        history.append({"role": "assistant", "content": ANSWER})
+    return history
+
+
+def old_prompt(history: list[dict[str, str]], message: str) -> list[dict[str, str]]:
+    # What chat_with_bot did before build_prompt
+    return [*location_context(LOCATION), *history, {"role": "user", "content": message}]
+
+
+def timed(build, runs: int) -> float:
+    started = time.perf_counter()
+    for _ in range(runs):
+        build()
+    return (time.perf_counter() - started) / runs * 1e6
+
+
+async def round_trips(client: UpstreamClient, prompt: list[dict[str, str]], runs: int) -> float:
+    payload = {"model": "deepseek-chat", "messages": prompt, "stream": False}
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        await client.post_json("/chat/completions", payload)
+        times.append((time.perf_counter() - started) * 1000)
+    return statistics.median(times)
+
+
+async def run(args) -> None:
+    client = UpstreamClient(base_url=f"http://127.0.0.1:{args.port}")
+    client.start()
+    contexts = LocationContexts()
+    contexts.put(LOCATION)
+    message = "And where can we watch the sunset?"
+
+    print(f"Budget {args.budget} tokens; mock upstream reads {args.prefill_ms_per_kb} ms per KB\n")
+    print(f"{'turns':>6} | {'tokens':>15} | {'request KB':>15} | {'build (us)':>15} | {'round trip (ms)':>17}")
+    print(f"{'':>6} | {'old':>7} {'new':>7} | {'old':>7} {'new':>7} | {'old':>7} {'new':>7} | {'old':>8} {'new':>8}")
+    for turns in args.turns:
+        history = conversation(turns)
+        old = old_prompt(history, message)
+        new = build_prompt(contexts.get(LOCATION.id), history, message, budget=args.budget)
+        row = []
+        row.append([sum(message_tokens(m) for m in p) for p in (old, new)])
+        row.append([len(json.dumps({"messages": p})) / 1024 for p in (old, new)])
+        row.append([
+            timed(lambda: old_prompt(history, message), args.runs),
+            timed(lambda: build_prompt(contexts.get(LOCATION.id), history, message, budget=args.budget), args.runs),
+        ])
+        row.append([await round_trips(client, p, args.trips) for p in (old, new)])
+        (ot, nt), (okb, nkb), (ous, nus), (oms, nms) = row
+        print(f"{turns:>6} | {ot:>7} {nt:>7} | {okb:>7.1f} {nkb:>7.1f} | {ous:>7.1f} {nus:>7.1f} | {oms:>8.1f} {nms:>8.1f}")
+    await client.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=lambda v: [int(n) for n in v.split(",")], default=[0, 10, 50, 100, 200])
+    parser.add_argument("--budget", type=int, default=3000, help="prompt tokens (CHATBOT_PROMPT_TOKENS)")
+    parser.add_argument("--prefill-ms-per-kb", type=float, default=2.0)
+    parser.add_argument("--runs", type=int, default=2000, help="prompt builds per timing")
+    parser.add_argument("--trips", type=int, default=5, help="upstream calls per timing")
+    parser.add_argument("--port", type=int, default=8767)
+    args = parser.parse_args()
+
+    MOCK["prefill_per_kb"] = args.prefill_ms_per_kb / 1000
+    server = serve(args.port, None, None)
+    try:
+        asyncio.run(run(args))
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# scripts/bench_chatbot_stream.py
+"""
+Time to first token: POST /chatbot/{id} vs POST /chatbot/{id}/stream.
+
+    python scripts/bench_chatbot_stream.py
+    python scripts/bench_chatbot_stream.py --tokens 200 --token-ms 20 --runs 5
+
+Uses the mock upstream from bench_chatbot_upstream.py as an
+OpenAI-compatible backend (CHATBOT_BACKEND=openai), streaming --tokens
+tokens --token-ms apart, and drives the two reply paths of
+app.routers.chatbot directly (no database needed). Reports:
+  - time until the user sees text, and until the whole reply
+  - a client that goes away after --cancel-after tokens: whether the
+    upstream stream was cut short and the generation slot given back
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+sys.path.append(os.path.join(BASE_DIR, "scripts"))
+
+from bench_chatbot_upstream import MOCK, STREAMS, serve
+
+
+async def measure(chatbot, prompt: list[dict], location_id: uuid.UUID) -> dict:
+    started = time.perf_counter()
+    await chatbot._generate_reply(prompt)
+    full = time.perf_counter() - started
+
+    started = time.perf_counter()
+    first = None
+    async for event in chatbot._stream_reply(prompt, location_id):
+        if first is None and event.startswith("event: token"):
+            first = time.perf_counter() - started
+        if event.startswith("event: done"):
+            reply = json.loads(event.split("data: ", 1)[1])["reply"]
+    streamed = time.perf_counter() - started
+    return {"full": full, "first": first, "streamed": streamed, "tokens": len(reply.split())}
+
+
+async def cancel_midway(chatbot, limiter, prompt: list[dict], location_id: uuid.UUID, after: int) -> None:
+    events = chatbot._stream_reply(prompt, location_id)
+    seen = 0
+
+    async def consume():
+        nonlocal seen
+        async for event in events:
+            seen += event.startswith("event: token")
+
+    task = asyncio.create_task(consume())
+    while seen < after:
+        await asyncio.sleep(0.001)
+    in_flight = limiter.in_flight
+    # What the endpoint does when the client disconnects: the response
+    # task is cancelled, then the generator is closed
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    await events.aclose()
+    for _ in range(100):
+        if STREAMS["disconnected"]:
+            break
+        await asyncio.sleep(0.05)
+    print(f"\nClient gone after {after} tokens:")
+    print(f"  upstream streams cut short: {STREAMS['disconnected']}, finished: {STREAMS['finished']}")
+    print(f"  generations in flight: {in_flight} before, {limiter.in_flight} after")
+
+
+async def run(args) -> None:
+    from app.routers import chatbot
+    from app.utils.llm import llm_backend
+    from app.utils.llm_limiter import llm_limiter
+
+    llm_backend.start()
+    location_id = uuid.uuid4()
+    prompt = [{"role": "user", "content": "What should I see at the harbour?"}]
+    results = [await measure(chatbot, prompt, location_id) for _ in range(args.runs)]
+    assert all(r["tokens"] == args.tokens for r in results)
+
+    print(f"{args.tokens} tokens, {args.token_ms} ms apart, median of {args.runs} runs")
+    print(f"  POST /chatbot/{{id}}         first text {statistics.median(r['full'] for r in results) * 1000:8.1f} ms")
+    print(f"  POST /chatbot/{{id}}/stream  first text {statistics.median(r['first'] for r in results) * 1000:8.1f} ms"
+          f"   full reply {statistics.median(r['streamed'] for r in results) * 1000:8.1f} ms")
+
+    STREAMS.update(started=0, finished=0, disconnected=0)
+    await cancel_midway(chatbot, llm_limiter, prompt, location_id, args.cancel_after)
+    await llm_backend.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=100)
+    parser.add_argument("--token-ms", type=float, default=10.0)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--cancel-after", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    MOCK.update(tokens=args.tokens, token_delay=args.token_ms / 1000)
+    os.environ["CHATBOT_BACKEND"] = "openai"
+    os.environ["CHATBOT_OPENAI_BASE_URL"] = f"http://127.0.0.1:{args.port}"
+    os.environ.setdefault("DATABASE_URL", "sqlite://")
+    server = serve(args.port, None, None)
+    try:
+        asyncio.run(run(args))
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
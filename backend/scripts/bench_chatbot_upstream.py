@@ -0,0 +1,247 @@
+# scripts/bench_chatbot_upstream.py
+"""
+Chatbot upstream calls against a local mock LLM server.
+
+    python scripts/bench_chatbot_upstream.py
+    python scripts/bench_chatbot_upstream.py --calls 500 --latency-ms 5 --tls
+
+Starts a mock /chat/completions server (uvicorn, in a thread; with --tls
+over a throwaway self-signed certificate, which needs the openssl CLI;
+requests with "stream": true get a token stream) and reports:
+  - per-call time, sequential and --concurrency at a time: a new
+    httpx.AsyncClient per call (the old behaviour) vs the shared
+    UpstreamClient (keep-alive)
+  - flaky upstream (--fail-rate of 503s): success rate without and
+    with retries
+  - upstream down: time per call until the circuit opens, and after
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+import httpx
+import uvicorn
+
+from app.utils.upstream import CircuitBreaker, UpstreamClient, UpstreamError
+
+PAYLOAD = {
+    "model": "deepseek-chat",
+    "messages": [{"role": "user", "content": "What should I see at the harbour?"}],
+    "stream": False,
+}
+REPLY = json.dumps({"choices": [{"message": {"role": "assistant", "content": "The lighthouse."}}]}).encode()
+
+# Mock behaviour, changed between phases
+MOCK = {"latency": 0.0, "fail_rate": 0.0, "tokens": 40, "token_delay": 0.0, "prefill_per_kb": 0.0}
+# Streamed replies: started, finished, cut short by the client
+STREAMS = {"started": 0, "finished": 0, "disconnected": 0}
+_rng = random.Random(0)
+
+
+async def _stream_reply(receive, send) -> None:
+    """OpenAI-style SSE: one chunk per token, then [DONE]."""
+    disconnected = asyncio.Event()
+
+    async def listen():
+        while (await receive())["type"] != "http.disconnect":
+            pass
+        disconnected.set()
+
+    listener = asyncio.create_task(listen())
+    STREAMS["started"] += 1
+    headers = [(b"content-type", b"text/event-stream")]
+    await send({"type": "http.response.start", "status": 200, "headers": headers})
+    try:
+        for n in range(MOCK["tokens"]):
+            if MOCK["token_delay"]:
+                await asyncio.sleep(MOCK["token_delay"])
+            if disconnected.is_set():
+                STREAMS["disconnected"] += 1
+                return
+            chunk = {"choices": [{"delta": {"content": f"tok{n} "}}]}
+            await send({"type": "http.response.body", "body": f"data: {json.dumps(chunk)}\n\n".encode(), "more_body": True})
+        await send({"type": "http.response.body", "body": b"data: [DONE]\n\n"})
+        STREAMS["finished"] += 1
+    finally:
+        listener.cancel()
+
+
+async def mock_app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+    # Reading the prompt takes longer the bigger it is
+    delay = MOCK["latency"] + MOCK["prefill_per_kb"] * len(body) / 1024
+    if delay:
+        await asyncio.sleep(delay)
+    if _rng.random() < MOCK["fail_rate"]:
+        status, body = 503, b'{"error": "overloaded"}'
+    elif json.loads(body or b"{}").get("stream"):
+        await _stream_reply(receive, send)
+        return
+    else:
+        # Generation time is the same whether streamed or not
+        if MOCK["token_delay"]:
+            await asyncio.sleep(MOCK["tokens"] * MOCK["token_delay"])
+        status, body = 200, REPLY
+    await send({"type": "http.response.start", "status": status, "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": body})
+
+
+def make_cert(directory: str) -> tuple[str, str]:
+    cert, key = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    subprocess.run(
+        [
+            "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+            "-subj", "/CN=localhost", "-addext", "subjectAltName=DNS:localhost,IP:127.0.0.1",
+            "-keyout", key, "-out", cert,
+        ],
+        check=True,
+        capture_output=True,
+    )
+    return cert, key
+
+
+def serve(port: int, cert: str | None, key: str | None) -> uvicorn.Server:
+    config = uvicorn.Config(
+        mock_app, host="127.0.0.1", port=port, log_level="warning",
+        ssl_certfile=cert, ssl_keyfile=key, backlog=4096,
+    )
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def fresh_client_call(base_url: str) -> None:
+    # What _generate_reply used to do
+    async with httpx.AsyncClient(base_url=base_url, timeout=20) as client:
+        resp = await client.post("/chat/completions", json=PAYLOAD)
+        resp.raise_for_status()
+        resp.json()
+
+
+async def timed_calls(call, calls: int, concurrency: int) -> list[float]:
+    times: list[float] = []
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with slots:
+            started = time.perf_counter()
+            await call()
+            times.append((time.perf_counter() - started) * 1000)
+
+    await asyncio.gather(*(one() for _ in range(calls)))
+    return times
+
+
+def summary(times: list[float]) -> str:
+    times = sorted(times)
+    p99 = times[min(len(times) - 1, int(len(times) * 0.99))]
+    return f"median {statistics.median(times):7.2f} ms   p99 {p99:7.2f} ms"
+
+
+async def run(args, base_url: str) -> None:
+    MOCK["latency"] = args.latency_ms / 1000
+
+    pooled = UpstreamClient(base_url=base_url, retries=0)
+    pooled.start()
+    await pooled.post_json("/chat/completions", PAYLOAD)  # open the first connection
+
+    print(f"Mock upstream {base_url}, {args.latency_ms} ms per reply, {args.calls} calls per row\n")
+    for concurrency in (1, args.concurrency):
+        fresh = await timed_calls(lambda: fresh_client_call(base_url), args.calls, concurrency)
+        shared = await timed_calls(lambda: pooled.post_json("/chat/completions", PAYLOAD), args.calls, concurrency)
+        print(f"concurrency {concurrency:<4} new client per call: {summary(fresh)}")
+        print(f"{'':<17}shared client:       {summary(shared)}")
+    await pooled.stop()
+
+    # Flaky upstream
+    MOCK["fail_rate"] = args.fail_rate
+    print(f"\n{args.fail_rate:.0%} of replies are 503:")
+    for retries in (0, 2):
+        client = UpstreamClient(
+            base_url=base_url, retries=retries, retry_backoff=0.01, breaker=CircuitBreaker(failures=0)
+        )
+        client.start()
+        ok = 0
+        for _ in range(args.calls):
+            try:
+                await client.post_json("/chat/completions", PAYLOAD)
+                ok += 1
+            except UpstreamError:
+                pass
+        print(f"  retries={retries}: {ok / args.calls:.1%} succeeded, {client.retried} retries")
+        await client.stop()
+
+    # Upstream down
+    MOCK["fail_rate"] = 1.0
+    client = UpstreamClient(
+        base_url=base_url, retries=2, retry_backoff=0.05, breaker=CircuitBreaker(failures=5, reset_after=60)
+    )
+    client.start()
+    before, after = [], []
+    for _ in range(20):
+        closed = client.breaker.state == "closed"
+        started = time.perf_counter()
+        try:
+            await client.post_json("/chat/completions", PAYLOAD)
+        except UpstreamError:
+            pass
+        (before if closed else after).append((time.perf_counter() - started) * 1000)
+    print("\nUpstream down (every reply 503, 2 retries):")
+    print(f"  circuit closed:          {len(before)} calls, median {statistics.median(before):.1f} ms")
+    print(f"  circuit open:            {len(after)} calls, median {statistics.median(after):.3f} ms")
+    await client.stop()
+    MOCK["fail_rate"] = 0.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="mock reply time")
+    parser.add_argument("--fail-rate", type=float, default=0.3, help="503s in the flaky phase")
+    parser.add_argument("--tls", action="store_true", help="serve HTTPS with a self-signed certificate")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cert = key = None
+        if args.tls:
+            cert, key = make_cert(tmp)
+            # httpx trusts SSL_CERT_FILE, for both the fresh and the shared clients
+            os.environ["SSL_CERT_FILE"] = cert
+        server = serve(args.port, cert, key)
+        scheme = "https" if args.tls else "http"
+        try:
+            asyncio.run(run(args, f"{scheme}://127.0.0.1:{args.port}"))
+        finally:
+            server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
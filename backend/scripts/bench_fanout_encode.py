@@ -0,0 +1,89 @@
+# scripts/bench_fanout_encode.py
+"""
+Fan-out CPU cost per chat message against room size.
+
+    python scripts/bench_fanout_encode.py
+    python scripts/bench_fanout_encode.py --sizes 10,100,1000,10000 --messages 200
+
+Compares, for one typical chat payload:
+  - per-recipient: json.dumps for every socket (what send_json does)
+  - encode-once:   one encode, the same str queued for every socket
+                   (json, and orjson when installed)
+Only the encode + enqueue work is timed (process CPU time); socket I/O
+and compression are per connection either way.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+from app.utils.ws_connections import Client
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def sample_message() -> dict:
+    return {
+        "id": 123456,
+        "room_id": str(uuid.uuid4()),
+        "user_id": str(uuid.uuid4()),
+        "text": "Anyone up for the sunrise hike tomorrow? Meeting at the trailhead at 5:30, bring a headlamp!",
+        "created_at": datetime.utcnow().isoformat(),
+        "username": "trail_runner_42",
+    }
+
+
+def fan_out(clients: list[Client], message: dict, mode: str) -> None:
+    if mode == "per-recipient":
+        for client in clients:
+            client.offer(json.dumps(message))
+        return
+    if mode == "encode-once (orjson)":
+        frame = orjson.dumps(message).decode()
+    else:
+        frame = json.dumps(message, separators=(",", ":"))
+    for client in clients:
+        client.offer(frame)
+
+
+def measure(size: int, messages: int, mode: str) -> float:
+    """CPU microseconds per message."""
+    clients = [Client(websocket=None, queue_size=0) for _ in range(size)]
+    message = sample_message()
+    total = 0.0
+    for _ in range(messages):
+        started = time.process_time()
+        fan_out(clients, message, mode)
+        total += time.process_time() - started
+        for client in clients:
+            client.queue.get_nowait()
+    return total / messages * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,100,1000,10000")
+    parser.add_argument("--messages", type=int, default=100)
+    args = parser.parse_args()
+
+    modes = ["per-recipient", "encode-once (json)"]
+    if orjson is not None:
+        modes.append("encode-once (orjson)")
+
+    print(f"{'room size':>10}  " + "  ".join(f"{mode:>22}" for mode in modes) + "   (CPU µs / message)")
+    for size in (int(s) for s in args.sizes.split(",")):
+        results = [measure(size, args.messages, mode) for mode in modes]
+        print(f"{size:>10}  " + "  ".join(f"{r:>22.1f}" for r in results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# scripts/bench_retrieval.py
+"""
+Chatbot retrieval index: build time, size and query latency.
+
+    python scripts/bench_retrieval.py
+    python scripts/bench_retrieval.py --locations 50000 --reviews 1000000 --queries 5000
+
+Builds an index of synthetic locations and reviews (words drawn from a
+Zipf-like vocabulary, so common words have long postings, as in real
+text) into a temporary file with write_index(), maps it as the app does
+and times RetrievalIndex.search() for random locations and questions of
+3 to 8 words. Also times queries with --overlay locations reloaded since
+the build. No database needed.
+"""
+import argparse
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from types import SimpleNamespace
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app.utils.retrieval import LocationDocs, RetrievalIndex, Snapshot, write_index
+
+SYLLABLES = ["ka", "lo", "mi", "sen", "ta", "ri", "po", "wan", "chu", "de", "ba", "ne", "su", "tor", "vi", "ham"]
+AREAS = [f"district{n}" for n in range(18)]
+TAGS = [f"tag{n}" for n in range(40)]
+
+
+def vocabulary(size: int, rng: random.Random) -> list[str]:
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def documents(args, rng: random.Random, words: list[str]):
+    weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(words))))
+    text = lambda n: " ".join(rng.choices(words, cum_weights=weights, k=n))
+    ids = sorted((uuid.UUID(int=rng.getrandbits(128)) for _ in range(args.locations)), key=lambda i: i.bytes)
+    per_location = args.reviews // args.locations
+    for location_id in ids:
+        location = SimpleNamespace(
+            id=location_id, name=text(3).title(), area=rng.choice(AREAS), region=None,
+            description=text(60), summary=text(25),
+        )
+        reviews = [(rng.randint(1, 5), text(rng.randint(8, 60))) for _ in range(per_location)]
+        yield LocationDocs(location, rng.sample(TAGS, 3), reviews)
+
+
+def percentile(values: list[float], q: float) -> float:
+    return values[min(int(len(values) * q), len(values) - 1)] * 1000
+
+
+def run_queries(index: RetrievalIndex, ids: list[uuid.UUID], words: list[str], args, rng: random.Random) -> list[float]:
+    weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(words))))
+    times = []
+    for _ in range(args.queries):
+        question = " ".join(rng.choices(words, cum_weights=weights, k=rng.randint(3, 8))) + "?"
+        location_id = rng.choice(ids)
+        started = time.perf_counter()
+        index.search(location_id, question)
+        times.append(time.perf_counter() - started)
+    return sorted(times)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--locations", type=int, default=50000)
+    parser.add_argument("--reviews", type=int, default=1000000, help="indexed reviews in total")
+    parser.add_argument("--vocabulary", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--overlay", type=int, default=200, help="locations reloaded since the build")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    words = vocabulary(args.vocabulary, rng)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "retrieval.idx")
+        ids = []
+
+        def tracked():
+            for docs in documents(args, rng, words):
+                ids.append(docs.location_id)
+                yield docs
+
+        started = time.perf_counter()
+        counts = write_index(path, tracked(), time.time())
+        built = time.perf_counter() - started
+        print(f"Built {counts['locations']} locations, {counts['reviews']} reviews, {counts['terms']} terms "
+              f"in {built:.1f} s; file {os.path.getsize(path) / 2**20:.1f} MiB (memory-mapped, shared by workers)")
+
+        index = RetrievalIndex(path=path)
+        index._reload()
+        for label in ("file only", f"{args.overlay} overlaid locations"):
+            times = run_queries(index, ids, words, args, rng)
+            print(f"  {label:<24} p50 {percentile(times, 0.5):6.2f} ms  p95 {percentile(times, 0.95):6.2f} ms  "
+                  f"p99 {percentile(times, 0.99):6.2f} ms  max {times[-1] * 1000:6.2f} ms")
+            overlay = SimpleNamespace(locations=args.overlay, reviews=args.overlay * (args.reviews // args.locations))
+            overlaid = {docs.location_id: (time.time(), docs) for docs in documents(overlay, rng, words)}
+            index.snapshot = Snapshot(index.file, {**index.snapshot.overlay, **overlaid})
+        index.file.close()
+
+
+if __name__ == "__main__":
+    main()
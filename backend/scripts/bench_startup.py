@@ -0,0 +1,144 @@
+# scripts/bench_startup.py
+"""
+Startup benchmark: import time of app.main and time-to-first-request.
+
+    python scripts/bench_startup.py            # compare against the budget
+    python scripts/bench_startup.py --update   # record a new budget
+
+Each timing is the median of --runs cold subprocesses. Exits non-zero
+if a timing exceeds its budget by more than --tolerance, or if app.main
+imports more modules than budgeted. Runs with the current environment,
+so set BOOT_MODE / DATABASE_URL as in production.
+
+Milliseconds depend on the machine, so two metrics do not:
+  - app_modules: modules importing app.main loads beyond fastapi and
+    sqlalchemy, exact for a given set of installed packages
+  - import_ratio: time importing app.main takes after fastapi and
+    sqlalchemy, as a multiple of the time they took
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_FILE = os.path.join(BASE_DIR, "scripts", "startup_budget.json")
+
+# Metrics compared exactly rather than within --tolerance
+EXACT = {"app_modules"}
+
+PROBE = """
+import sys, time
+started = time.perf_counter()
+import fastapi, sqlalchemy.orm
+framework = time.perf_counter() - started
+before = set(sys.modules)
+started = time.perf_counter()
+import app.main
+print(len(set(sys.modules) - before), (time.perf_counter() - started) / framework)
+"""
+
+
+def measure_import_ms() -> float:
+    """Cumulative `-X importtime` of app.main, in milliseconds."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=BASE_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    for line in result.stderr.splitlines():
+        parts = [p.strip() for p in line.split("|")]
+        if len(parts) == 3 and parts[2] == "app.main":
+            return int(parts[1]) / 1000
+    raise RuntimeError("app.main not found in -X importtime output")
+
+
+def measure_app_imports() -> tuple[int, float]:
+    """(modules, time ratio) app.main adds on top of the framework; see PROBE."""
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=BASE_DIR, capture_output=True, text=True, check=True
+    )
+    modules, ratio = result.stdout.split()
+    return int(modules), float(ratio)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_first_request_ms(timeout: float = 30.0) -> float:
+    """Wall time from spawning uvicorn to the first successful GET /."""
+    port = _free_port()
+    # Keep the retrieval index this boot builds out of the shared path
+    index_dir = tempfile.TemporaryDirectory()
+    env = dict(os.environ, RETRIEVAL_INDEX_PATH=os.path.join(index_dir.name, "retrieval.idx"))
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BASE_DIR,
+        env=env,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if proc.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {proc.returncode}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1) as resp:
+                    if resp.status == 200:
+                        return (time.perf_counter() - started) * 1000
+            except OSError:
+                time.sleep(0.005)
+        raise RuntimeError("server did not answer before timeout")
+    finally:
+        proc.terminate()
+        proc.wait()
+        index_dir.cleanup()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed regression, as a fraction")
+    parser.add_argument("--update", action="store_true", help="write results as the new budget")
+    args = parser.parse_args()
+
+    probes = [measure_app_imports() for _ in range(args.runs)]
+    results = {
+        "import_ms": statistics.median(measure_import_ms() for _ in range(args.runs)),
+        "first_request_ms": statistics.median(measure_first_request_ms() for _ in range(args.runs)),
+        "app_modules": max(modules for modules, _ in probes),
+        "import_ratio": statistics.median(ratio for _, ratio in probes),
+    }
+
+    if args.update:
+        with open(BUDGET_FILE, "w") as f:
+            json.dump({k: round(v, 2) for k, v in results.items()}, f, indent=2)
+            f.write("\n")
+        print(f"Budget written to {BUDGET_FILE}")
+
+    with open(BUDGET_FILE) as f:
+        budget = json.load(f)
+
+    failed = False
+    for metric, value in results.items():
+        limit = budget[metric] * (1 if metric in EXACT else 1 + args.tolerance)
+        status = "ok" if value <= limit else "REGRESSED"
+        failed |= value > limit
+        unit = "ms" if metric.endswith("_ms") else ""
+        print(f"{metric:<18} {value:9.2f} {unit:<2}   budget {budget[metric]:9.2f} {unit:<2}   {status}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
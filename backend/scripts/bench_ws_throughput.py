@@ -0,0 +1,112 @@
+# scripts/bench_ws_throughput.py
+"""
+Websocket chat throughput: messages/second sent through /chat/{id}/ws and
+echoed back, for each CHAT_WRITE_DURABILITY mode.
+
+    python scripts/bench_ws_throughput.py --location-id <uuid>
+    python scripts/bench_ws_throughput.py --location-id <uuid> --modes sync,group --clients 50
+
+Each mode runs in a fresh uvicorn subprocess against DATABASE_URL, with
+rate limiting disabled and the chatbot retrieval index in a temporary
+directory. Every client sends --messages frames and waits
+for the echo of each before sending the next, so the rate reflects the
+per-message latency including any write the handler waits for.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import websockets
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int, durability: str, index_dir: str, timeout: float = 30.0) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        CHAT_WRITE_DURABILITY=durability,
+        RATE_LIMIT_ENABLED="false",
+        RETRIEVAL_INDEX_PATH=os.path.join(index_dir, "retrieval.idx"),
+    )
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BASE_DIR,
+        env=env,
+    )
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        if proc.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with code {proc.returncode}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1):
+                return proc
+        except OSError:
+            time.sleep(0.05)
+    proc.terminate()
+    raise RuntimeError("server did not answer before timeout")
+
+
+async def run_client(url: str, messages: int, latencies: list[float]) -> None:
+    async with websockets.connect(url) as ws:
+        for i in range(messages):
+            sent = time.perf_counter()
+            await ws.send(json.dumps({"text": f"bench {i}"}))
+            # Other clients' messages are broadcast too; wait for our own echo
+            while True:
+                frame = json.loads(await ws.recv())
+                if frame.get("message") == f"bench {i}":
+                    break
+            latencies.append(time.perf_counter() - sent)
+
+
+async def run_mode(url: str, clients: int, messages: int) -> dict:
+    latencies: list[float] = []
+    started = time.perf_counter()
+    await asyncio.gather(*(run_client(url, messages, latencies) for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "msg_per_s": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--location-id", required=True, help="existing location to chat in")
+    parser.add_argument("--modes", default="sync,group,async")
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=50, help="messages per client")
+    args = parser.parse_args()
+
+    print(f"{'mode':<8} {'msg/s':>10} {'p50 ms':>10} {'p99 ms':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in args.modes.split(","):
+            port = _free_port()
+            proc = start_server(port, mode, tmp)
+            try:
+                url = f"ws://127.0.0.1:{port}/chat/{args.location_id}/ws"
+                result = asyncio.run(run_mode(url, args.clients, args.messages))
+            finally:
+                proc.terminate()
+                proc.wait()
+            print(f"{mode:<8} {result['msg_per_s']:10.0f} {result['p50_ms']:10.1f} {result['p99_ms']:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+# scripts/build_retrieval_index.py
+"""
+Rebuilds the chatbot retrieval index from the database, as the app does
+when the file is missing or older than RETRIEVAL_REBUILD_SECONDS.
+
+    python scripts/build_retrieval_index.py
+    python scripts/build_retrieval_index.py --path /srv/data/retrieval.idx
+
+Running workers map the new file within RETRIEVAL_REFRESH_SECONDS; see
+app/utils/retrieval.py.
+"""
+import argparse
+import os
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.utils.retrieval import INDEX_PATH, build_index
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", default=INDEX_PATH, help="index file (default RETRIEVAL_INDEX_PATH)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    counts = build_index(args.path)
+    if counts is None:
+        raise SystemExit("Another process is building the index.")
+    print(f"Indexed {counts['locations']} locations, {counts['reviews']} reviews, {counts['terms']} terms "
+          f"into {args.path} in {time.perf_counter() - started:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# scripts/count_review_queries.py
+"""
+Query-count regression check for the review feeds.
+
+    python scripts/count_review_queries.py
+    python scripts/count_review_queries.py --reviews 200 --photos 3
+
+Seeds a throwaway SQLite database with a location and a user holding
+--reviews reviews of --photos photos each, calls every review listing
+endpoint in-process and counts the SQL statements each one runs. Fails
+if an endpoint runs more than its budget, or more for a full page than
+for a single review (i.e. queries grow with the page: an N+1).
+"""
+import argparse
+import os
+import sys
+import tempfile
+import uuid
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+TMP_DIR = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TMP_DIR, 'queries.db')}"
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+os.environ["RETRIEVAL_INDEX_PATH"] = os.path.join(TMP_DIR, "retrieval.idx")
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.database import Base, SessionLocal, engine
+from app.main import app
+from app.models import Location, Review, ReviewPhoto, User
+
+# Current user, the reviews, their photos
+BUDGET = 3
+
+ENDPOINTS = {
+    "reviews.get_all_reviews": lambda p: "/reviews/?limit=50",
+    "reviews.get_reviews_for_location": lambda p: f"/reviews/location/{p['location_id']}",
+    "reviews.get_reviews_by_user": lambda p: f"/reviews/user/{p['user_id']}",
+    "reviews.get_my_reviews": lambda p: "/reviews/me/reviews",
+}
+
+
+def seed(reviews: int, photos: int) -> dict:
+    db = SessionLocal()
+    try:
+        user = User(id=uuid.uuid4(), email=f"{uuid.uuid4()}@example.com", username="counter", password_hash="-")
+        location = Location(id=uuid.uuid4(), name=f"Counted {uuid.uuid4()}")
+        db.add_all([user, location])
+        for n in range(reviews):
+            review = Review(id=uuid.uuid4(), user_id=user.id, location_id=location.id, rating=n % 5 + 1, comment="ok")
+            db.add(review)
+            db.add_all(ReviewPhoto(review_id=review.id, file_path=f"{review.id}_{i}.jpg") for i in range(photos))
+        db.commit()
+        return {"user_id": str(user.id), "location_id": str(location.id)}
+    finally:
+        db.close()
+
+
+def count_queries(client: TestClient, path: str, user_id: str) -> tuple[int, int]:
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        resp = client.get(path, headers={"X-User-ID": user_id})
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    resp.raise_for_status()
+    return len(statements), len(resp.json())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reviews", type=int, default=50, help="reviews by the user on the location")
+    parser.add_argument("--photos", type=int, default=2, help="photos per review")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    client = TestClient(app)
+    # All reviews of the second seed are newer, so the feeds' first page is theirs
+    single = seed(1, args.photos)
+    page = seed(args.reviews, args.photos)
+
+    failed = False
+    for name, path in ENDPOINTS.items():
+        one, _ = count_queries(client, path(single), single["user_id"])
+        many, rows = count_queries(client, path(page), page["user_id"])
+        ok = many <= BUDGET and many <= one
+        failed |= not ok
+        print(f"{name:<36} 1 review: {one} queries   {rows} reviews: {many} queries   "
+              f"budget {BUDGET}   {'ok' if ok else 'REGRESSED'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
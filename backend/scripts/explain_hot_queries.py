@@ -0,0 +1,264 @@
+# scripts/explain_hot_queries.py
+"""
+Query-plan regression check for the hot queries.
+
+Runs EXPLAIN (FORMAT JSON) for each hot query against a seeded PostgreSQL
+database (see scripts/generate_data.py) and fails if:
+  - the query does not use its supporting index, or
+  - the plan sequentially scans a table larger than --seq-scan-threshold rows.
+
+    python scripts/generate_data.py --truncate
+    python scripts/explain_hot_queries.py
+"""
+import argparse
+import os
+import sys
+from dataclasses import dataclass
+from typing import Callable
+
+# -------------------------
+# Add project directory to PYTHONPATH
+# -------------------------
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, func, select, text, tuple_
+
+load_dotenv()
+
+from app.models import (
+    ChatMessage,
+    ChatRoomMessage,
+    LocationTag,
+    Location,
+    Review,
+    UserVisit,
+)
+
+
+@dataclass
+class HotQuery:
+    name: str
+    index: str
+    build: Callable[[dict], object]
+
+
+# Sample keys used as bind parameters: (key, SQL returning one value)
+SAMPLES = {
+    "room_id": "SELECT room_id FROM chat_room_messages LIMIT 1",
+    "room_cursor_at": "SELECT created_at FROM chat_room_messages ORDER BY id DESC LIMIT 1",
+    "room_cursor_id": "SELECT max(id) FROM chat_room_messages",
+    "location_id": "SELECT location_id FROM chat_messages LIMIT 1",
+    "visit_user_id": "SELECT user_id FROM user_visits LIMIT 1",
+    "review_location_id": "SELECT location_id FROM reviews LIMIT 1",
+    "review_user_id": "SELECT user_id FROM reviews LIMIT 1",
+    "review_cursor_at": "SELECT max(created_at) FROM reviews",
+    "review_cursor_id": "SELECT id FROM reviews LIMIT 1",
+    "tag_ids": "SELECT array_agg(id) FROM (SELECT id FROM tags ORDER BY id LIMIT 3) t",
+}
+
+# Review feed sort -> (leading key column, descending), as in app/routers/reviews.py
+REVIEW_SORTS = {
+    "newest": (None, True),
+    "highest_rating": ("rating", True),
+    "lowest_rating": ("rating", False),
+    "most_photos": ("photo_count", True),
+}
+
+
+def review_index(feed_column: str, sort: str) -> str:
+    column = REVIEW_SORTS[sort][0]
+    return "_".join(["ix_reviews", feed_column] + ([column] if column else []) + ["created_at_id"])
+
+
+def review_page(where: list, sort: str):
+    column, descending = REVIEW_SORTS[sort]
+    columns = ([getattr(Review, column)] if column else []) + [Review.created_at, Review.id]
+    order = [c.desc() if descending else c.asc() for c in columns]
+    return select(Review).where(*where).order_by(*order).limit(50)
+
+
+HOT_QUERIES = [
+    HotQuery(
+        "chat.get_room_messages",
+        "ix_chat_room_messages_room_id_created_at_id",
+        lambda p: (
+            select(ChatRoomMessage)
+            .where(ChatRoomMessage.room_id == p["room_id"])
+            .order_by(ChatRoomMessage.created_at.desc(), ChatRoomMessage.id.desc())
+            .limit(50)
+        ),
+    ),
+    HotQuery(
+        "chat.get_room_messages (before cursor)",
+        "ix_chat_room_messages_room_id_created_at_id",
+        lambda p: (
+            select(ChatRoomMessage)
+            .where(
+                ChatRoomMessage.room_id == p["room_id"],
+                ChatRoomMessage.created_at <= p["room_cursor_at"],
+                tuple_(ChatRoomMessage.created_at, ChatRoomMessage.id) < (p["room_cursor_at"], p["room_cursor_id"]),
+            )
+            .order_by(ChatRoomMessage.created_at.desc(), ChatRoomMessage.id.desc())
+            .limit(50)
+        ),
+    ),
+    HotQuery(
+        "chat.get_messages",
+        "ix_chat_messages_location_id_created_at_id",
+        lambda p: (
+            select(ChatMessage)
+            .where(ChatMessage.location_id == p["location_id"])
+            .order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+            .limit(200)
+        ),
+    ),
+    HotQuery(
+        "chat_retention.prune_location (cutoff)",
+        "ix_chat_messages_location_id_created_at_id",
+        lambda p: (
+            select(ChatMessage.created_at)
+            .where(ChatMessage.location_id == p["location_id"])
+            .order_by(ChatMessage.created_at.desc())
+            .offset(200)
+            .limit(1)
+        ),
+    ),
+    HotQuery(
+        "interactions.get_user_visits",
+        "ix_user_visits_user_id_created_at",
+        lambda p: (
+            select(UserVisit)
+            .where(UserVisit.user_id == p["visit_user_id"])
+            .order_by(UserVisit.created_at.desc())
+        ),
+    ),
+    HotQuery(
+        "users.get_my_profile (visits)",
+        "ix_user_visits_user_id_created_at",
+        lambda p: (
+            select(UserVisit, Location.name)
+            .join(Location, UserVisit.location_id == Location.id)
+            .where(UserVisit.user_id == p["visit_user_id"])
+            .order_by(UserVisit.created_at.desc())
+        ),
+    ),
+    HotQuery(
+        "reviews.get_all_reviews",
+        "ix_reviews_created_at_id",
+        lambda p: review_page([], "newest"),
+    ),
+    HotQuery(
+        "reviews.get_reviews_for_location (next cursor)",
+        "ix_reviews_location_id_created_at_id",
+        lambda p: review_page(
+            [
+                Review.location_id == p["review_location_id"],
+                tuple_(Review.created_at, Review.id) < (p["review_cursor_at"], p["review_cursor_id"]),
+            ],
+            "newest",
+        ),
+    ),
+    *(
+        HotQuery(
+            f"reviews.{endpoint} ({sort})",
+            review_index(column, sort),
+            lambda p, column=column, sample=sample, sort=sort: review_page(
+                [getattr(Review, column) == p[sample]], sort
+            ),
+        )
+        for endpoint, column, sample in (
+            ("get_reviews_for_location", "location_id", "review_location_id"),
+            ("get_reviews_by_user", "user_id", "review_user_id"),
+        )
+        for sort in REVIEW_SORTS
+    ),
+    HotQuery(
+        "locations.filter_locations_by_tags",
+        "ix_location_tags_tag_id_location_id",
+        lambda p: (
+            select(LocationTag.location_id)
+            .where(LocationTag.tag_id.in_(p["tag_ids"]))
+            .distinct()
+        ),
+    ),
+    HotQuery(
+        "locations.filter_locations_by_tags (match_all)",
+        "ix_location_tags_tag_id_location_id",
+        lambda p: (
+            select(LocationTag.location_id, func.count(LocationTag.tag_id))
+            .where(LocationTag.tag_id.in_(p["tag_ids"]))
+            .group_by(LocationTag.location_id)
+            .having(func.count(LocationTag.tag_id) == len(p["tag_ids"]))
+        ),
+    ),
+]
+
+
+def walk(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from walk(child)
+
+
+def explain(conn, stmt) -> dict:
+    compiled = stmt.compile(dialect=conn.dialect, compile_kwargs={"render_postcompile": True})
+    result = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params)
+    return result.scalar()[0]["Plan"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--seq-scan-threshold", type=int, default=10_000, help="max rows a seq-scanned table may have")
+    parser.add_argument("--no-analyze", action="store_true", help="skip ANALYZE before explaining")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    if engine.dialect.name != "postgresql":
+        raise SystemExit("EXPLAIN checks require PostgreSQL.")
+
+    failures = 0
+    with engine.connect() as conn:
+        if not args.no_analyze:
+            conn.execute(text("ANALYZE"))
+
+        params = {key: conn.execute(text(sql)).scalar() for key, sql in SAMPLES.items()}
+        missing = [key for key, value in params.items() if value is None]
+        if missing:
+            raise SystemExit(f"Database is not seeded (no sample for {', '.join(missing)}).")
+
+        sizes = dict(conn.execute(text(
+            "SELECT relname, reltuples::bigint FROM pg_class WHERE relkind IN ('r', 'p')"
+        )).all())
+        # Partition index -> index on the partitioned table it belongs to
+        parent_index = dict(conn.execute(text(
+            "SELECT c.relname, p.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE c.relkind = 'i'"
+        )).all())
+
+        for query in HOT_QUERIES:
+            nodes = list(walk(explain(conn, query.build(params))))
+            problems = []
+
+            used = {parent_index.get(name, name) for name in (node.get("Index Name") for node in nodes)}
+            if query.index not in used:
+                problems.append(f"does not use {query.index}")
+
+            for node in nodes:
+                if node["Node Type"] == "Seq Scan":
+                    relation = node["Relation Name"]
+                    if sizes.get(relation, 0) > args.seq_scan_threshold:
+                        problems.append(f"seq scan on {relation} ({sizes[relation]:,} rows)")
+
+            failures += bool(problems)
+            status = "FAIL: " + "; ".join(problems) if problems else "ok"
+            print(f"{query.name:<48} {status}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
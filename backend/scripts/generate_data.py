@@ -0,0 +1,517 @@
+# scripts/generate_data.py
+"""
+Synthetic data generator for scale testing.
+
+Fills every table with reproducible, Zipf-skewed data so benchmarks run
+against production-like volumes:
+
+    python scripts/generate_data.py --locations 1000000 --users 1000000 \
+        --visits 50000000 --jobs 8 --truncate
+
+Rows are produced in fixed-size blocks, each block seeded from
+(seed, table, block index). The same seed therefore yields the same
+rows no matter how many --jobs are used. On PostgreSQL rows are streamed
+with COPY; other databases fall back to multi-row INSERTs.
+"""
+import argparse
+import functools
+import io
+import itertools
+import os
+import random
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+# -------------------------
+# Add project directory to PYTHONPATH
+# -------------------------
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
+
+load_dotenv()
+
+from app.database import Base
+import app.models  # registers all tables on Base.metadata
+
+
+# ---------- Vocabulary ----------
+
+ADJECTIVES = [
+    "Hidden", "Misty", "Golden", "Windy", "Quiet", "Rocky", "Emerald", "Lonely",
+    "Sunny", "Twin", "High", "Old", "Silver", "Crimson", "Lantern", "Dragon's",
+]
+NOUNS = [
+    "Peak", "Trail", "Ridge", "Bay", "Falls", "Lookout", "Reservoir", "Market",
+    "Temple", "Harbour", "Garden", "Village", "Beach", "Pier", "Island", "Street",
+]
+AREAS = [
+    "Central", "Wan Chai", "Sai Kung", "Lantau", "Tai Po", "Sha Tin", "Tuen Mun",
+    "Stanley", "Mong Kok", "Kowloon City", "Aberdeen", "Yuen Long",
+]
+REGIONS = ["Hong Kong Island", "Kowloon", "New Territories", "Outlying Islands"]
+DURATIONS = ["30 min", "1 hour", "2 hours", "Half day", "Full day"]
+OPENING_HOURS = ["24 hours", "09:00-18:00", "10:00-22:00", "06:00-20:00"]
+ROOM_CATEGORIES = ["all", "food", "sights", "hiking"]
+TAG_WORDS = [
+    "hiking", "scenic", "sunset", "food", "family", "beach", "history", "nightlife",
+    "photography", "camping", "culture", "shopping", "views", "nature", "temple",
+]
+WORDS = (
+    "the a great view trail steep easy path food stall sunset crowd quiet bring water "
+    "shoes weekend morning bus ferry stairs worth it amazing busy clean local tea "
+    "noodles hike peak harbour breeze rocks beach waves lantern market night photos"
+).split()
+
+# Relative weights for ratings 1..5 (reviews skew positive)
+RATING_WEIGHTS = [5, 7, 15, 35, 38]
+
+COPY_NULL = "\\N"
+
+
+# ---------- Helpers ----------
+
+@functools.lru_cache(maxsize=8)
+def zipf_cum_weights(n: int, s: float) -> list[float]:
+    """
+    Cumulative Zipf weights for ranks 1..n, for use with random.choices.
+    Cached: every block of a phase shares the same table.
+    """
+    return list(itertools.accumulate(rank ** -s for rank in range(1, n + 1)))
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def entity_uuid(kind: int, index: int) -> uuid.UUID:
+    """
+    Deterministic UUID for the index-th entity of a kind.
+    Lets any block reference rows from another table without a lookup;
+    the cache keeps the Zipf head (popular locations/users) hot.
+    """
+    return uuid.UUID(int=(kind << 64) | index, version=4)
+
+
+def block_rng(seed: int, table: str, block: int) -> random.Random:
+    return random.Random(f"{seed}:{table}:{block}")
+
+
+def allocate(total: int, n: int, cum_weights: list[float], rng: random.Random, start: int, stop: int):
+    """
+    Yields (index, count) for entities in [start, stop), splitting `total`
+    rows across all n entities proportionally to their Zipf weight.
+    """
+    norm = total / cum_weights[-1]
+    prev = cum_weights[start - 1] if start else 0.0
+    for i in range(start, stop):
+        expected = (cum_weights[i] - prev) * norm
+        prev = cum_weights[i]
+        count = int(expected)
+        if rng.random() < expected - count:
+            count += 1
+        yield i, count
+
+
+def distinct_sample(rng: random.Random, n: int, cum_weights: list[float], k: int) -> list[int]:
+    """Zipf-weighted sample of k distinct indices out of n."""
+    k = min(k, n)
+    if k * 2 > n:
+        return rng.sample(range(n), k)
+    chosen: set[int] = set()
+    while len(chosen) < k:
+        chosen.update(rng.choices(range(n), cum_weights=cum_weights, k=k - len(chosen)))
+    return list(chosen)
+
+
+def sentence(rng: random.Random, low: int, high: int) -> str:
+    return " ".join(rng.choices(WORDS, k=rng.randint(low, high))).capitalize() + "."
+
+
+def copy_field(value) -> str:
+    if value is None:
+        return COPY_NULL
+    if isinstance(value, str):
+        return value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+    return str(value)
+
+
+# ---------- Table layouts ----------
+
+COLUMNS = {
+    "tags": ("id", "name"),
+    "chat_rooms": ("id", "name", "category", "created_at"),
+    "locations": (
+        "id", "name", "description", "maps_url", "price_level", "area", "region",
+        "summary", "duration", "opening_hours", "created_at",
+    ),
+    "location_images": ("location_id", "file_path", "created_at"),
+    "location_tags": ("location_id", "tag_id"),
+    "users": (
+        "id", "email", "password_hash", "username", "role", "points", "level", "created_at",
+    ),
+    "reviews": ("id", "user_id", "location_id", "rating", "comment", "photo_count", "created_at"),
+    "review_photos": ("review_id", "file_path", "created_at"),
+    "user_likes": ("user_id", "location_id", "created_at"),
+    "user_saved": ("user_id", "location_id", "created_at"),
+    "user_visits": ("user_id", "location_id", "created_at", "points_earned"),
+    "chat_messages": ("location_id", "user_id", "message", "created_at"),
+    "chat_room_messages": ("room_id", "user_id", "text", "created_at"),
+}
+
+# Kind prefixes for entity_uuid
+LOCATION_KIND = 0x10CA7104
+USER_KIND = 0xA5E40000
+ROOM_KIND = 0x0C4A7000
+REVIEW_KIND = 0x4E714E00
+
+POINTS_PER_CHECKIN = 10
+
+
+# ---------- Block generators ----------
+# Each returns {table: [row tuples]} in FK-safe order.
+
+def gen_static(cfg) -> dict:
+    rng = block_rng(cfg.seed, "static", 0)
+    tag_names = []
+    for i in range(cfg.tags):
+        base = TAG_WORDS[i % len(TAG_WORDS)]
+        tag_names.append(base if i < len(TAG_WORDS) else f"{base}-{i}")
+
+    rooms = [
+        (
+            entity_uuid(ROOM_KIND, i),
+            f"Room {i + 1}",
+            ROOM_CATEGORIES[i % len(ROOM_CATEGORIES)],
+            cfg.start + timedelta(seconds=rng.randrange(cfg.window)),
+        )
+        for i in range(cfg.rooms)
+    ]
+    return {
+        "tags": [(i + 1, name) for i, name in enumerate(tag_names)],
+        "chat_rooms": rooms,
+    }
+
+
+def gen_locations(cfg, block: int) -> dict:
+    rng = block_rng(cfg.seed, "locations", block)
+    tag_cw = zipf_cum_weights(cfg.tags, cfg.zipf) if cfg.tags else []
+    start, stop = cfg.block_range(block, cfg.locations)
+
+    locations, images, location_tags = [], [], []
+    for i in range(start, stop):
+        loc_id = entity_uuid(LOCATION_KIND, i)
+        created = cfg.start + timedelta(seconds=rng.randrange(cfg.window))
+        locations.append((
+            loc_id,
+            f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}",
+            sentence(rng, 12, 40),
+            f"https://maps.example.com/?q={i}",
+            rng.randint(1, 4),
+            rng.choice(AREAS),
+            rng.choice(REGIONS),
+            sentence(rng, 6, 14),
+            rng.choice(DURATIONS),
+            rng.choice(OPENING_HOURS),
+            created,
+        ))
+        for j in range(rng.randint(0, cfg.images_per_location)):
+            images.append((loc_id, f"media/location_images/{loc_id}_{j}.jpg", created))
+        if tag_cw:
+            k = rng.randint(1, cfg.tags_per_location)
+            for tag_index in distinct_sample(rng, cfg.tags, tag_cw, k):
+                location_tags.append((loc_id, tag_index + 1))
+
+    return {"locations": locations, "location_images": images, "location_tags": location_tags}
+
+
+def gen_users(cfg, block: int) -> dict:
+    rng = block_rng(cfg.seed, "users", block)
+    user_cw = zipf_cum_weights(cfg.users, cfg.activity_zipf)
+    loc_cw = zipf_cum_weights(cfg.locations, cfg.zipf)
+    start, stop = cfg.block_range(block, cfg.users)
+
+    # Separate streams per relation so changing one count never reshuffles another
+    alloc = {
+        name: allocate(total, cfg.users, user_cw, block_rng(cfg.seed, name, block), start, stop)
+        for name, total in (
+            ("reviews", cfg.reviews),
+            ("likes", cfg.likes),
+            ("saves", cfg.saves),
+            ("visits", cfg.visits),
+        )
+    }
+
+    users, reviews, photos, likes, saved, visits = [], [], [], [], [], []
+    for i in range(start, stop):
+        user_id = entity_uuid(USER_KIND, i)
+        joined = cfg.start + timedelta(seconds=rng.randrange(cfg.window))
+        _, n_visits = next(alloc["visits"])
+        points = n_visits * POINTS_PER_CHECKIN
+        users.append((
+            user_id,
+            f"user{i}@example.test",
+            cfg.password_hash,
+            f"user{i}",
+            "user",
+            points,
+            max(1, points // 100 + 1),
+            joined,
+        ))
+
+        _, n_reviews = next(alloc["reviews"])
+        for j, loc_index in enumerate(distinct_sample(rng, cfg.locations, loc_cw, n_reviews)):
+            review_id = entity_uuid(REVIEW_KIND, (i << 20) | j)
+            created = cfg.start + timedelta(seconds=rng.randrange(cfg.window))
+            comment = sentence(rng, 5, 30) if rng.random() < 0.8 else None
+            rating = rng.choices((1, 2, 3, 4, 5), weights=RATING_WEIGHTS)[0]
+            n_photos = rng.randint(1, 3) if rng.random() < cfg.photo_rate else 0
+            reviews.append((
+                review_id,
+                user_id,
+                entity_uuid(LOCATION_KIND, loc_index),
+                rating,
+                comment,
+                n_photos,
+                created,
+            ))
+            for p in range(n_photos):
+                photos.append((review_id, f"media/review_photos/{review_id}_{p}.jpg", created))
+
+        for rows, key in ((likes, "likes"), (saved, "saves")):
+            _, n = next(alloc[key])
+            for loc_index in distinct_sample(rng, cfg.locations, loc_cw, n):
+                rows.append((
+                    user_id,
+                    entity_uuid(LOCATION_KIND, loc_index),
+                    cfg.start + timedelta(seconds=rng.randrange(cfg.window)),
+                ))
+
+        if n_visits:
+            for loc_index in rng.choices(range(cfg.locations), cum_weights=loc_cw, k=n_visits):
+                visits.append((
+                    user_id,
+                    entity_uuid(LOCATION_KIND, loc_index),
+                    cfg.start + timedelta(seconds=rng.randrange(cfg.window)),
+                    POINTS_PER_CHECKIN,
+                ))
+
+    return {
+        "users": users,
+        "reviews": reviews,
+        "review_photos": photos,
+        "user_likes": likes,
+        "user_saved": saved,
+        "user_visits": visits,
+    }
+
+
+def gen_chat_messages(cfg, block: int) -> dict:
+    rng = block_rng(cfg.seed, "chat_messages", block)
+    loc_cw = zipf_cum_weights(cfg.locations, cfg.zipf)
+    user_cw = zipf_cum_weights(cfg.users, cfg.activity_zipf)
+    start, stop = cfg.block_range(block, cfg.chat_messages)
+    n = stop - start
+
+    loc_indices = rng.choices(range(cfg.locations), cum_weights=loc_cw, k=n)
+    user_indices = rng.choices(range(cfg.users), cum_weights=user_cw, k=n)
+    rows = [
+        (
+            entity_uuid(LOCATION_KIND, loc_index),
+            entity_uuid(USER_KIND, user_index),
+            sentence(rng, 2, 20),
+            cfg.start + timedelta(seconds=rng.randrange(cfg.window)),
+        )
+        for loc_index, user_index in zip(loc_indices, user_indices)
+    ]
+    return {"chat_messages": rows}
+
+
+def gen_room_messages(cfg, block: int) -> dict:
+    rng = block_rng(cfg.seed, "chat_room_messages", block)
+    room_cw = zipf_cum_weights(cfg.rooms, cfg.zipf)
+    user_cw = zipf_cum_weights(cfg.users, cfg.activity_zipf)
+    start, stop = cfg.block_range(block, cfg.room_messages)
+    n = stop - start
+
+    room_indices = rng.choices(range(cfg.rooms), cum_weights=room_cw, k=n)
+    user_indices = rng.choices(range(cfg.users), cum_weights=user_cw, k=n)
+    rows = [
+        (
+            entity_uuid(ROOM_KIND, room_index),
+            entity_uuid(USER_KIND, user_index),
+            sentence(rng, 2, 20),
+            cfg.start + timedelta(seconds=rng.randrange(cfg.window)),
+        )
+        for room_index, user_index in zip(room_indices, user_indices)
+    ]
+    return {"chat_room_messages": rows}
+
+
+# ---------- Writers ----------
+
+class Writer:
+    """Writes generated rows through COPY (PostgreSQL) or executemany INSERTs."""
+
+    def __init__(self, database_url: str):
+        self.engine = create_engine(database_url)
+        self.is_postgres = self.engine.dialect.name == "postgresql"
+
+    def write(self, tables: dict) -> int:
+        written = 0
+        with self.engine.begin() as conn:
+            for table, rows in tables.items():
+                if not rows:
+                    continue
+                if self.is_postgres:
+                    self._copy(conn, table, rows)
+                else:
+                    self._insert(conn, table, rows)
+                written += len(rows)
+        return written
+
+    def _copy(self, conn, table: str, rows: list) -> None:
+        buf = io.StringIO()
+        buf.writelines("\t".join(map(copy_field, row)) + "\n" for row in rows)
+        buf.seek(0)
+        cursor = conn.connection.cursor()
+        try:
+            cursor.copy_expert(f"COPY {table} ({', '.join(COLUMNS[table])}) FROM STDIN", buf)
+        finally:
+            cursor.close()
+
+    def _insert(self, conn, table: str, rows: list) -> None:
+        columns = COLUMNS[table]
+        conn.execute(
+            Base.metadata.tables[table].insert(),
+            [dict(zip(columns, row)) for row in rows],
+        )
+
+
+_worker_writer: Writer | None = None
+
+
+def _init_worker(database_url: str) -> None:
+    global _worker_writer
+    _worker_writer = Writer(database_url)
+
+
+def _run_block(job) -> int:
+    func, cfg, block = job
+    return _worker_writer.write(func(cfg, block))
+
+
+# ---------- Config ----------
+
+class Config:
+    def __init__(self, args, password_hash: str):
+        self.seed = args.seed
+        self.locations = args.locations
+        self.users = args.users
+        self.tags = args.tags
+        self.rooms = args.rooms
+        self.reviews = args.reviews
+        self.likes = args.likes
+        self.saves = args.saves
+        self.visits = args.visits
+        self.chat_messages = args.chat_messages
+        self.room_messages = args.room_messages
+        self.images_per_location = args.images_per_location
+        self.tags_per_location = args.tags_per_location
+        self.photo_rate = args.photo_rate
+        self.zipf = args.zipf
+        self.activity_zipf = args.activity_zipf
+        self.block_size = args.block_size
+        self.password_hash = password_hash
+        self.window = args.days * 86400
+        self.start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+    def block_range(self, block: int, total: int) -> tuple[int, int]:
+        start = block * self.block_size
+        return start, min(start + self.block_size, total)
+
+    def blocks(self, total: int) -> range:
+        return range((total + self.block_size - 1) // self.block_size)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--locations", type=int, default=10_000)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--tags", type=int, default=200)
+    parser.add_argument("--rooms", type=int, default=20)
+    parser.add_argument("--reviews", type=int, default=100_000)
+    parser.add_argument("--likes", type=int, default=100_000)
+    parser.add_argument("--saves", type=int, default=100_000)
+    parser.add_argument("--visits", type=int, default=500_000)
+    parser.add_argument("--chat-messages", type=int, default=200_000)
+    parser.add_argument("--room-messages", type=int, default=200_000)
+    parser.add_argument("--images-per-location", type=int, default=3)
+    parser.add_argument("--tags-per-location", type=int, default=5)
+    parser.add_argument("--photo-rate", type=float, default=0.2, help="share of reviews with photos")
+    parser.add_argument("--zipf", type=float, default=1.07, help="popularity skew of locations, tags and rooms")
+    parser.add_argument("--activity-zipf", type=float, default=0.6, help="activity skew of users")
+    parser.add_argument("--days", type=int, default=365, help="timestamps are spread over this many days")
+    parser.add_argument("--block-size", type=int, default=10_000, help="driver rows per block (affects output)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--truncate", action="store_true", help="empty all tables first")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    if not args.database_url:
+        raise SystemExit("DATABASE_URL is not set (pass --database-url).")
+    if args.locations < 1 or args.users < 1:
+        raise SystemExit("--locations and --users must be at least 1.")
+    if args.room_messages and args.rooms < 1:
+        raise SystemExit("--room-messages requires --rooms >= 1.")
+
+    from passlib.context import CryptContext
+
+    # One shared hash: every generated user logs in with "password"
+    password_hash = CryptContext(schemes=["argon2"]).hash("password")
+    cfg = Config(args, password_hash)
+    writer = Writer(args.database_url)
+
+    if args.truncate:
+        with writer.engine.begin() as conn:
+            tables = ", ".join(reversed(list(COLUMNS)))
+            if writer.is_postgres:
+                conn.execute(text(f"TRUNCATE {tables} RESTART IDENTITY CASCADE"))
+            else:
+                for table in reversed(list(COLUMNS)):
+                    conn.execute(text(f"DELETE FROM {table}"))
+
+    phases = [
+        ("locations", gen_locations, cfg.blocks(cfg.locations)),
+        ("users", gen_users, cfg.blocks(cfg.users)),
+        ("chat_messages", gen_chat_messages, cfg.blocks(cfg.chat_messages)),
+        ("chat_room_messages", gen_room_messages, cfg.blocks(cfg.room_messages)),
+    ]
+
+    started = time.perf_counter()
+    total = writer.write(gen_static(cfg))
+    if writer.is_postgres:
+        with writer.engine.begin() as conn:
+            conn.execute(text("SELECT setval(pg_get_serial_sequence('tags', 'id'), GREATEST(MAX(id), 1)) FROM tags"))
+
+    with ProcessPoolExecutor(max_workers=args.jobs, initializer=_init_worker, initargs=(args.database_url,)) as pool:
+        # Phases run in FK order; blocks inside a phase run in parallel
+        for name, func, blocks in phases:
+            phase_started = time.perf_counter()
+            rows = sum(pool.map(_run_block, [(func, cfg, b) for b in blocks]))
+            total += rows
+            elapsed = time.perf_counter() - phase_started
+            print(f"{name:<20} {rows:>12,} rows  {elapsed:8.1f}s  {rows / max(elapsed, 1e-9) * 60:>14,.0f} rows/min")
+
+    elapsed = time.perf_counter() - started
+    print(f"{'total':<20} {total:>12,} rows  {elapsed:8.1f}s  {total / max(elapsed, 1e-9) * 60:>14,.0f} rows/min")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+# scripts/maintain_chat_partitions.py
+"""
+Runs one chat partition maintenance pass, the same one the app runs at
+startup and every CHAT_PARTITION_INTERVAL seconds.
+
+    python scripts/maintain_chat_partitions.py
+    python scripts/maintain_chat_partitions.py --now 2027-06-15   # as if it were that day
+
+Settings come from the environment (CHAT_ARCHIVE_MODE, CHAT_ARCHIVE_DIR,
+CHAT_ROOM_RETENTION_MONTHS, ...); see app/utils/chat_partitions.py.
+"""
+import argparse
+import os
+import sys
+from datetime import datetime, timezone
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.database import engine
+from app.utils.chat_partitions import maintain
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--now", type=datetime.fromisoformat, help="run as of this date (UTC)")
+    args = parser.parse_args()
+
+    if engine.dialect.name != "postgresql":
+        raise SystemExit("Chat partitions require PostgreSQL.")
+
+    now = args.now.replace(tzinfo=timezone.utc) if args.now else None
+    summary = maintain(engine, now)
+    if not summary:
+        print("Nothing to do (tables not partitioned, or another worker holds the lock).")
+    for table, changes in summary.items():
+        print(f"{table}")
+        print(f"  created   {', '.join(changes['created']) or '-'}")
+        print(f"  archived  {', '.join(changes['archived']) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+# scripts/soak_ws_connections.py
+"""
+Opens and abandons many chat websockets and checks nothing is left behind.
+
+    python scripts/soak_ws_connections.py
+    python scripts/soak_ws_connections.py --connections 50000 --rooms 500 --idle-timeout 3
+
+Runs the chat endpoints' connect / receive / finally-disconnect cycle
+in-process with stub websockets, spread over --rooms rooms:
+  - half of them go half-open: receive() and close() never return
+  - the others drop without a close frame after a random delay
+A few broadcasts are queued while they are open. This runs twice: the
+first round warms up (sets and dicts keep their high-water capacity), the
+second is measured. Reports traced Python memory (tracemalloc) at
+baseline, with everything open, and once the idle timeout has cleared
+the half-open sockets and their closes have timed out; exits non-zero if
+anything is still registered or memory did not return to within
+--tolerance-kb of the baseline.
+"""
+import argparse
+import asyncio
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+import uuid
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+from fastapi import WebSocketDisconnect
+
+from app.utils.pubsub import InMemoryPubSub
+from app.utils.presence import PresenceTracker
+from app.utils.ws_connections import ConnectionManager, ConnectionRegistry
+
+
+class StubWebSocket:
+    def __init__(self, drop_after: float | None):
+        # None: half-open, the peer is gone but nothing tells us
+        self.drop_after = drop_after
+
+    async def accept(self):
+        pass
+
+    async def receive(self) -> dict:
+        if self.drop_after is None:
+            await asyncio.Event().wait()
+        await asyncio.sleep(self.drop_after)
+        return {"type": "websocket.disconnect", "code": 1006}
+
+    async def send_text(self, frame: str):
+        pass
+
+    async def close(self, code: int = 1000):
+        if self.drop_after is None:
+            await asyncio.Event().wait()
+
+
+async def handler(manager: ConnectionManager, presence: PresenceTracker, room_id, websocket) -> None:
+    """Same shape as the chat websocket endpoints."""
+    client = await manager.connect(room_id, websocket)
+    if client is None:
+        return
+    try:
+        await presence.watch(room_id, client)
+        while True:
+            await manager.receive(client)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        manager.disconnect(room_id, websocket)
+        presence.leave(room_id, websocket)
+
+
+async def cycle(args, manager, presence, registry, rng, report: bool) -> tuple[int, int]:
+    rooms = [uuid.uuid4() for _ in range(args.rooms)]
+    tasks = []
+    for i in range(args.connections):
+        drop_after = None if i % 2 else rng.uniform(0.5, args.idle_timeout)
+        websocket = StubWebSocket(drop_after)
+        tasks.append(asyncio.create_task(handler(manager, presence, rooms[i % len(rooms)], websocket)))
+    deadline = time.perf_counter() + 10
+    while len(registry.clients) < args.connections and time.perf_counter() < deadline:
+        await asyncio.sleep(0.05)
+    for room_id in rooms:
+        await manager.broadcast(room_id, {"text": "x" * 200})
+    # Before the writers get to run
+    stats = registry.stats()
+
+    gc.collect()
+    open_memory = tracemalloc.get_traced_memory()[0]
+    if report:
+        print(f"open             {stats['connections']} connections, "
+              f"{stats['buffered_bytes'] / 1024:.0f} KiB buffered, {open_memory / 1024 / 1024:.1f} MiB traced")
+
+    started = time.perf_counter()
+    while (registry.clients or manager._closing) and time.perf_counter() - started < args.idle_timeout * 4:
+        await asyncio.sleep(0.1)
+    cleared_ms = int((time.perf_counter() - started) * 1000)
+    await asyncio.gather(*tasks, return_exceptions=True)
+    # Let the presence tick retire empty rooms
+    await presence.tick()
+    await asyncio.sleep(0.1)
+    return open_memory, cleared_ms
+
+
+async def run(args) -> bool:
+    registry = ConnectionRegistry()
+    manager = ConnectionManager(
+        "soak",
+        pubsub=InMemoryPubSub(),
+        registry=registry,
+        send_timeout=args.idle_timeout / 3,
+        heartbeat_interval=args.idle_timeout / 3,
+        idle_timeout=args.idle_timeout,
+    )
+    presence = PresenceTracker(manager, interval=3600)
+    rng = random.Random(0)
+
+    tracemalloc.start()
+    await cycle(args, manager, presence, registry, rng, report=False)
+    gc.collect()
+    baseline = tracemalloc.get_traced_memory()[0]
+    print(f"baseline         {baseline / 1024 / 1024:.1f} MiB traced")
+
+    _, cleared_ms = await cycle(args, manager, presence, registry, rng, report=True)
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    leftover = registry.stats()
+    print(f"cleared after    {cleared_ms} ms")
+    print(f"after            {after / 1024 / 1024:.1f} MiB traced ({(after - baseline) / 1024:+.0f} KiB)")
+    print(f"registry         {leftover}")
+    print(f"rooms left       {len(manager.active_connections)} sockets, {len(presence._rooms)} presence")
+    ok = (
+        not registry.clients
+        and not manager.active_connections
+        and not presence._rooms
+        and after - baseline <= args.tolerance_kb * 1024
+    )
+    print("PASS" if ok else "FAIL")
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connections", type=int, default=50_000)
+    parser.add_argument("--rooms", type=int, default=500)
+    parser.add_argument("--idle-timeout", type=float, default=3.0)
+    parser.add_argument("--tolerance-kb", type=int, default=512)
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args)) else 1)
+
+
+if __name__ == "__main__":
+    main()